@@ -1,30 +1,95 @@
 # 主程序
-from flask import Flask, render_template, request, flash, redirect, url_for, send_from_directory, jsonify
+from flask import Flask, render_template, request, flash, redirect, url_for, send_from_directory, jsonify, session
+from werkzeug.utils import secure_filename
 import pandas as pd
 from datetime import datetime
-import io
-import base64
-import seaborn as sns
+import os
+import threading
+import time
+import uuid
 import matplotlib.pyplot as plt
 
 
-from modules import DataCleaning, DataUploader, DataVisualizer, DataExporter, DataAnalyzer
+from modules import DataCleaning, DataUploader, DataAnalyzer, DataVisualizer, DataExporter, DatasetCache, \
+    ArrayCache, JobManager, ProcessJobManager, DatasetStore, DatasetLineage, CleaningPlan, StreamingCleaner, \
+    ResultCache, ModelRegistry
+from modules.compaction import compact_dtypes
+from modules.duplicates import duplicate_report
+from modules.imputation import STRATEGY_NAMES
+from modules.outliers import describe_outliers
+from modules.neighbors import downsample_curve
+from modules.streaming import score_file
+from modules.training import SUPERVISED, SCORABLE, algorithm_params, to_numeric_filled, train_job
 
-# 全局 DataFrame 存储
-GLOBAL_DF = None
-# 新增全局变量存储文件名
-FILENAME = None
-# 新增全局变量存储清洗后的数据
-CLEANED_DF = None
+# 开启 pandas 写时复制：只读路径直接共享存储的数据，修改某列时才复制该列
+pd.set_option('mode.copy_on_write', True)
 
 # 解决matplotlib中文显示问题
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'WenQuanYi Micro Hei', 'Arial Unicode MS', 'sans-serif']
 plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
 
 app = Flask(__name__)
+app.config.from_object('config')
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.secret_key = 'key'  # 用于 flash 消息
 
+# 已解析数据集的列式缓存，重复上传同一文件时跳过解析
+DATASET_CACHE = DatasetCache(app.config['DATASET_CACHE_DIR'], app.config['DATASET_CACHE_MAX_MB'],
+                             upload_dir=app.config['UPLOAD_FOLDER'])
+# 上传文件的后台解析任务
+INGEST_JOBS = JobManager(max_workers=app.config['INGEST_WORKERS'])
+# 大数据集的后台完整清洗任务
+CLEAN_JOBS = JobManager(max_workers=app.config['CLEAN_WORKERS'])
+# 大文件的后台流式清洗导出任务
+EXPORT_JOBS = JobManager(max_workers=app.config['EXPORT_WORKERS'])
+# 模型训练任务：在子进程中执行，可以取消，并统计 CPU 时间和内存
+TRAIN_JOBS = ProcessJobManager(max_workers=app.config['TRAIN_WORKERS'], preload=['__main__', 'modules.training'])
+# 各会话的数据集：'raw' 为上传的原始数据，其余为各清洗版本
+DATASETS = DatasetStore(app.config['DATASET_SPILL_DIR'], app.config['DATASET_MEMORY_BUDGET_MB'])
+# 各会话的清洗版本树，支持撤销、重做和分支
+LINEAGE = DatasetLineage(DATASETS, app.config['DATASET_MAX_VERSIONS'])
+# 分析结果缓存：按数据集版本和分析参数保存模型、指标和图表
+RESULTS = ResultCache(app.config['RESULT_CACHE_MAX_ENTRIES'], app.config['RESULT_CACHE_MAX_MB'])
+# DBSCAN 的半径近邻图：按数据集版本和特征元组保存 (半径, 近邻图)，同一版本上换 eps 不必重新搜索近邻；
+# 保存在磁盘上，训练子进程直接读写，不经过结果管道
+NEIGHBORS = ArrayCache(app.config['NEIGHBOR_CACHE_DIR'], app.config['NEIGHBOR_CACHE_MAX_MB'])
+# 每个数据集版本上标准化后的特征矩阵和训练集/测试集划分，所有算法共用
+FEATURES = ArrayCache(app.config['FEATURE_CACHE_DIR'], app.config['FEATURE_CACHE_MAX_MB'])
+# 保存的模型，打分时按需加载并缓存在内存中
+MODELS = ModelRegistry(app.config['MODEL_REGISTRY_DIR'], app.config['MODEL_MAX_LOADED'])
+# 训练任务的结果只写入缓存一次：状态轮询和结果页面都可能最先看到任务完成
+PUBLISH_LOCK = threading.Lock()
+
+
+def _session_id():
+    """当前浏览器会话的 id，首次访问时生成"""
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+
+def _raw_data():
+    return DATASETS.get(_session_id(), 'raw')
+
+
+def _current_dataset_id():
+    """当前版本的数据集 id，尚未清洗时为原始数据"""
+    head = LINEAGE.head(_session_id())
+    return 'raw' if head is None else head.dataset_id
+
+
+def _current_data():
+    return DATASETS.get(_session_id(), _current_dataset_id())
+
+
+def _current_profile():
+    """当前数据集的列类型概况，每个数据集版本只计算一次"""
+    return DATASETS.profile(_session_id(), _current_dataset_id())
+
+
+def _raw_meta():
+    return DATASETS.meta(_session_id(), 'raw') or {}
+
 
 @app.route('/', methods=['GET'])
 def index():
@@ -32,9 +97,13 @@ def index():
     return render_template('index.html')
 
 
+def _make_uploader():
+    return DataUploader(memory_limit_mb=app.config['INGEST_MEMORY_LIMIT_MB'],
+                        chunked_threshold_mb=app.config['CHUNKED_INGEST_THRESHOLD_MB'])
+
+
 @app.route('/upload', methods=['POST'])
 def upload():
-    global GLOBAL_DF, FILENAME
     f = request.files.get('datafile')
     if not f or f.filename == '':
         flash("未选择文件，请重新上传")
@@ -42,99 +111,308 @@ def upload():
 
 
     try:
-        uploader = DataUploader()
-        df = uploader.save_and_load(f, app.config['UPLOAD_FOLDER'])
-        # 获取文件名
-        FILENAME = f.filename
+        uploader = _make_uploader()
+        filepath = uploader.save(f, app.config['UPLOAD_FOLDER'])
+
+        # Excel 有多个工作表时先让用户选择，只解析选中的工作表
+        if not filepath.lower().endswith('.csv'):
+            sheets = uploader.list_sheets(filepath)
+            if len(sheets) > 1:
+                session['pending_upload'] = {'filepath': filepath, 'filename': f.filename, 'sheets': sheets}
+                return render_template('index.html', sheets=sheets, filename=f.filename)
     except ValueError as e:
         flash(str(e))
         return redirect(url_for('index'))
 
-    # 存储到全局以供后续清洗使用
-    GLOBAL_DF = df
+    return _start_ingest(filepath, f.filename)
+
+
+@app.route('/upload/sheet', methods=['POST'])
+def upload_sheet():
+    pending = session.get('pending_upload')
+    if pending is None:
+        flash("请先上传数据文件")
+        return redirect(url_for('index'))
+
+    sheet_name = request.form.get('sheet_name')
+    if sheet_name not in pending['sheets']:
+        flash("请选择有效的工作表")
+        return render_template('index.html', sheets=pending['sheets'], filename=pending['filename'])
+
+    session.pop('pending_upload')
+    return _start_ingest(pending['filepath'], f"{pending['filename']} [{sheet_name}]", sheet_name)
+
+
+def _start_ingest(filepath, filename, sheet_name=None):
+    """提交后台解析任务，立即返回任务 id 或进度页面"""
+    job = INGEST_JOBS.submit('ingest', _ingest, filepath, filename, sheet_name)
+    job.owner = _session_id()
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({"job_id": job.id,
+                        "status_url": url_for('upload_status', job_id=job.id)}), 202
+    return redirect(url_for('upload_progress', job_id=job.id))
+
+
+def _ingest(job, filepath, filename, sheet_name=None):
+    """后台任务：解析已保存的上传文件"""
+    job.update(filename=filename, bytes_total=os.path.getsize(filepath), bytes_parsed=0, rows=0)
+    uploader = _make_uploader()
+    uploader.progress = job.update
+    df = uploader.load(filepath, cache=DATASET_CACHE, sheet_name=sheet_name)
+    DATASET_CACHE.add_upload(filepath)
+    app.logger.info(f"上传 {filename}: {uploader.load_stats}")
+    return {'df': df, 'filename': filename, 'filepath': filepath,
+            'stats': uploader.load_stats, 'memory_report': uploader.memory_report}
+
+
+@app.route('/upload/progress/<job_id>', methods=['GET'])
+def upload_progress(job_id):
+    job = INGEST_JOBS.get(job_id)
+    if job is None or job.owner != _session_id():
+        flash("上传任务不存在或已过期")
+        return redirect(url_for('index'))
+    return render_template('progress.html', job_id=job_id)
 
-    # 直接重定向到清洗界面，不再显示预览页面
-    return redirect(url_for('clean'))
+
+@app.route('/upload/status/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    job = INGEST_JOBS.get(job_id)
+    if job is None or job.owner != _session_id():
+        return jsonify({"error": "上传任务不存在或已过期"}), 404
+    status = job.to_dict()
+    if job.status == 'done':
+        status['redirect'] = url_for('clean', job=job.id)
+    return jsonify(status)
+
+
+def _adopt_upload(job):
+    """将完成的解析任务结果设为当前会话的数据集"""
+    result, job.result = job.result, None
+
+    # 报告本次加载的速度和内存峰值
+    stats = result['stats']
+    if stats['mode'] == 'cache':
+        message = f"已从缓存加载 {stats['rows']} 行，用时 {stats['seconds']:.2f} 秒"
+    else:
+        message = f"已加载 {stats['rows']} 行，{stats['rows_per_sec']:.0f} 行/秒"
+    if stats['peak_rss_mb'] is not None:
+        message += f"，加载期间内存峰值 {stats['peak_rss_mb']:.0f} MB(增加 {stats['rss_growth_mb']:.0f} MB)"
+    elif stats['process_peak_rss_mb'] is not None:
+        message += f"，进程内存峰值 {stats['process_peak_rss_mb']:.0f} MB"
+    flash(message)
+
+    # 存储到当前会话以供后续清洗使用
+    LINEAGE.reset(_session_id(), result['df'], "原始数据", filename=result['filename'],
+                  filepath=result['filepath'], memory_report=result['memory_report'])
 
 @app.route('/clean', methods=['GET', 'POST'])
 def clean():
-    global GLOBAL_DF,CLEANED_DF
-
-    if GLOBAL_DF is None:
+    # 从上传进度页跳转而来：解析完成后再打开清洗页面
+    job_id = request.args.get('job')
+    if job_id:
+        job = INGEST_JOBS.get(job_id)
+        if job is None or job.owner != _session_id():
+            flash("上传任务不存在或已过期")
+            return redirect(url_for('index'))
+        if job.status == 'failed':
+            flash(f"文件解析失败: {job.error}")
+            return redirect(url_for('index'))
+        if job.status != 'done':
+            return redirect(url_for('upload_progress', job_id=job_id))
+        if job.result is not None:
+            _adopt_upload(job)
+        return redirect(url_for('clean'))
+
+    raw_df = _raw_data()
+    if raw_df is None:
         flash("请先上传数据文件")
         return redirect(url_for('index'))
+    sid = _session_id()
+    meta = _raw_meta()
 
     if request.method == 'POST':
         #获取清洗规则
         missing_method = request.form.get('missing_method')
         fill_value = request.form.get('fill_value')
-        outlier_column = request.form.get('outlier_column')
+        fill_strategy = request.form.get('fill_strategy', 'constant')
+        fill_group_by = request.form.get('fill_group_by') or None
+        outlier_columns = request.form.getlist('outlier_columns')
+        outlier_method = request.form.get('outlier_method', 'zscore')
+        outlier_combine = request.form.get('outlier_combine', 'any')
         threshold = request.form.get('threshold', type=float)
         replacement = request.form.get('replacement')
         if replacement == "":
             replacement = None
         duplicate_method = request.form.get('duplicate_method')
+        duplicate_subset = request.form.getlist('duplicate_subset') or None
 
         # 构建清洗规则
         rules = {
-            "missing_values": {"method": missing_method, "fill_value": fill_value} if missing_method == 'fill' else {
-                "method": missing_method},
-            "outliers": {"column": outlier_column, "threshold": threshold,
-                         "replacement": replacement} if outlier_column else None,
-            "duplicates": {"method": duplicate_method}
+            "missing_values": {"method": missing_method, "strategy": fill_strategy, "fill_value": fill_value,
+                               "group_by": fill_group_by} if missing_method == 'fill' else {"method": missing_method},
+            "outliers": {"columns": outlier_columns, "method": outlier_method, "threshold": threshold,
+                         "combine": outlier_combine, "replacement": replacement} if outlier_columns else None,
+            "duplicates": {"method": duplicate_method, "subset": duplicate_subset}
         }
 
-        #清洗数据
-        cleaner = DataCleaning(GLOBAL_DF)
+        # 清洗当前版本，结果作为它的子版本
+        head = LINEAGE.head(sid)
+        head_df = _current_data()
+        if head is None or head_df is None:
+            flash("当前版本的数据已过期，请重新上传数据文件")
+            return redirect(url_for('index'))
         try:
-            cleaned_data = cleaner.apply_cleaning_rules(rules)
-            cleaned_data = cleaned_data.reset_index(drop=True)
-
-            # 存储清洗后的数据到全局变量
-            CLEANED_DF = cleaned_data
+            plan = CleaningPlan(rules)
+            if len(head_df) <= app.config['CLEAN_PREVIEW_THRESHOLD_ROWS']:
+                _clean_version(None, sid, head.id, head_df, rules)
+                return redirect(url_for('clean'))
+            preview = plan.preview(head_df, app.config['CLEAN_PREVIEW_SAMPLE_ROWS'])
         except ValueError as e:
             flash(str(e))
             return redirect(url_for('clean'))
 
-        # 渲染清洗后的数据
-        # 渲染清洗后的数据
-        return render_template(
-            'clean.html',
-            data=GLOBAL_DF.head(10).to_dict(orient='records'),  # 确保是字典列表
-            columns=GLOBAL_DF.columns,
-            numeric_columns=GLOBAL_DF.select_dtypes(include=['number']).columns,
-            cleaned_data=cleaned_data.head(10).to_dict(orient='records'),  # 确保是字典列表
-            cleaned_columns=cleaned_data.columns,
-            data_count=len(GLOBAL_DF),
-            column_count=len(GLOBAL_DF.columns),
-            cleaned_count=len(cleaned_data),
-            cleaned_columns_count=len(cleaned_data.columns),
-            filename=FILENAME
+        # 大数据集先返回样本上的预览，完整清洗在后台执行，完成后页面自动刷新
+        job = CLEAN_JOBS.submit('clean', _clean_version, sid, head.id, head_df, rules)
+        job.owner = sid
+        preview_df = preview['data']
+        return _render_clean(sid, raw_df, meta, dict(
+            cleaned_data=preview_df.head(10).to_dict(orient='records'),
+            cleaned_columns=preview_df.columns,
+            cleaned_count=preview['estimated_rows'],
+            cleaned_columns_count=len(preview_df.columns),
+            cleaned_label=_describe_rules(rules),
+            cleaned_plan=plan.explain(),
+            preview_sample_rows=preview['sample_rows'],
+            clean_job=job.id,
+        ))
+
+    # 当前版本不是原始数据时展示清洗结果
+    head = LINEAGE.head(sid)
+    head_df = _current_data()
+    cleaned = {}
+    if head is not None and head.parent is not None and head_df is not None:
+        cleaned = dict(
+            cleaned_data=head_df.head(10).to_dict(orient='records'),  # 确保是字典列表
+            cleaned_columns=head_df.columns,
+            cleaned_count=len(head_df),
+            cleaned_columns_count=len(head_df.columns),
+            cleaned_label=head.label,
+            cleaned_plan=head.meta.get('plan'),
         )
+    return _render_clean(sid, raw_df, meta, cleaned)
+
+
+def _render_clean(sid, raw_df, meta, cleaned):
+    profile = _current_profile() or DATASETS.profile(sid, 'raw')
 
-        # GET 请求时渲染清洗页面
     return render_template(
         'clean.html',
-        data=GLOBAL_DF.head(10).to_dict(orient='records'),
-        columns=GLOBAL_DF.columns,
-        numeric_columns=GLOBAL_DF.select_dtypes(include=['number']).columns,
-        data_count=len(GLOBAL_DF),
-        column_count=len(GLOBAL_DF.columns),
-        filename = FILENAME
+        data=raw_df.head(10).to_dict(orient='records'),
+        columns=raw_df.columns,
+        numeric_columns=profile['numeric_columns'],
+        current_columns=profile['columns'],
+        data_count=len(raw_df),
+        column_count=len(raw_df.columns),
+        filename=meta.get('filename'),
+        memory_report=meta.get('memory_report'),
+        lineage=LINEAGE.nodes(sid),
+        **cleaned
     )
 
 
+def _clean_version(job, session_id, parent, df, rules):
+    """清洗 parent 版本的数据并保存为它的子版本；作为后台任务执行时 job 为任务对象"""
+    cleaner = DataCleaning(df)
+    cleaned_data = cleaner.apply_cleaning_rules(rules)
+    cleaned_data = cleaned_data.reset_index(drop=True)
+    # 填充值等来自表单的字符串可能改变列类型，清洗后重新压缩一次
+    cleaned_data, _ = compact_dtypes(cleaned_data)
+    return LINEAGE.commit(session_id, cleaned_data, _describe_rules(rules), parent=parent,
+                          rules=rules, plan=cleaner.plan.explain())
+
+
+@app.route('/clean/status/<job_id>', methods=['GET'])
+def clean_status(job_id):
+    job = CLEAN_JOBS.get(job_id)
+    if job is None or job.owner != _session_id():
+        return jsonify({"error": "清洗任务不存在或已过期"}), 404
+    status = job.to_dict()
+    if job.status == 'done':
+        status['redirect'] = url_for('clean')
+    return jsonify(status)
+
+
+def _describe_rules(rules):
+    """清洗规则的简短说明，显示在版本列表中"""
+    parts = []
+    missing = rules['missing_values']
+    if missing['method'] == 'drop':
+        parts.append("删除缺失行")
+    elif missing['method'] == 'fill':
+        strategy = missing.get('strategy', 'constant')
+        if strategy == 'constant':
+            parts.append(f"缺失值填充为 {missing.get('fill_value')}")
+        else:
+            parts.append(f"缺失值填充{STRATEGY_NAMES[strategy]}")
+    outliers = rules.get('outliers')
+    if outliers:
+        action = "删除" if outliers.get('replacement') is None else f"替换为 {outliers['replacement']}"
+        columns = outliers.get('columns') or [outliers['column']]
+        description = describe_outliers(columns, outliers.get('method', 'zscore'), outliers.get('threshold'),
+                                        outliers.get('combine', 'any'))
+        parts.append(f"{description} 异常值{action}")
+    duplicates = rules['duplicates']['method']
+    subset = rules['duplicates'].get('subset')
+    scope = f"按 {', '.join(str(column) for column in subset)} " if subset else ""
+    if duplicates == 'drop':
+        parts.append(f"{scope}删除重复行")
+    elif duplicates == 'mark':
+        parts.append(f"{scope}标记重复行")
+    return "，".join(parts) or "无操作"
+
+
+@app.route('/clean/duplicates', methods=['GET'])
+def clean_duplicates():
+    """统计当前版本的重复行，subset 参数指定判断重复的列"""
+    df = _current_data()
+    if df is None:
+        return jsonify({"error": "请先上传数据文件"}), 404
+    try:
+        report = duplicate_report(df, request.args.getlist('subset') or None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(report)
+
+
+@app.route('/clean/undo', methods=['POST'])
+def clean_undo():
+    if not LINEAGE.undo(_session_id()):
+        flash("已经是原始数据，无法撤销")
+    return redirect(url_for('clean'))
+
+
+@app.route('/clean/redo', methods=['POST'])
+def clean_redo():
+    if not LINEAGE.redo(_session_id()):
+        flash("没有可以重做的清洗步骤")
+    return redirect(url_for('clean'))
+
+
+@app.route('/clean/checkout/<int:node_id>', methods=['POST'])
+def clean_checkout(node_id):
+    if not LINEAGE.checkout(_session_id(), node_id):
+        flash("版本不存在或已被删除")
+    return redirect(url_for('clean'))
+
+
 # 添加导出数据的路由
 @app.route('/export', methods=['GET', 'POST'])
 def export_data():
-    global GLOBAL_DF, CLEANED_DF
-
-    # 确定要导出的数据框，优先选择清洗后的数据
-    if CLEANED_DF is not None:
-        df_to_export = CLEANED_DF
+    # 导出当前版本，尚未清洗时导出原始数据
+    df_to_export = _current_data()
+    if df_to_export is not None and _current_dataset_id() != 'raw':
         default_filename = f"cleaned_data_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    elif GLOBAL_DF is not None:
-        df_to_export = GLOBAL_DF
+    elif df_to_export is not None:
         default_filename = f"data_export_{datetime.now().strftime('%Y%m%d%H%M%S')}"
     else:
         flash("请先上传并处理数据文件")
@@ -184,7 +462,70 @@ def export_data():
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
     return render_template('result.html',
                           export_success=False,
-                          timestamp=timestamp)
+                          timestamp=timestamp,
+                          stream_source=_stream_source(),
+                          stream_job=request.args.get('job'))
+
+
+def _stream_source():
+    """可以流式导出的上传文件路径：只支持 CSV 文件，且文件仍在磁盘上"""
+    filepath = _raw_meta().get('filepath')
+    if filepath and filepath.lower().endswith('.csv') and os.path.exists(filepath):
+        return filepath
+    return None
+
+
+@app.route('/export/stream', methods=['POST'])
+def export_stream():
+    """从上传的原始文件分块重放当前版本的全部清洗步骤并写出文件，不把数据读入内存"""
+    sid = _session_id()
+    source = _stream_source()
+    if source is None:
+        flash("流式导出需要上传的 CSV 原始文件")
+        return redirect(url_for('export_data'))
+    # 原始文件按最近使用的顺序淘汰，导出时更新访问时间
+    DATASET_CACHE.add_upload(source)
+
+    export_format = request.form.get('format', 'csv')
+    extension = {'csv': '.csv', 'parquet': '.parquet'}.get(export_format)
+    filename = secure_filename(request.form.get('filename') or '')
+    if extension is None or not filename:
+        flash("请填写文件名并选择 CSV 或 Parquet 格式")
+        return redirect(url_for('export_data'))
+    if not filename.endswith(extension):
+        filename += extension
+
+    rules = [node.meta['rules'] for node in LINEAGE.path(sid)[1:]]
+    # 原始数据集上传时压缩后的列类型，每块按同样的类型转换后再清洗
+    report = _raw_meta().get('memory_report') or {'columns': []}
+    column_dtypes = {row['column']: row['dtype_after'] for row in report['columns']}
+    try:
+        cleaner = StreamingCleaner(rules, app.config['STREAM_CHUNK_ROWS'], column_dtypes)
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('export_data'))
+    job = EXPORT_JOBS.submit('export', _stream_export, cleaner, source, filename, export_format)
+    job.owner = sid
+    return redirect(url_for('export_data', job=job.id))
+
+
+def _stream_export(job, cleaner, source, filename, export_format):
+    cleaner.progress = job.update
+    os.makedirs('exports', exist_ok=True)
+    report = cleaner.run(source, os.path.join('exports', filename), export_format)
+    return dict(report, filename=filename)
+
+
+@app.route('/export/status/<job_id>', methods=['GET'])
+def export_status(job_id):
+    job = EXPORT_JOBS.get(job_id)
+    if job is None or job.owner != _session_id():
+        return jsonify({"error": "导出任务不存在或已过期"}), 404
+    status = job.to_dict()
+    if job.status == 'done':
+        status['result'] = job.result
+        status['download'] = url_for('download_file', filename=job.result['filename'])
+    return jsonify(status)
 
 # 添加下载文件的路由
 @app.route('/download/<filename>')
@@ -195,66 +536,64 @@ def download_file(filename):
 # 添加分析页面路由
 @app.route('/analyze', methods=['GET', 'POST'])
 def analyze():
-    global GLOBAL_DF, CLEANED_DF
-
     # 优先使用清洗后的数据
-    df_to_analyze = CLEANED_DF if CLEANED_DF is not None else GLOBAL_DF
+    df_to_analyze = _current_data()
 
     if df_to_analyze is None:
         flash("请先上传数据文件")
         return redirect(url_for('index'))
 
-    # 尝试将可能是数值的字符串列转换为数值类型
-    df_converted = df_to_analyze.copy()
-    for column in df_converted.columns:
-        if df_converted[column].dtype == 'object':  # 如果是对象类型（可能是字符串）
-            try:
-                # 尝试转换为数值
-                df_converted[column] = pd.to_numeric(df_converted[column], errors='coerce')
-                # 如果转换成功（没有太多NaN），保留转换结果
-                if df_converted[column].isna().sum() <= len(df_converted) * 0.1:  # 允许10%的NaN
-                    df_to_analyze[column] = df_converted[column]
-            except:
-                pass  # 无法转换则保持原样
+    # 后台训练任务：完成后展示结果，未完成时展示进度并轮询
+    job_id = request.args.get('job')
+    if job_id:
+        return _analyze_job(job_id)
 
+    # 数值型字符串列已在加载/清洗后的类型压缩阶段转换为数值类型，
+    # 列类型概况按数据集版本缓存，不必每次请求重新推断
+    profile = _current_profile()
     saved_params = {}
-    columns = list(df_to_analyze.columns)
-    # 更新数值列列表
-    numeric_columns = list(df_to_analyze.select_dtypes(include=['number']).columns)
-    # 更新分类列列表
-    categorical_columns = list(df_to_analyze.select_dtypes(exclude=['number']).columns)
+    columns = profile['columns']
+    # 数值列列表
+    numeric_columns = profile['numeric_columns']
+    # 分类列列表
+    categorical_columns = profile['non_numeric_columns']
     ml_results = None
     ml_metrics = None
     feature_importance_chart = None
     predictions_chart = None
     cluster_chart = None
+    sweep_chart = None
+    sweep = None
+    cache_hit = False
 
     if request.method == 'POST':
         form = request.form
-        saved_params = form.to_dict(flat=False)
-        # 处理多选特征
+        # 处理多选特征；其余字段只有一个值，保存为字符串供模板回填
         features = form.getlist('features')
+        saved_params = dict(form.to_dict(), features=features)
         target_column = form.get('target_column')
         ml_algorithm = form.get('ml_algorithm')
         test_size = float(form.get('test_size') or 20) / 100
 
         # 先转换所选特征和目标列为数值型
-        df_for_ml = df_to_analyze.copy()
+        # 浅复制：写时复制模式下只有被转换的列才会真正复制
+        df_for_ml = df_to_analyze.copy(deep=False)
         converted_features = []
+        converted_target = []
         for feature in features:
             if feature not in numeric_columns:
                 try:
-                    df_for_ml[feature] = pd.to_numeric(df_for_ml[feature], errors='coerce')
-                    df_for_ml[feature] = df_for_ml[feature].fillna(df_for_ml[feature].mean())
+                    df_for_ml[feature] = to_numeric_filled(df_for_ml[feature])
                     converted_features.append(feature)
                 except Exception as e:
                     flash(f"特征 '{feature}' 无法转换为数值: {str(e)}", "warning")
                     # 继续处理其他特征
 
-        if target_column and target_column not in numeric_columns and ml_algorithm in ['linear_regression', 'random_forest_regression']:
+        if target_column and target_column not in numeric_columns and ml_algorithm in [
+                'linear_regression', 'random_forest_regression', 'random_forest_regression_sweep']:
             try:
-                df_for_ml[target_column] = pd.to_numeric(df_for_ml[target_column], errors='coerce')
-                df_for_ml[target_column] = df_for_ml[target_column].fillna(df_for_ml[target_column].mean())
+                df_for_ml[target_column] = to_numeric_filled(df_for_ml[target_column])
+                converted_target = [target_column]
             except Exception as e:
                 flash(f"目标列 '{target_column}' 无法转换为数值: {str(e)}", "danger")
                 return render_template(
@@ -281,207 +620,45 @@ def analyze():
         if converted_features:
             flash(f"以下特征已自动转换为数值: {', '.join(converted_features)}", "info")
 
-        analyzer = DataAnalyzer(df_for_ml)
-
         try:
-            if ml_algorithm == 'linear_regression':
-                result = analyzer.predict(features, target_column, test_size=test_size, method='linear')
-                ml_metrics = {'MSE': result['mse'], 'R2': result['r2']}
-
-                # 生成预测结果图
-                plt.figure(figsize=(10, 6))
-                plt.scatter(result['y_test'], result['y_pred'], alpha=0.5)
-                plt.plot([min(result['y_test']), max(result['y_test'])],
-                         [min(result['y_test']), max(result['y_test'])], 'r--')
-                plt.xlabel('实际值')
-                plt.ylabel('预测值')
-                plt.title('线性回归: 预测值 vs 实际值')
-
-                # 将图保存到内存中
-                img_buf = io.BytesIO()
-                plt.savefig(img_buf, format='png')
-                img_buf.seek(0)
-                predictions_chart = "data:image/png;base64," + base64.b64encode(img_buf.read()).decode('utf-8')
-                plt.close()
-
-            elif ml_algorithm == 'random_forest_regression':
-                result = analyzer.predict(features, target_column, test_size=test_size, method='random_forest')
-                ml_metrics = {'MSE': result['mse'], 'R2': result['r2']}
-
-                # 生成特征重要性图
-                if result['feature_importance']:
-                    # 排序特征重要性
-                    importance_df = pd.DataFrame({
-                        '特征': list(result['feature_importance'].keys()),
-                        '重要性': list(result['feature_importance'].values())
-                    })
-                    importance_df = importance_df.sort_values('重要性', ascending=False)
-
-                    plt.figure(figsize=(10, 6))
-                    sns.barplot(x='重要性', y='特征', data=importance_df)
-                    plt.title('随机森林回归: 特征重要性')
-                    plt.tight_layout()
-
-                    img_buf = io.BytesIO()
-                    plt.savefig(img_buf, format='png')
-                    img_buf.seek(0)
-                    feature_importance_chart = "data:image/png;base64," + base64.b64encode(img_buf.read()).decode(
-                        'utf-8')
-                    plt.close()
-
-                # 生成预测结果图
-                plt.figure(figsize=(10, 6))
-                plt.scatter(result['y_test'], result['y_pred'], alpha=0.5)
-                plt.plot([min(result['y_test']), max(result['y_test'])],
-                         [min(result['y_test']), max(result['y_test'])], 'r--')
-                plt.xlabel('实际值')
-                plt.ylabel('预测值')
-                plt.title('随机森林回归: 预测值 vs 实际值')
-
-                img_buf = io.BytesIO()
-                plt.savefig(img_buf, format='png')
-                img_buf.seek(0)
-                predictions_chart = "data:image/png;base64," + base64.b64encode(img_buf.read()).decode('utf-8')
-                plt.close()
-
-            elif ml_algorithm == 'random_forest_classification':
-                result = analyzer.classify(features, target_column, test_size=test_size)
-                ml_metrics = {'准确率': result['accuracy']}
-
-                # 生成特征重要性图
-                if result['feature_importance']:
-                    # 排序特征重要性
-                    importance_df = pd.DataFrame({
-                        '特征': list(result['feature_importance'].keys()),
-                        '重要性': list(result['feature_importance'].values())
-                    })
-                    importance_df = importance_df.sort_values('重要性', ascending=False)
-
-                    plt.figure(figsize=(10, 6))
-                    sns.barplot(x='重要性', y='特征', data=importance_df)
-                    plt.title('随机森林分类: 特征重要性')
-                    plt.tight_layout()
-
-                    img_buf = io.BytesIO()
-                    plt.savefig(img_buf, format='png')
-                    img_buf.seek(0)
-                    feature_importance_chart = "data:image/png;base64," + base64.b64encode(img_buf.read()).decode(
-                        'utf-8')
-                    plt.close()
-
-            elif ml_algorithm == 'kmeans':
-                n_clusters = int(form.get('n_clusters') or 3)
-                result = analyzer.cluster_kmeans(features, n_clusters=n_clusters)
-                ml_metrics = {'轮廓系数': result['silhouette_score']}
-
-                # 生成聚类可视化图
-                if len(features) >= 2:
-                    # 若特征数大于2，则使用前两个特征进行可视化
-                    plt.figure(figsize=(10, 6))
-                    scatter = plt.scatter(
-                        df_for_ml[features[0]],
-                        df_for_ml[features[1]],
-                        c=result['data']['cluster'],
-                        cmap='viridis',
-                        alpha=0.6
-                    )
-                    plt.scatter(
-                        result['cluster_centers'][:, 0],
-                        result['cluster_centers'][:, 1],
-                        c='red',
-                        marker='x',
-                        s=100
-                    )
-                    plt.xlabel(features[0])
-                    plt.ylabel(features[1])
-                    plt.title(f'K均值聚类结果 (k={n_clusters})')
-                    plt.colorbar(scatter, label='聚类')
-
-                    img_buf = io.BytesIO()
-                    plt.savefig(img_buf, format='png')
-                    img_buf.seek(0)
-                    cluster_chart = "data:image/png;base64," + base64.b64encode(img_buf.read()).decode('utf-8')
-                    plt.close()
-
-            elif ml_algorithm == 'dbscan':
-                eps = float(form.get('eps') or 0.5)
-                min_samples = int(form.get('min_samples') or 5)
-                result = analyzer.cluster_dbscan(features, eps=eps, min_samples=min_samples)
-                ml_metrics = {'轮廓系数': result['silhouette_score'] or 0}
-
-                # 生成聚类可视化图
-                if len(features) >= 2:
-                    # 若特征数大于2，则使用前两个特征进行可视化
-                    plt.figure(figsize=(10, 6))
-                    scatter = plt.scatter(
-                        df_for_ml[features[0]],
-                        df_for_ml[features[1]],
-                        c=result['data']['cluster'],
-                        cmap='viridis',
-                        alpha=0.6
-                    )
-                    plt.xlabel(features[0])
-                    plt.ylabel(features[1])
-                    plt.title(f'DBSCAN聚类结果 (eps={eps}, min_samples={min_samples})')
-                    plt.colorbar(scatter, label='聚类 (-1表示噪声点)')
-
-                    img_buf = io.BytesIO()
-                    plt.savefig(img_buf, format='png')
-                    img_buf.seek(0)
-                    cluster_chart = "data:image/png;base64," + base64.b64encode(img_buf.read()).decode('utf-8')
-                    plt.close()
-
-            elif ml_algorithm == 'pca':
-                n_components = int(form.get('n_components') or 2)
-                result = analyzer.dimensionality_reduction(features, n_components=n_components)
-                ml_metrics = {'累计方差解释率': result['explained_variance']['cumulative_variance_ratio'][-1]}
-
-                # 生成PCA可视化图
-                if n_components >= 2:
-                    # 创建PCA结果散点图
-                    plt.figure(figsize=(12, 10))
-                    plt.subplot(2, 1, 1)
-                    plt.scatter(
-                        result['reduced_data']['PC1'],
-                        result['reduced_data']['PC2'],
-                        alpha=0.7
-                    )
-                    plt.xlabel('主成分1')
-                    plt.ylabel('主成分2')
-                    plt.title('PCA降维结果散点图')
-
-                    # 创建解释方差比例条形图
-                    plt.subplot(2, 1, 2)
-                    plt.bar(
-                        range(len(result['explained_variance']['explained_variance_ratio'])),
-                        result['explained_variance']['explained_variance_ratio']
-                    )
-                    plt.plot(
-                        range(len(result['explained_variance']['cumulative_variance_ratio'])),
-                        result['explained_variance']['cumulative_variance_ratio'],
-                        'r-o'
-                    )
-                    plt.xlabel('主成分')
-                    plt.ylabel('解释方差比例')
-                    plt.title('PCA解释方差比例')
-                    plt.xticks(range(len(result['explained_variance']['components'])),
-                               result['explained_variance']['components'])
-                    plt.tight_layout()
-
-                    img_buf = io.BytesIO()
-                    plt.savefig(img_buf, format='png')
-                    img_buf.seek(0)
-                    cluster_chart = "data:image/png;base64," + base64.b64encode(img_buf.read()).decode('utf-8')
-                    plt.close()
-
+            params = algorithm_params(ml_algorithm, dict(form.to_dict(), test_size=test_size))
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for('analyze'))
+
+        # 同一数据集版本上相同的算法、特征、目标列和超参数直接返回缓存的模型、指标和图表
+        target = target_column if ml_algorithm in SUPERVISED else None
+        version = LINEAGE.head(_session_id()).id
+        key = RESULTS.make_key(version, ml_algorithm, features, target, params)
+        result = RESULTS.get(key)
+        cache_hit = result is not None
+        if result is None:
+            # 训练可能耗时很长，在后台子进程中执行，页面轮询任务状态；
+            # 子进程从数据集的磁盘副本读取用到的列，再做同样的数值转换
+            snapshot = DATASETS.snapshot(_session_id(), _current_dataset_id())
+            if snapshot is None:
+                # 无法写成列式文件的数据集(如混合类型列)只能把用到的列随参数传给子进程
+                columns = list(dict.fromkeys(features + ([target] if target else [])))
+                data, release = df_to_analyze[columns], None
             else:
-                flash("请选择有效的算法")
-                return redirect(url_for('analyze'))
-
-            ml_results = True  # 标记有结果
-
-        except Exception as e:
-            flash(f"分析失败: {str(e)}", "danger")
+                data, release = snapshot, lambda job: DATASETS.release_snapshot(snapshot)
+            job = TRAIN_JOBS.submit('train', train_job, data, ml_algorithm, features, target, params,
+                                    workers=app.config['SWEEP_WORKERS'], neighbor_graphs=NEIGHBORS.view(version),
+                                    preprocessed=FEATURES.view(version), convert=converted_features + converted_target,
+                                    on_finish=release)
+            job.owner = _session_id()
+            job.version = version
+            job.cache_key = key
+            job.saved_params = saved_params
+            job.published = False
+            return redirect(url_for('analyze', job=job.id))
+        ml_metrics = result['metrics']
+        feature_importance_chart = result['charts']['feature_importance_chart']
+        predictions_chart = result['charts']['predictions_chart']
+        cluster_chart = result['charts']['cluster_chart']
+        sweep_chart = result['charts']['sweep_chart']
+        sweep = result['sweep']
+        ml_results = True  # 标记有结果
 
     return render_template(
         'analyze.html',
@@ -491,28 +668,203 @@ def analyze():
         categorical_columns=categorical_columns,
         ml_results=ml_results,
         ml_metrics=ml_metrics,
-        feature_importance_chart=feature_importance_chart if 'feature_importance_chart' in locals() else None,
-        predictions_chart=predictions_chart if 'predictions_chart' in locals() else None,
-        cluster_chart=cluster_chart if 'cluster_chart' in locals() else None
+        feature_importance_chart=feature_importance_chart,
+        predictions_chart=predictions_chart,
+        cluster_chart=cluster_chart,
+        sweep_chart=sweep_chart,
+        sweep=sweep,
+        cache_hit=cache_hit,
+        cache_stats=RESULTS.stats(),
+        scorable=saved_params.get('ml_algorithm') in SCORABLE
     )
 
+
+def _publish_train_result(job):
+    """把完成的训练任务的结果写入缓存，每个任务只执行一次"""
+    with PUBLISH_LOCK:
+        if job.status != 'done' or job.published:
+            return
+        job.published = True
+    RESULTS.put(job.cache_key, job.result)
+
+
+def _analyze_job(job_id):
+    job = TRAIN_JOBS.get(job_id)
+    if job is None or job.owner != _session_id():
+        flash("分析任务不存在或已过期")
+        return redirect(url_for('analyze'))
+    profile = _current_profile()
+    charts = {}
+    if job.status == 'done':
+        _publish_train_result(job)
+        charts = job.result['charts']
+    elif job.status == 'failed':
+        flash(f"分析失败: {job.error}", "danger")
+    elif job.status == 'cancelled':
+        flash("分析任务已取消")
+    return render_template(
+        'analyze.html',
+        saved_params=job.saved_params,
+        columns=profile['columns'],
+        numeric_columns=profile['numeric_columns'],
+        categorical_columns=profile['non_numeric_columns'],
+        ml_results=job.status == 'done',
+        ml_metrics=job.result['metrics'] if job.status == 'done' else None,
+        feature_importance_chart=charts.get('feature_importance_chart'),
+        predictions_chart=charts.get('predictions_chart'),
+        cluster_chart=charts.get('cluster_chart'),
+        sweep_chart=charts.get('sweep_chart'),
+        sweep=job.result['sweep'] if job.status == 'done' else None,
+        cache_stats=RESULTS.stats(),
+        train_job=job if job.status in ('pending', 'running') else None,
+        train_usage=job.usage,
+        scorable=job.saved_params.get('ml_algorithm') in SCORABLE
+    )
+
+
+@app.route('/analyze/status/<job_id>', methods=['GET'])
+def analyze_status(job_id):
+    """训练任务的状态、阶段和资源占用；任务结束后 redirect 指向结果页面"""
+    job = TRAIN_JOBS.get(job_id)
+    if job is None or job.owner != _session_id():
+        return jsonify({"error": "分析任务不存在或已过期"}), 404
+    status = job.to_dict()
+    status['elapsed_seconds'] = (job.finished or time.time()) - job.started if job.started else 0.0
+    if job.status in ('done', 'failed', 'cancelled'):
+        _publish_train_result(job)
+        status['redirect'] = url_for('analyze', job=job.id)
+    return jsonify(status)
+
+
+@app.route('/analyze/cancel/<job_id>', methods=['POST'])
+def analyze_cancel(job_id):
+    job = TRAIN_JOBS.get(job_id)
+    if job is None or job.owner != _session_id():
+        flash("分析任务不存在或已过期")
+        return redirect(url_for('analyze'))
+    if not TRAIN_JOBS.cancel(job_id):
+        flash("分析任务已结束，无法取消")
+    return redirect(url_for('analyze', job=job_id))
+
+
+@app.route('/analyze/eps', methods=['GET'])
+def analyze_eps():
+    """按 k 距离曲线的拐点建议 DBSCAN 的 eps，不运行聚类；k 即 min_samples"""
+    df = _current_data()
+    features = request.args.getlist('features')
+    k = request.args.get('min_samples', default=5, type=int)
+    if df is None or not features or k < 1:
+        return jsonify({"error": "请选择特征并填写有效的 min_samples"}), 400
+    version = LINEAGE.head(_session_id()).id
+    try:
+        result = DataAnalyzer(df, preprocessed=FEATURES.view(version)).k_distance(features, k)
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"无法计算 k 距离: {e}"}), 400
+    positions, distances = downsample_curve(result['distances'])
+    return jsonify({'eps': round(result['eps'], 4), 'k': k, 'sample_size': len(result['distances']),
+                    'curve': {'positions': positions, 'distances': distances},
+                    'knee_position': result['knee'] / max(len(result['distances']) - 1, 1)})
+
+
+@app.route('/analyze/cache', methods=['GET'])
+def analyze_cache():
+    """分析结果缓存的条目数、大小和命中率"""
+    return jsonify(RESULTS.stats())
+
+
+@app.route('/models', methods=['GET'])
+def models_page():
+    """保存的模型列表，可以上传新数据文件打分"""
+    return render_template('models.html', models=MODELS.list(owner=_session_id()), score_job=request.args.get('job'))
+
+
+@app.route('/models/save', methods=['POST'])
+def save_model():
+    """把分析结果缓存中的模型保存到模型注册表；表单回传训练时的全部参数，用于查找缓存的结果"""
+    head = LINEAGE.head(_session_id())
+    if head is None:
+        flash("请先上传数据文件")
+        return redirect(url_for('index'))
+    form = request.form
+    features = form.getlist('features')
+    ml_algorithm = form.get('ml_algorithm')
+    if ml_algorithm not in SCORABLE:
+        flash("只有回归、分类和K均值聚类模型可以保存")
+        return redirect(url_for('analyze'))
+    test_size = float(form.get('test_size') or 20) / 100
+    try:
+        params = algorithm_params(ml_algorithm, dict(form.to_dict(), test_size=test_size))
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('analyze'))
+    target = form.get('target_column') if ml_algorithm in SUPERVISED else None
+    key = RESULTS.make_key(head.id, ml_algorithm, features, target, params)
+    result = RESULTS.get(key)
+    if result is None or result.get('model') is None:
+        flash("分析结果已过期，请重新训练后再保存模型")
+        return redirect(url_for('analyze'))
+    info = MODELS.save(result['model'], result['scaler'], features, ml_algorithm, target, result['metrics'],
+                       name=form.get('model_name'), owner=_session_id())
+    flash(f"模型已保存: {info['name']}", "success")
+    return redirect(url_for('models_page'))
+
+
+@app.route('/models/<model_id>/score', methods=['POST'])
+def score_model(model_id):
+    """上传 CSV 或 Parquet 文件，在后台分块打分并写出带预测值的文件"""
+    info = MODELS.info(model_id, owner=_session_id())
+    if info is None:
+        flash("模型不存在")
+        return redirect(url_for('models_page'))
+    f = request.files.get('datafile')
+    filename = secure_filename(f.filename) if f else ''
+    stem, extension = os.path.splitext(filename)
+    export_format = request.form.get('format', 'csv')
+    if extension.lower() not in ('.csv', '.parquet') or export_format not in ('csv', 'parquet'):
+        flash("请上传 CSV 或 Parquet 文件，并选择 CSV 或 Parquet 输出格式")
+        return redirect(url_for('models_page'))
+
+    folder = os.path.join(app.config['UPLOAD_FOLDER'], 'scoring')
+    os.makedirs(folder, exist_ok=True)
+    source = os.path.join(folder, f"{uuid.uuid4().hex}{extension.lower()}")
+    f.save(source)
+    output = f"{stem}_scored_{datetime.now().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    job = EXPORT_JOBS.submit('score', _score_upload, model_id, _session_id(), source, output)
+    job.owner = _session_id()
+    return redirect(url_for('models_page', job=job.id))
+
+
+def _score_upload(job, model_id, owner, source, filename):
+    try:
+        entry = MODELS.load(model_id, owner)
+        os.makedirs('exports', exist_ok=True)
+        report = score_file(entry, source, os.path.join('exports', filename), app.config['STREAM_CHUNK_ROWS'],
+                            progress=job.update)
+    finally:
+        os.remove(source)
+    return dict(report, filename=filename)
+
+
+@app.route('/models/<model_id>/delete', methods=['POST'])
+def delete_model(model_id):
+    try:
+        MODELS.delete(model_id, owner=_session_id())
+    except KeyError:
+        flash("模型不存在")
+    return redirect(url_for('models_page'))
+
+
 @app.route('/visualize', methods=['GET'])
 def visualize_page():
-    global GLOBAL_DF, CLEANED_DF, FILENAME
-
     # 决定使用哪个 DataFrame 进行可视化
-    df_to_visualize = None
-    if CLEANED_DF is not None:
-        df_to_visualize = CLEANED_DF
-    elif GLOBAL_DF is not None:
-        df_to_visualize = GLOBAL_DF
-    
+    df_to_visualize = _current_data()
+
     if df_to_visualize is None:
         flash("请先上传并处理数据。", "warning")
         return redirect(url_for('index'))
 
     try:
-        visualizer = DataVisualizer(df_to_visualize.copy()) # 使用副本以防意外修改
+        visualizer = DataVisualizer(df_to_visualize, profile=_current_profile())  # 可视化只读取数据，无需副本
         all_columns = visualizer.get_available_columns()
         numeric_columns = visualizer.get_numeric_columns()
         categorical_columns = visualizer.get_categorical_columns()
@@ -521,21 +873,15 @@ def visualize_page():
         return redirect(url_for('index')) # 或者重定向到上一个有效页面
 
     return render_template('visualize.html',
-                           filename=FILENAME,
+                           filename=_raw_meta().get('filename'),
                            all_columns=all_columns,
                            numeric_columns=numeric_columns,
                            categorical_columns=categorical_columns)
 
 @app.route('/generate_visualization_plot', methods=['POST'])
 def generate_visualization_plot():
-    global GLOBAL_DF, CLEANED_DF
+    df_to_visualize = _current_data()
 
-    df_to_visualize = None
-    if CLEANED_DF is not None:
-        df_to_visualize = CLEANED_DF
-    elif GLOBAL_DF is not None:
-        df_to_visualize = GLOBAL_DF
-    
     if df_to_visualize is None:
         return jsonify({"error": "没有可用的数据进行可视化。"}), 400
 
@@ -547,7 +893,7 @@ def generate_visualization_plot():
         # 从params中提取通用参数
         title = params.pop('chart_title', None) # chart_title 是通用参数
 
-        visualizer = DataVisualizer(df_to_visualize.copy())
+        visualizer = DataVisualizer(df_to_visualize, profile=_current_profile())
         fig = None
 
         # 根据 chart_type 调用相应的方法
@@ -633,4 +979,4 @@ def generate_visualization_plot():
         return jsonify({"error": f"生成图表时发生内部错误: {str(e)}"}), 500
     
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
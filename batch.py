@@ -0,0 +1,296 @@
+# 命令行批处理：对目录中的文件并行执行 上传解析 -> 清洗 -> 分析 -> 导出 流水线，或用保存的模型为文件打分
+# 用法: python batch.py run pipeline.json data/ out/ --workers 4
+#       python batch.py score <模型 id> new_data.csv predictions.parquet
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+import config
+from modules import DataUploader, DataCleaning, CleaningPlan, DataAnalyzer, DataExporter, ModelRegistry
+from modules.streaming import score_file
+
+# 与 app.py 一致：开启写时复制，清洗未修改的列不复制
+pd.set_option('mode.copy_on_write', True)
+
+# 分析方法 -> (DataAnalyzer 方法名, 是否需要目标列)
+ANALYSES = {
+    'kmeans': ('cluster_kmeans', False),
+    'dbscan': ('cluster_dbscan', False),
+    'classify': ('classify', True),
+    'predict': ('predict', True),
+    'pca': ('dimensionality_reduction', False),
+}
+# 分析结果中不写入报告的模型、数据表和逐行预测值
+RESULT_OBJECTS = {'model', 'data', 'reduced_data', 'y_test', 'y_pred'}
+EXPORTS = {'csv': ('.csv', 'export_to_csv'), 'excel': ('.xlsx', 'export_to_excel'),
+           'parquet': ('.parquet', 'export_to_parquet')}
+
+
+def load_spec(path):
+    """
+    读取并检查流水线配置，返回规范化后的字典
+
+    配置示例:
+        {
+            "pattern": "*.csv",
+            "cleaning": [{"missing_values": {"method": "fill", "strategy": "median"},
+                          "duplicates": {"method": "drop"}}],
+            "analysis": [{"method": "kmeans", "features": ["age", "income"], "n_clusters": 4}],
+            "export": {"format": "parquet", "suffix": "_cleaned"}
+        }
+    cleaning 为 apply_cleaning_rules 的规则(或依次执行的规则列表)；
+    analysis 中省略 features 时使用除目标列外的全部数值列；省略 export 时不导出。
+    """
+    with open(path, encoding='utf-8') as f:
+        spec = json.load(f)
+    cleaning = spec.get('cleaning') or []
+    if isinstance(cleaning, dict):
+        cleaning = [cleaning]
+    for rules in cleaning:
+        CleaningPlan(rules)
+    analysis = spec.get('analysis') or []
+    for step in analysis:
+        if step.get('method') not in ANALYSES:
+            raise ValueError(f"不支持的分析方法: {step.get('method')}")
+        if ANALYSES[step['method']][1] and not step.get('target'):
+            raise ValueError(f"分析方法 {step['method']} 需要指定 target")
+    export = spec.get('export')
+    if export is not None and export.get('format', 'csv') not in EXPORTS:
+        raise ValueError(f"不支持的导出格式: {export.get('format')}")
+    return {'pattern': spec.get('pattern', '*.csv'), 'cleaning': cleaning, 'analysis': analysis,
+            'export': export}
+
+
+def find_files(input_dir, pattern):
+    """input_dir 中文件名匹配 pattern 的文件，按文件名排序"""
+    names = sorted(name for name in os.listdir(input_dir)
+                   if fnmatch.fnmatch(name, pattern) and os.path.isfile(os.path.join(input_dir, name)))
+    return [os.path.join(input_dir, name) for name in names]
+
+
+def process_file(path, spec, output_dir):
+    """
+    在工作进程中处理单个文件，任何异常都记录在返回结果中，不影响其他文件
+
+    返回:
+        {'file', 'status': 'ok'/'failed', 'error', 'rows_in', 'rows_out', 'output',
+         'seconds': {各阶段耗时}, 'plan': 清洗计划说明, 'analysis': 各分析的评估指标}
+    """
+    record = _new_record(path)
+    start = time.perf_counter()
+    stage = 'load'
+    try:
+        uploader = DataUploader(memory_limit_mb=config.INGEST_MEMORY_LIMIT_MB,
+                                chunked_threshold_mb=config.CHUNKED_INGEST_THRESHOLD_MB)
+        data = uploader.load(path)
+        record['rows_in'] = len(data)
+        stage = _lap(record, stage, 'clean', start)
+
+        for rules in spec['cleaning']:
+            cleaner = DataCleaning(data)
+            data = cleaner.apply_cleaning_rules(rules)
+            record['plan'].extend(cleaner.plan.explain())
+        record['rows_out'] = len(data)
+        stage = _lap(record, stage, 'analyze', start)
+
+        for step in spec['analysis']:
+            record['analysis'].append(_analyze(data, step))
+        stage = _lap(record, stage, 'export', start)
+
+        export = spec['export']
+        if export is not None:
+            extension, method = EXPORTS[export.get('format', 'csv')]
+            stem = os.path.splitext(os.path.basename(path))[0]
+            filename = f"{stem}{export.get('suffix', '_cleaned')}{extension}"
+            record['output'] = getattr(DataExporter(data), method)(filename, folder=output_dir)
+        _lap(record, stage, None, start)
+    except Exception as e:
+        _lap(record, stage, None, start)
+        record['status'] = 'failed'
+        record['error'] = f"{stage}: {type(e).__name__}: {e}"
+    record['seconds']['total'] = sum(record['seconds'].values())
+    return record
+
+
+def _new_record(path):
+    return {'file': path, 'status': 'ok', 'error': None, 'rows_in': None, 'rows_out': None,
+            'output': None, 'seconds': {}, 'plan': [], 'analysis': []}
+
+
+def _lap(record, stage, next_stage, start):
+    """记录 stage 阶段的耗时，返回下一个阶段"""
+    now = time.perf_counter()
+    record['seconds'][stage] = now - start - sum(record['seconds'].values())
+    return next_stage
+
+
+def _analyze(data, step):
+    params = dict(step)
+    method = params.pop('method')
+    name = ANALYSES[method][0]
+    if 'features' not in params:
+        numeric = data.select_dtypes(include='number').columns
+        params['features'] = [column for column in numeric if column != params.get('target')]
+    result = getattr(DataAnalyzer(data), name)(**params)
+    metrics = {key: _json_safe(value) for key, value in result.items() if key not in RESULT_OBJECTS}
+    return dict({key: value for key, value in metrics.items() if value is not None}, method=method)
+
+
+def _json_safe(value):
+    """只保留可写入 JSON 报告的评估指标：数值、短数组和由它们组成的字典，其余(模型、数据表)返回 None"""
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray) and value.size <= 1000:
+        return value.tolist()
+    if isinstance(value, dict):
+        items = {str(key): _json_safe(item) for key, item in value.items()}
+        return {key: item for key, item in items.items() if item is not None} or None
+    return None
+
+
+def run_batch(files, spec, output_dir, workers, on_result=None):
+    """
+    用进程池并行处理 files，返回与 files 顺序一致的结果列表
+
+    单个文件的异常在工作进程内捕获；工作进程崩溃(如内存不足被系统终止)时整个进程池不可用，
+    且无法判断是哪个文件导致的，未完成的文件改为逐个在单独的进程池中重试。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+    suspects = _run_pool(files, spec, output_dir, workers, results, on_result)
+    for path in suspects:
+        for crashed in _run_pool([path], spec, output_dir, 1, results, on_result):
+            record = dict(_new_record(crashed), status='failed', error="工作进程异常退出(可能内存不足)")
+            results[crashed] = record
+            if on_result is not None:
+                on_result(record)
+    return [results[path] for path in files]
+
+
+def _run_pool(files, spec, output_dir, workers, results, on_result):
+    """提交 files 并收集结果，返回因进程池崩溃而没有结果的文件"""
+    broken = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_file, path, spec, output_dir): path for path in files}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except BrokenProcessPool:
+                broken.append(futures[future])
+                continue
+            results[record['file']] = record
+            if on_result is not None:
+                on_result(record)
+    return [path for path in files if path in broken]
+
+
+def summarize(results, wall_seconds):
+    ok = [record for record in results if record['status'] == 'ok']
+    busy = sum(record['seconds'].get('total', 0) for record in results)
+    return {
+        'files': len(results),
+        'succeeded': len(ok),
+        'failed': len(results) - len(ok),
+        'rows_in': sum(record['rows_in'] or 0 for record in ok),
+        'rows_out': sum(record['rows_out'] or 0 for record in ok),
+        'wall_seconds': wall_seconds,
+        'busy_seconds': busy,
+    }
+
+
+def _print_result(record):
+    name = os.path.basename(record['file'])
+    seconds = record['seconds'].get('total', 0)
+    if record['status'] == 'ok':
+        print(f"[完成] {name}: {record['rows_in']} -> {record['rows_out']} 行, {seconds:.2f} 秒", flush=True)
+    else:
+        print(f"[失败] {name}: {record['error']}", flush=True)
+
+
+def score(args):
+    """用保存的模型分块为一个文件打分"""
+    registry = ModelRegistry(args.models_dir)
+    try:
+        entry = registry.load(args.model_id)
+    except KeyError:
+        print(f"模型不存在: {args.model_id}", file=sys.stderr)
+        return 2
+    print(f"模型 {entry['info']['name']}: 特征 {', '.join(entry['features'])}", flush=True)
+    try:
+        report = score_file(entry, args.input, args.output, args.chunk_rows, column=args.column,
+                            progress=lambda rows, fraction: print(f"已处理 {rows} 行 ({fraction:.0%})", flush=True))
+    except (OSError, ValueError) as e:
+        print(f"打分失败: {e}", file=sys.stderr)
+        return 1
+    print(f"完成: {report['rows']} 行，其中 {report['scored']} 行有预测值，耗时 {report['seconds']:.2f} 秒；"
+          f"输出: {args.output}")
+    return 0
+
+
+def list_models(args):
+    for info in ModelRegistry(args.models_dir).list():
+        target = f" -> {info['target']}" if info['target'] else ''
+        print(f"{info['id']}  {info['name']}  [{info['algorithm']}] {', '.join(info['features'])}{target}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对目录中的文件批量执行清洗、分析、导出流水线")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help="按流水线配置处理目录中的文件")
+    run.add_argument('spec', help="流水线配置 JSON 文件")
+    run.add_argument('input_dir', help="输入文件所在目录")
+    run.add_argument('output_dir', help="导出文件和报告的目录")
+    run.add_argument('--pattern', help="文件名匹配模式，默认使用配置中的 pattern")
+    run.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="并行进程数")
+    run.add_argument('--report', help="JSON 报告路径，默认为 output_dir/batch_report.json")
+    score_parser = commands.add_parser('score', help="用保存的模型为 CSV/Parquet 文件打分")
+    score_parser.add_argument('model_id', help="模型 id，见 models 命令")
+    score_parser.add_argument('input', help="输入的 CSV 或 Parquet 文件")
+    score_parser.add_argument('output', help="输出的 CSV 或 Parquet 文件，包含原有的列和预测值列")
+    score_parser.add_argument('--column', default='prediction', help="预测值列名")
+    score_parser.add_argument('--chunk-rows', type=int, default=config.STREAM_CHUNK_ROWS, help="每块读取的行数")
+    score_parser.add_argument('--models-dir', default=config.MODEL_REGISTRY_DIR, help="模型注册表目录")
+    models_parser = commands.add_parser('models', help="列出保存的模型")
+    models_parser.add_argument('--models-dir', default=config.MODEL_REGISTRY_DIR, help="模型注册表目录")
+    args = parser.parse_args(argv)
+    if args.command == 'score':
+        return score(args)
+    if args.command == 'models':
+        return list_models(args)
+
+    try:
+        spec = load_spec(args.spec)
+    except (OSError, ValueError) as e:
+        print(f"流水线配置无效: {e}", file=sys.stderr)
+        return 2
+    files = find_files(args.input_dir, args.pattern or spec['pattern'])
+    if not files:
+        print("没有匹配的输入文件", file=sys.stderr)
+        return 2
+
+    print(f"处理 {len(files)} 个文件，{args.workers} 个进程", flush=True)
+    start = time.perf_counter()
+    results = run_batch(files, spec, args.output_dir, args.workers, on_result=_print_result)
+    summary = summarize(results, time.perf_counter() - start)
+
+    report_path = args.report or os.path.join(args.output_dir, 'batch_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({'summary': summary, 'files': results}, f, ensure_ascii=False, indent=2)
+    print(f"成功 {summary['succeeded']} 个，失败 {summary['failed']} 个；"
+          f"耗时 {summary['wall_seconds']:.2f} 秒(各文件合计 {summary['busy_seconds']:.2f} 秒)；报告: {report_path}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# 监督学习的评估：单次训练/测试划分(不同随机种子) vs 并行 k 折交叉验证
+# 用法: python -m benchmarks.cross_validation --rows 2000 --workers 4
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.datasets import make_classification
+
+from modules import DataAnalyzer
+
+
+def make_frame(rows, features=8):
+    """分类目标 label(10% 标签噪声)和带噪声的线性回归目标 value"""
+    X, labels = make_classification(n_samples=rows, n_features=features, flip_y=0.1, random_state=0)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(X, columns=[f'x{i}' for i in range(features)])
+    df['label'] = labels
+    df['value'] = X @ rng.normal(size=features) + rng.normal(scale=2.0, size=rows)
+    return df
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    features = [column for column in df.columns if column.startswith('x')]
+    print(f"{args.rows} 行, {len(features)} 个特征, CPU 核数 {os.cpu_count()}")
+
+    for method, target, metric in (('random_forest_classification', 'label', 'accuracy'),
+                                   ('linear_regression', 'value', 'r2')):
+        analyzer = DataAnalyzer(df)
+        if method == 'random_forest_classification':
+            scores = [analyzer.classify(features, target, random_state=seed)['accuracy'] for seed in range(10)]
+        else:
+            scores = [analyzer.predict(features, target, random_state=seed)['r2'] for seed in range(10)]
+        print(f"{method} 单次划分 10 个随机种子: {metric} {np.mean(scores):.4f}, "
+              f"范围 {np.min(scores):.4f} - {np.max(scores):.4f}")
+        for workers in sorted({1, args.workers}):
+            result, seconds = timed(analyzer.cross_validate, features, target, method, args.folds, workers=workers)
+            summary = result['metrics'][metric]
+            fits = ', '.join(f"{fold['fit_seconds']:.2f}" for fold in result['folds'])
+            print(f"  {args.folds} 折交叉验证 {workers} 个进程: {seconds:6.2f} 秒  {metric} {summary['mean']:.4f}"
+                  f"±{summary['std']:.4f}  各折训练 [{fits}] 秒")
+
+
+if __name__ == '__main__':
+    main()
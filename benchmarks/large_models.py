@@ -0,0 +1,68 @@
+# 大数据集的 K 均值和 PCA：全量训练 vs 小批量训练(MiniBatchKMeans / IncrementalPCA) 的速度、内存和质量
+# 用法: python -m benchmarks.large_models --rows 1000000
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.datasets import make_blobs
+from sklearn.metrics import adjusted_rand_score
+
+from modules.scalable import fit_kmeans, fit_pca
+from modules.silhouette import silhouette
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def peak_mb(func, *args, **kwargs):
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def subspace_similarity(a, b):
+    """两组主成分张成的子空间的相似度(主夹角余弦的平均值，1 表示相同)"""
+    return float(np.mean(np.linalg.svd(a @ b.T, compute_uv=False)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--features', type=int, default=10)
+    parser.add_argument('--clusters', type=int, default=8)
+    args = parser.parse_args()
+
+    X, _ = make_blobs(n_samples=args.rows, n_features=args.features, centers=args.clusters, cluster_std=2.0,
+                      random_state=0)
+    X = (X - X.mean(axis=0)) / X.std(axis=0)
+    print(f"{args.rows} 行, {args.features} 个特征, 矩阵 {X.nbytes / (1024 * 1024):.1f} MB")
+
+    runs = {}
+    for method in ('full', 'minibatch'):
+        (model, labels, _), seconds = timed(fit_kmeans, X, args.clusters, method)
+        memory = peak_mb(fit_kmeans, X, args.clusters, method)
+        score = silhouette(X, labels, 'sampled')['score']
+        runs[method] = labels
+        print(f"K均值 {method:9s}: {seconds:6.2f} 秒  峰值 {memory:7.1f} MB  惯性 {model.inertia_:14.1f}  "
+              f"轮廓系数(抽样) {score:.4f}")
+    print(f"两种方式聚类结果的调整兰德指数: {adjusted_rand_score(runs['full'], runs['minibatch']):.4f}")
+
+    components = {}
+    n_components = min(3, args.features)
+    for method in ('full', 'minibatch'):
+        (model, _, _), seconds = timed(fit_pca, X, n_components, method)
+        memory = peak_mb(fit_pca, X, n_components, method)
+        components[method] = model.components_
+        ratio = ', '.join(f'{value:.4f}' for value in model.explained_variance_ratio_)
+        print(f"PCA   {method:9s}: {seconds:6.2f} 秒  峰值 {memory:7.1f} MB  解释方差比例 [{ratio}]")
+    print(f"两种方式主成分子空间的相似度: {subspace_similarity(components['full'], components['minibatch']):.6f}")
+
+
+if __name__ == '__main__':
+    main()
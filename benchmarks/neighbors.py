@@ -0,0 +1,66 @@
+# DBSCAN 多次尝试 eps：每次重新搜索近邻 vs 复用按最大 eps 计算的一个半径近邻图
+# 用法: python -m benchmarks.neighbors --rows 30000
+import argparse
+import time
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.datasets import make_blobs
+
+from modules.neighbors import radius_graph, estimate_graph_mb, k_distances, suggest_eps
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=30000)
+    parser.add_argument('--features', type=int, default=3)
+    parser.add_argument('--min-samples', type=int, default=5)
+    args = parser.parse_args()
+
+    X, _ = make_blobs(n_samples=args.rows, n_features=args.features, centers=5, random_state=0)
+    X = (X - X.mean(axis=0)) / X.std(axis=0)
+    print(f"{args.rows} 行, {args.features} 个特征")
+
+    (eps, _), seconds = timed(lambda: suggest_eps(k_distances(X, args.min_samples)))
+    print(f"建议 eps {eps:.4f}: {seconds:6.2f} 秒")
+
+    eps_values = np.linspace(eps / 2, eps * 2, 4)
+    radius = eps_values.max()
+    estimate, seconds = timed(estimate_graph_mb, X, radius)
+    print(f"估计近邻图 {estimate:8.1f} MB: {seconds:6.2f} 秒")
+
+    plain = []
+    start = time.perf_counter()
+    for value in eps_values:
+        plain.append(DBSCAN(eps=value, min_samples=args.min_samples).fit_predict(X))
+    print(f"{len(eps_values)} 个 eps 每次搜索近邻: {time.perf_counter() - start:6.2f} 秒")
+
+    graph, build_seconds = timed(radius_graph, X, radius)
+    start = time.perf_counter()
+    reused = [DBSCAN(eps=value, min_samples=args.min_samples, metric='precomputed').fit_predict(graph)
+              for value in eps_values]
+    fit_seconds = time.perf_counter() - start
+    size = (graph.data.nbytes + graph.indices.nbytes + graph.indptr.nbytes) / (1024 * 1024)
+    print(f"{len(eps_values)} 个 eps 复用近邻图:   {build_seconds + fit_seconds:6.2f} 秒 "
+          f"(建图 {build_seconds:.2f} 秒, 实际 {size:.1f} MB)")
+    print(f"结果相同: {all(np.array_equal(a, b) for a, b in zip(plain, reused))}")
+
+    # 同一个 eps 重复训练(例如调整 min_samples)时，近邻图的半径与 eps 相同
+    min_samples_values = (args.min_samples, args.min_samples * 2, args.min_samples * 4)
+    _, seconds = timed(lambda: [DBSCAN(eps=eps, min_samples=value).fit_predict(X) for value in min_samples_values])
+    print(f"eps={eps:.4f} {len(min_samples_values)} 个 min_samples 每次搜索近邻: {seconds:6.2f} 秒")
+    graph, build_seconds = timed(radius_graph, X, eps)
+    _, fit_seconds = timed(lambda: [DBSCAN(eps=eps, min_samples=value, metric='precomputed').fit_predict(graph)
+                                    for value in min_samples_values])
+    print(f"eps={eps:.4f} {len(min_samples_values)} 个 min_samples 复用近邻图:   {build_seconds + fit_seconds:6.2f} 秒 "
+          f"(建图 {build_seconds:.2f} 秒, 之后每次 {fit_seconds / len(min_samples_values):.2f} 秒)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# 多列异常值检测对比：逐列调用 detect_outliers vs 一次检测全部列
+# 用法: python -m benchmarks.outliers --rows 1000000 --columns 50
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.cleaner import DataCleaning
+
+
+def make_frame(rows, columns):
+    rng = np.random.default_rng(0)
+    values = rng.standard_t(df=5, size=(rows, columns))
+    return pd.DataFrame(values, columns=[f'x{i}' for i in range(columns)])
+
+
+def per_column(df, threshold):
+    """旧方式：每列提交一次表单，每次都按当前结果重新计算并生成新的数据表"""
+    cleaner = DataCleaning(df)
+    for column in df.columns:
+        cleaner.detect_outliers(column, threshold)
+    return cleaner.data
+
+
+def all_columns(df, method, threshold):
+    return DataCleaning(df).handle_outliers(list(df.columns), method, threshold)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--columns', type=int, default=50)
+    args = parser.parse_args()
+
+    pd.set_option('mode.copy_on_write', True)
+    df = make_frame(args.rows, args.columns)
+    size = df.memory_usage(deep=True).sum() / (1024 * 1024)
+    print(f"{args.rows} 行 × {args.columns} 列, 数据集大小: {size:.1f} MB")
+
+    result, seconds = timed(per_column, df, 3)
+    print(f"逐列 Z 分数 ({args.columns} 次):    {seconds:6.2f} 秒，保留 {len(result)} 行")
+    for method, threshold in [('zscore', 3), ('iqr', 1.5), ('mad', 3.5)]:
+        result, seconds = timed(all_columns, df, method, threshold)
+        print(f"一次检测全部列 ({method:6s}):   {seconds:6.2f} 秒，保留 {len(result)} 行")
+
+
+if __name__ == '__main__':
+    main()
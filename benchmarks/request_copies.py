@@ -0,0 +1,82 @@
+# 每次请求的内存分配对比：旧的整表复制 vs 写时复制的浅复制
+# 用法: python -m benchmarks.request_copies --rows 5000000
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from modules.analyzer import DataAnalyzer
+from modules.visualizer import DataVisualizer
+
+
+def make_frame(rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'x1': rng.normal(size=rows),
+        'x2': rng.normal(size=rows),
+        'x3': rng.normal(size=rows),
+        'count': rng.integers(0, 1000, size=rows),
+        'category': pd.Categorical(rng.choice(['A', 'B', 'C'], size=rows)),
+    })
+
+
+def visualize_before(df):
+    visualizer = DataVisualizer(df.copy())
+    visualizer.get_numeric_columns()
+
+
+def visualize_after(df):
+    visualizer = DataVisualizer(df)
+    visualizer.get_numeric_columns()
+
+
+def analyze_before(df, labels):
+    # 旧的 /analyze：df_converted 和 df_for_ml 各复制一次整表，聚类结果再复制一次
+    df_converted = df.copy()
+    df_for_ml = df.copy()
+    analyzer = DataAnalyzer(df_for_ml)
+    result_df = analyzer.data.copy()
+    result_df['cluster'] = labels
+    del df_converted
+
+
+def analyze_after(df, labels):
+    df_for_ml = df.copy(deep=False)
+    analyzer = DataAnalyzer(df_for_ml)
+    result_df = analyzer.data.copy(deep=False)
+    result_df['cluster'] = labels
+
+
+def peak_allocation(func, *args):
+    """返回执行 func 期间新分配内存的峰值(MB)"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000000)
+    args = parser.parse_args()
+
+    pd.set_option('mode.copy_on_write', True)
+    df = make_frame(args.rows)
+    labels = np.zeros(args.rows, dtype=np.int32)
+    size = df.memory_usage(deep=True).sum() / (1024 * 1024)
+    print(f"行数: {args.rows}, 数据集大小: {size:.1f} MB")
+
+    for name, before, after, extra in [
+        ('/visualize', visualize_before, visualize_after, ()),
+        ('/analyze', analyze_before, analyze_after, (labels,)),
+    ]:
+        mb_before = peak_allocation(before, df, *extra)
+        mb_after = peak_allocation(after, df, *extra)
+        print(f"{name:12s} 复制前: {mb_before:8.1f} MB  写时复制: {mb_after:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# 轮廓系数对比：sklearn silhouette_score vs 分块精确计算 vs 分层抽样估计
+# 用法: python -m benchmarks.silhouette --rows 200000
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.datasets import make_blobs
+from sklearn.metrics import silhouette_score
+
+from modules.silhouette import silhouette
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def peak_mb(func, *args, **kwargs):
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--exact-max-rows', type=int, default=50000, help="超过该行数时跳过精确计算")
+    args = parser.parse_args()
+
+    X, _ = make_blobs(n_samples=args.rows, n_features=8, centers=5, cluster_std=3.0, random_state=0)
+    labels = KMeans(n_clusters=5, n_init=1, random_state=0).fit_predict(X)
+    print(f"{args.rows} 行, 8 个特征, 5 个簇")
+
+    if args.rows <= args.exact_max_rows:
+        score, seconds = timed(silhouette_score, X, labels)
+        print(f"sklearn silhouette_score:  {seconds:7.2f} 秒  峰值 {peak_mb(silhouette_score, X, labels):7.1f} MB  "
+              f"{score:.4f}")
+        info, seconds = timed(silhouette, X, labels, 'exact')
+        print(f"分块精确计算:              {seconds:7.2f} 秒  峰值 {peak_mb(silhouette, X, labels, 'exact'):7.1f} MB  "
+              f"{info['score']:.4f}")
+    for sample_size in (1000, 2000, 5000):
+        info, seconds = timed(silhouette, X, labels, 'sampled', sample_size=sample_size)
+        memory = peak_mb(silhouette, X, labels, 'sampled', sample_size=sample_size)
+        print(f"分层抽样 {sample_size:5d} 个点:      {seconds:7.2f} 秒  峰值 {memory:7.1f} MB  "
+              f"{info['score']:.4f}  95% 置信区间 [{info['ci_low']:.4f}, {info['ci_high']:.4f}]")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# 参数搜索对比：逐个提交(每次重新标准化特征) vs 共享特征矩阵的并行搜索
+# 用法: python -m benchmarks.sweeps --rows 10000 --workers 4
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.datasets import make_blobs
+
+from modules import DataAnalyzer
+
+
+def make_frame(rows, features=8):
+    X, labels = make_blobs(n_samples=rows, n_features=features, centers=5, random_state=0)
+    df = pd.DataFrame(X, columns=[f'x{i}' for i in range(features)])
+    df['label'] = labels
+    return df
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def one_by_one_kmeans(df, features, k_values):
+    """旧方式：每个 k 提交一次分析，每次都重新标准化特征矩阵"""
+    return [DataAnalyzer(df).cluster_kmeans(features, n_clusters=k)['silhouette_score'] for k in k_values]
+
+
+def one_by_one_forest(df, features, depths, trees):
+    """旧方式：每组参数单独训练一次，只有一个训练/测试划分"""
+    return [DataAnalyzer(df).classify(features, 'label')['accuracy'] for _ in depths for _ in trees]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    features = [column for column in df.columns if column != 'label']
+    k_values = range(2, 10)
+    print(f"{args.rows} 行, {len(features)} 个特征, CPU 核数 {os.cpu_count()}")
+
+    scores, seconds = timed(one_by_one_kmeans, df, features, k_values)
+    print(f"K均值 k=2..9 逐个提交:          {seconds:6.2f} 秒  最佳 k={k_values[int(np.argmax(scores))]}")
+    for workers in sorted({1, args.workers}):
+        result, seconds = timed(DataAnalyzer(df).sweep_kmeans, features, k_values, workers=workers)
+        print(f"K均值 k=2..9 搜索 {workers} 个进程:     {seconds:6.2f} 秒  最佳 k={result['best']['n_clusters']}")
+
+    eps_values = np.linspace(0.5, 3.0, 6)
+    for workers in sorted({1, args.workers}):
+        result, seconds = timed(DataAnalyzer(df).sweep_dbscan, features, eps_values, workers=workers)
+        best = result['best']
+        print(f"DBSCAN 6 个 eps 搜索 {workers} 个进程:  {seconds:6.2f} 秒  最佳 eps={best['eps'] if best else None}")
+
+    depths, trees = (4, 8), (50, 100)
+    _, seconds = timed(one_by_one_forest, df, features, depths, trees)
+    print(f"随机森林 4 组参数逐个训练:      {seconds:6.2f} 秒  (单次划分)")
+    for workers in sorted({1, args.workers}):
+        result, seconds = timed(DataAnalyzer(df).sweep_forest, features, 'label', depths, trees, workers=workers)
+        best = result['best']
+        print(f"随机森林 4 组参数 3 折 {workers} 个进程: {seconds:6.2f} 秒  最佳 深度={best['max_depth']} "
+              f"树={best['n_estimators']} 准确率 {best['score_mean']:.4f}±{best['score_std']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,34 @@
 #配置：UPLOAD_FOLDER、SECRET_KEY 等
+
+# 数据导入
+CHUNKED_INGEST_THRESHOLD_MB = 50  # CSV 文件超过该大小时改用分块读取
+INGEST_MEMORY_LIMIT_MB = 2048  # 单个上传文件解析后允许占用的内存上限
+DATASET_CACHE_DIR = 'uploads/cache'  # 解析结果的列式缓存目录
+DATASET_CACHE_MAX_MB = 1024  # 缓存目录容量上限，超出后按 LRU 淘汰
+INGEST_WORKERS = 4  # 后台并行解析上传文件的线程数
+
+# 数据集存储
+DATASET_SPILL_DIR = 'uploads/spill'  # 超出内存预算的数据集写入的目录
+DATASET_MEMORY_BUDGET_MB = 4096  # 所有会话数据集共享的内存预算
+DATASET_MAX_VERSIONS = 50  # 每个会话保留的清洗版本数上限
+
+# 数据清洗
+CLEAN_PREVIEW_THRESHOLD_ROWS = 200000  # 超过该行数时先返回样本预览，完整清洗在后台执行
+CLEAN_PREVIEW_SAMPLE_ROWS = 10000  # 预览使用的样本行数
+CLEAN_WORKERS = 2  # 后台执行完整清洗的线程数
+
+# 数据分析
+RESULT_CACHE_MAX_ENTRIES = 64  # 分析结果缓存的条目数上限
+RESULT_CACHE_MAX_MB = 512  # 分析结果缓存(模型、图表)的内存上限
+TRAIN_WORKERS = 2  # 同时运行的模型训练子进程数，其余训练任务排队
+SWEEP_WORKERS = None  # 参数搜索的并行进程数，None 表示 CPU 核数
+NEIGHBOR_CACHE_DIR = 'uploads/neighbors'  # DBSCAN 近邻图的磁盘缓存目录
+NEIGHBOR_CACHE_MAX_MB = 512  # 近邻图缓存目录容量上限，超出后按 LRU 淘汰
+FEATURE_CACHE_DIR = 'uploads/features'  # 标准化特征矩阵和训练集/测试集划分的磁盘缓存目录
+FEATURE_CACHE_MAX_MB = 512  # 特征矩阵缓存目录容量上限，超出后按 LRU 淘汰
+MODEL_REGISTRY_DIR = 'models'  # 保存的模型所在目录
+MODEL_MAX_LOADED = 8  # 内存中保留的已加载模型数，打分时不重复读取模型文件
+
+# 数据导出
+EXPORT_WORKERS = 1  # 后台流式导出大文件的线程数
+STREAM_CHUNK_ROWS = 200000  # 流式清洗导出时每块读取的行数
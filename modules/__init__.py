@@ -1,17 +1,35 @@
 # modules/__init__.py
 
 from .uploader import DataUploader
-from .cleaner import DataCleaning
+from .cleaner import DataCleaning, CleaningPlan
 from .analyzer import DataAnalyzer
 from .data_management import DataManagement
 from .exporter import DataExporter
 from .visualizer import DataVisualizer
+from .cache import DatasetCache, ArrayCache
+from .jobs import Job, JobManager, ProcessJobManager
+from .store import DatasetStore
+from .lineage import DatasetLineage
+from .streaming import StreamingCleaner
+from .results import ResultCache
+from .registry import ModelRegistry
 
 __all__ = [
     'DataUploader',
     'DataCleaning',
+    'CleaningPlan',
     'DataAnalyzer',
     'DataManagement',
     'DataExporter',
-    'DataVisualizer'
+    'DataVisualizer',
+    'DatasetCache',
+    'ArrayCache',
+    'Job',
+    'JobManager',
+    'ProcessJobManager',
+    'DatasetStore',
+    'DatasetLineage',
+    'StreamingCleaner',
+    'ResultCache',
+    'ModelRegistry'
 ]
\ No newline at end of file
@@ -1,13 +1,17 @@
 #封装机器学习算法
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans, DBSCAN
+from sklearn.cluster import DBSCAN
 from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.metrics import mean_squared_error, accuracy_score, silhouette_score
+from sklearn.metrics import mean_squared_error, accuracy_score
+
+from modules.neighbors import GRAPH_MAX_MB, radius_graph, estimate_graph_mb, k_distances, suggest_eps
+from modules.scalable import fit_kmeans, fit_pca
+from modules.silhouette import silhouette
+from modules.sweeps import CV_METHODS, run_sweep, best_result, kmeans_task, dbscan_task, forest_task, fold_task
 
 
 class DataAnalyzer:
@@ -15,40 +19,61 @@ class DataAnalyzer:
     数据分析类：封装了聚类、分类、预测和降维等功能
     """
 
-    def __init__(self, data):
+    def __init__(self, data, neighbor_graphs=None, preprocessed=None):
         """
         初始化数据分析器
 
         参数:
-            data: pandas DataFrame 对象
+            data: pandas DataFrame 对象，分析过程中不会被修改
+            neighbor_graphs: 可选的 {特征元组: (半径, 近邻图)} 字典，在同一数据的多个分析器之间共享
+                DBSCAN 的半径近邻图；本分析器新建的近邻图也写入该字典。数据变化后调用方需要换一个字典。
+                也可以是 ArrayCache.view 等实现 get 和赋值的对象
+            preprocessed: 可选的预处理结果字典，在同一数据的多个分析器之间共享标准化后的特征矩阵、
+                标准化器和训练集/测试集划分，用法与 neighbor_graphs 相同
         """
         self.data = data
         self.model = None
         self.scaler = StandardScaler()
+        self.neighbor_graphs = {} if neighbor_graphs is None else neighbor_graphs
+        self.preprocessed = {} if preprocessed is None else preprocessed
 
     def preprocess_data(self, features, target=None, test_size=0.2, random_state=42):
         """
         数据预处理：划分训练集和测试集，并进行特征标准化
 
+        标准化后的矩阵(只读)和标准化器按特征列表缓存在 self.preprocessed 中，
+        划分只取决于行数、test_size 和 random_state，划分的行号也被缓存，所有目标列和特征共用
+
         参数:
             features: 特征列名列表
             target: 目标变量列名（分类/预测时需要）
             test_size: 测试集比例
             random_state: 随机种子
         """
-        X = self.data[features]
-        X_scaled = self.scaler.fit_transform(X)
+        key = ('features', tuple(features))
+        cached = self.preprocessed.get(key)
+        if cached is None:
+            scaler = StandardScaler()
+            X_scaled = np.ascontiguousarray(scaler.fit_transform(self.data[features]))
+            # 缓存的矩阵被多个模型共用，禁止原地修改
+            X_scaled.setflags(write=False)
+            cached = self.preprocessed[key] = (X_scaled, scaler)
+        X_scaled, self.scaler = cached
 
         if target:
             y = self.data[target]
-            X_train, X_test, y_train, y_test = train_test_split(
-                X_scaled, y, test_size=test_size, random_state=random_state
-            )
-            return X_train, X_test, y_train, y_test, X_scaled
+            split_key = ('split', len(X_scaled), test_size, random_state)
+            split = self.preprocessed.get(split_key)
+            if split is None:
+                split = self.preprocessed[split_key] = tuple(train_test_split(
+                    np.arange(len(X_scaled)), test_size=test_size, random_state=random_state
+                ))
+            train_index, test_index = split
+            return X_scaled[train_index], X_scaled[test_index], y.iloc[train_index], y.iloc[test_index], X_scaled
 
         return X_scaled
 
-    def cluster_kmeans(self, features, n_clusters=3, random_state=42):
+    def cluster_kmeans(self, features, n_clusters=3, random_state=42, silhouette_mode='auto', method='auto'):
         """
         K-means聚类
 
@@ -56,31 +81,35 @@ class DataAnalyzer:
             features: 用于聚类的特征列名列表
             n_clusters: 聚类数量
             random_state: 随机种子
+            silhouette_mode: 轮廓系数的计算方式，见 modules.silhouette.silhouette；
+                'auto' 在大数据集上改用抽样估计，结果中 'silhouette' 给出置信区间
+            method: 'full' 使用 KMeans，'minibatch' 使用 MiniBatchKMeans，'auto' 按行数选择
 
         返回:
             带有聚类标签的DataFrame
         """
         X_scaled = self.preprocess_data(features)
 
-        # 训练K-means模型
-        self.model = KMeans(n_clusters=n_clusters, random_state=random_state)
-        cluster_labels = self.model.fit_predict(X_scaled)
+        # 训练K-means模型(大数据集上使用小批量版本)
+        self.model, cluster_labels, method = fit_kmeans(X_scaled, n_clusters, method, random_state)
 
         # 计算轮廓系数评估聚类效果
-        silhouette_avg = silhouette_score(X_scaled, cluster_labels)
+        silhouette_info = silhouette(X_scaled, cluster_labels, silhouette_mode, random_state=random_state)
 
-        # 将聚类结果添加到原始数据中
-        result_df = self.data.copy()
+        # 将聚类结果添加到原始数据中(浅复制，只新增一列，不复制原有数据)
+        result_df = self.data.copy(deep=False)
         result_df['cluster'] = cluster_labels
 
         return {
             'model': self.model,
             'data': result_df,
-            'silhouette_score': silhouette_avg,
-            'cluster_centers': self.model.cluster_centers_
+            'silhouette_score': silhouette_info['score'],
+            'silhouette': silhouette_info,
+            'cluster_centers': self.model.cluster_centers_,
+            'method': method
         }
 
-    def cluster_dbscan(self, features, eps=0.5, min_samples=5):
+    def cluster_dbscan(self, features, eps=0.5, min_samples=5, silhouette_mode='auto'):
         """
         DBSCAN聚类(密度聚类)
 
@@ -88,32 +117,77 @@ class DataAnalyzer:
             features: 用于聚类的特征列名列表
             eps: 邻域半径
             min_samples: 核心对象的最小样本数
+            silhouette_mode: 轮廓系数的计算方式，见 cluster_kmeans
 
         返回:
             带有聚类标签的DataFrame
         """
         X_scaled = self.preprocess_data(features)
 
-        # 训练DBSCAN模型
-        self.model = DBSCAN(eps=eps, min_samples=min_samples)
-        cluster_labels = self.model.fit_predict(X_scaled)
+        # 训练DBSCAN模型：使用缓存的半径近邻图(半径不小于 eps 时)，不再重新搜索近邻；
+        # 近邻图过大时直接在特征矩阵上聚类
+        graph = self.neighbor_graph(features, eps, X_scaled)
+        if graph is None:
+            self.model = DBSCAN(eps=eps, min_samples=min_samples)
+            cluster_labels = self.model.fit_predict(X_scaled)
+        else:
+            self.model = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed')
+            cluster_labels = self.model.fit_predict(graph)
 
         # 计算轮廓系数评估聚类效果(如果不止一个聚类)
-        silhouette_avg = None
-        if len(set(cluster_labels)) > 1 and -1 not in cluster_labels:
-            silhouette_avg = silhouette_score(X_scaled, cluster_labels)
+        silhouette_info = None
+        if 1 < len(set(cluster_labels)) < len(cluster_labels) and -1 not in cluster_labels:
+            silhouette_info = silhouette(X_scaled, cluster_labels, silhouette_mode)
 
-        # 将聚类结果添加到原始数据中
-        result_df = self.data.copy()
+        # 将聚类结果添加到原始数据中(浅复制，只新增一列，不复制原有数据)
+        result_df = self.data.copy(deep=False)
         result_df['cluster'] = cluster_labels
 
         return {
             'model': self.model,
             'data': result_df,
-            'silhouette_score': silhouette_avg,
+            'silhouette_score': silhouette_info['score'] if silhouette_info else None,
+            'silhouette': silhouette_info,
             'n_clusters': len(set(cluster_labels)) - (1 if -1 in cluster_labels else 0)
         }
 
+    def neighbor_graph(self, features, radius, X_scaled=None, max_mb=GRAPH_MAX_MB):
+        """
+        标准化特征上的半径近邻图，缓存的近邻图半径不小于 radius 时直接复用，否则按 radius 重新计算并缓存
+
+        参数:
+            features: 特征列名列表
+            radius: 需要的最小半径(DBSCAN 的 eps)
+            X_scaled: 已标准化的特征矩阵，省略时重新计算
+            max_mb: 估计的近邻图超过该大小时不建图，返回 None
+        """
+        key = tuple(features)
+        cached = self.neighbor_graphs.get(key)
+        if cached is not None and cached[0] >= radius:
+            return cached[1]
+        if X_scaled is None:
+            X_scaled = self.preprocess_data(features)
+        if estimate_graph_mb(X_scaled, radius) > max_mb:
+            return None
+        graph = radius_graph(X_scaled, radius)
+        self.neighbor_graphs[key] = (radius, graph)
+        return graph
+
+    def k_distance(self, features, k=5):
+        """
+        k 距离曲线和建议的 DBSCAN eps，不运行聚类
+
+        参数:
+            features: 特征列名列表
+            k: 对应 DBSCAN 的 min_samples
+
+        返回:
+            {'k': k, 'distances': 抽样点的 k 距离(从小到大), 'eps': 曲线拐点处的距离, 'knee': 拐点位置}
+        """
+        distances = k_distances(self.preprocess_data(features), k)
+        eps, knee = suggest_eps(distances)
+        return {'k': k, 'distances': distances, 'eps': eps, 'knee': knee}
+
     def classify(self, features, target, test_size=0.2, random_state=42):
         """
         随机森林分类
@@ -198,22 +272,22 @@ class DataAnalyzer:
             'y_pred': y_pred
         }
 
-    def dimensionality_reduction(self, features, n_components=2):
+    def dimensionality_reduction(self, features, n_components=2, method='auto'):
         """
         使用PCA进行降维
 
         参数:
             features: 用于降维的特征列名列表
             n_components: 降维后的维度
+            method: 'full' 使用 PCA，'minibatch' 使用按小批量拟合的 IncrementalPCA，'auto' 按行数选择
 
         返回:
             降维后的数据和PCA模型
         """
         X_scaled = self.preprocess_data(features)
 
-        # 执行PCA降维
-        self.model = PCA(n_components=n_components)
-        X_reduced = self.model.fit_transform(X_scaled)
+        # 执行PCA降维(大数据集上按小批量增量拟合)
+        self.model, X_reduced, method = fit_pca(X_scaled, n_components, method)
 
         # 创建降维后的DataFrame
         reduced_df = pd.DataFrame(
@@ -236,5 +310,94 @@ class DataAnalyzer:
                 self.model.components_,
                 columns=features,
                 index=[f'PC{i + 1}' for i in range(n_components)]
-            )
+            ),
+            'method': method
         }
+
+    def sweep_kmeans(self, features, k_values=range(2, 11), random_state=42, workers=None, method='auto'):
+        """
+        在多个进程中并行尝试多个聚类数量，用于肘部法和轮廓系数选择 k
+
+        参数:
+            features: 用于聚类的特征列名列表
+            k_values: 要尝试的聚类数量
+            random_state: 随机种子
+            workers: 并行进程数，默认为 CPU 核数
+            method: K 均值的训练方式，见 cluster_kmeans
+
+        返回:
+            {'results': [{'n_clusters', 'inertia', 'silhouette_score', 'silhouette_margin', 'seconds'}, ...],
+             'best': 轮廓系数最高的结果}
+        """
+        X_scaled = self.preprocess_data(features)
+        grid = [{'n_clusters': int(k), 'random_state': random_state, 'method': method} for k in k_values]
+        results = run_sweep(kmeans_task, grid, X_scaled, workers=workers)
+        return {'results': results, 'best': best_result(results, 'silhouette_score')}
+
+    def sweep_dbscan(self, features, eps_values, min_samples=5, workers=None):
+        """
+        在多个进程中并行尝试多个邻域半径 eps，所有 eps 共享按最大 eps 计算的一个半径近邻图
+        (近邻图过大时各 eps 分别在特征矩阵上搜索近邻)
+
+        返回:
+            {'results': [{'eps', 'min_samples', 'n_clusters', 'noise_ratio', 'silhouette_score', 'silhouette_margin',
+                          'seconds'}, ...],
+             'best': 去掉噪声点后轮廓系数最高的结果，没有可评估的结果时为 None}
+        """
+        X_scaled = self.preprocess_data(features)
+        graph = self.neighbor_graph(features, max(eps_values), X_scaled)
+        grid = [{'eps': float(eps), 'min_samples': min_samples} for eps in eps_values]
+        results = run_sweep(dbscan_task, grid, X_scaled, graph, workers=workers)
+        return {'results': results, 'best': best_result(results, 'silhouette_score')}
+
+    def sweep_forest(self, features, target, max_depths=(None,), n_estimators=(100,), task='classification',
+                     cv=3, random_state=42, workers=None):
+        """
+        在多个进程中并行对随机森林的最大深度和树的数量做网格搜索，每组参数用 k 折交叉验证评估
+
+        参数:
+            task: 'classification'(得分为准确率) 或 'regression'(得分为 R2)
+            cv: 交叉验证折数
+
+        返回:
+            {'results': [{'max_depth', 'n_estimators', 'score_mean', 'score_std', 'seconds'}, ...],
+             'best': 平均得分最高的结果}
+        """
+        if task not in ('classification', 'regression'):
+            raise ValueError("不支持的任务类型，请使用 'classification' 或 'regression'")
+        X_scaled = self.preprocess_data(features)
+        y = self.data[target].to_numpy()
+        grid = [{'task': task, 'max_depth': depth, 'n_estimators': int(trees), 'cv': cv, 'random_state': random_state}
+                for depth in max_depths for trees in n_estimators]
+        results = run_sweep(forest_task, grid, X_scaled, y, workers=workers)
+        return {'results': results, 'best': best_result(results, 'score_mean')}
+
+    def cross_validate(self, features, target, method='random_forest_classification', cv=5, random_state=42,
+                       workers=None):
+        """
+        k 折交叉验证：在多个进程中并行训练和评估各折，所有折共用一个标准化后的特征矩阵
+
+        参数:
+            method: 'linear_regression'、'random_forest_regression' 或 'random_forest_classification'
+            cv: 折数，至少为 2
+            workers: 并行进程数，默认为 CPU 核数
+
+        返回:
+            {'folds': [{'fold', 'accuracy' 或 'mse'/'r2', 'train_rows', 'test_rows', 'fit_seconds', 'seconds'}, ...],
+             'metrics': {指标名: {'mean', 'std', 'min', 'max'}}}
+        """
+        if method not in CV_METHODS:
+            raise ValueError(f"不支持交叉验证的模型，请使用 {', '.join(CV_METHODS)}")
+        if not 2 <= cv <= len(self.data):
+            raise ValueError("交叉验证折数至少为 2，且不超过数据行数")
+        X_scaled = self.preprocess_data(features)
+        y = self.data[target].to_numpy()
+        grid = [{'method': method, 'fold': fold, 'n_splits': cv, 'random_state': random_state} for fold in range(cv)]
+        folds = run_sweep(fold_task, grid, X_scaled, y, workers=workers)
+        names = ['accuracy'] if method == 'random_forest_classification' else ['mse', 'r2']
+        metrics = {}
+        for name in names:
+            values = np.array([fold[name] for fold in folds])
+            metrics[name] = {'mean': float(values.mean()), 'std': float(values.std()),
+                             'min': float(values.min()), 'max': float(values.max())}
+        return {'folds': folds, 'metrics': metrics}
@@ -0,0 +1,297 @@
+# 数据集列式缓存
+# modules/cache.py
+import hashlib
+import io
+import mmap
+import os
+import pickle
+import re
+import struct
+import uuid
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # 未安装 pyarrow 时缓存不可用
+    pa = None
+    feather = None
+
+
+def write_frame(path, df):
+    """
+    将 DataFrame 写为未压缩的 Arrow IPC(Feather) 文件，成功返回 True。
+    先写临时文件再替换，避免并发读取到写了一半的文件；
+    无法转换为列式格式的数据(如混合类型列、非字符串列名)返回 False。
+    """
+    if feather is None:
+        return False
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    except (OSError, ValueError, TypeError, pa.ArrowException):
+        remove_file(tmp_path)
+        return False
+    return True
+
+
+def read_frame(path, columns=None):
+    """通过内存映射读取 write_frame 写出的文件(columns 为要读取的列)，文件不存在或损坏时返回 None"""
+    if feather is None or not os.path.exists(path):
+        return None
+    try:
+        table = feather.read_table(path, memory_map=True)
+        if columns is not None:
+            # 只选部分列时同时保留索引列，否则 pandas 的索引会丢失
+            metadata = table.schema.pandas_metadata or {}
+            index = [name for name in metadata.get('index_columns', []) if isinstance(name, str)]
+            table = table.select(list(columns) + index)
+    except (OSError, KeyError, pa.ArrowException):
+        return None
+    return table.to_pandas(split_blocks=True)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class DatasetCache:
+    """
+    数据集磁盘缓存：以上传文件内容的哈希为键，
+    将解析后的 DataFrame 保存为 Arrow IPC(Feather) 列式文件。
+    重复上传同一文件时通过内存映射直接读取，跳过 CSV/Excel 解析；
+    缓存总大小超过上限时按最近最少使用(LRU)顺序淘汰。
+
+    upload_dir 中以内容哈希命名的原始上传文件解析完成后用 add_upload 登记，
+    按同样的容量上限和 LRU 顺序淘汰；原始文件只在流式导出时需要，被删除后只能从内存中的数据导出。
+    """
+    SUFFIX = '.feather'
+    # DataUploader.save 保存的原始文件名
+    UPLOAD_NAME = re.compile(r'[0-9a-f]{64}\.(csv|xls|xlsx)')
+
+    def __init__(self, cache_dir, max_size_mb=1024, upload_dir=None):
+        self.cache_dir = cache_dir
+        self.upload_dir = upload_dir
+        self.max_bytes = max_size_mb * 1024 * 1024
+
+    @property
+    def enabled(self):
+        return feather is not None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def get(self, key):
+        """读取缓存的数据集，未命中时返回 None"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        df = read_frame(path)
+        if df is None:
+            # 缓存文件损坏，删除后按未命中处理
+            remove_file(path)
+            return None
+        # 更新修改时间，作为 LRU 的访问顺序
+        os.utime(path)
+        return df
+
+    def put(self, key, df):
+        """写入缓存，无法转换为列式格式的数据(如混合类型列)不缓存"""
+        if not self.enabled:
+            return False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if not write_frame(self._path(key), df):
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        """缓存超过容量上限时，删除最久未使用的条目"""
+        _evict_lru(self.cache_dir, lambda name: name.endswith(self.SUFFIX), self.max_bytes)
+
+    def add_upload(self, path):
+        """
+        登记已解析(写入缓存或设为会话数据集)的原始上传文件：更新访问时间，
+        原始文件总大小超过容量上限时删除最久未使用的文件，path 本身不会被删除
+        """
+        if self.upload_dir is None or os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.upload_dir):
+            return
+        try:
+            os.utime(path)
+        except OSError:
+            return
+        _evict_lru(self.upload_dir, self.UPLOAD_NAME.fullmatch, self.max_bytes,
+                   keep=os.path.basename(path))
+
+
+class ArrayCache:
+    """
+    磁盘上的数组缓存：按 (数据集版本, 键) 保存标准化后的特征矩阵、训练集/测试集划分、近邻图等含大数组的对象
+
+    每个条目是一个文件：对象的其余部分用 pickle 保存，较大的 numpy 数组(包括稀疏矩阵内部的数组)
+    以原始字节写在文件末尾，读取时内存映射为只读数组，不复制到内存。
+    训练子进程新建的条目直接写入磁盘，不经过结果管道传回父进程；
+    多个进程读取同一条目时共享操作系统的页缓存，不会各占一份内存。
+    总大小超过上限时按最近最少使用(LRU)顺序淘汰，单个条目超过上限时不缓存。
+    """
+    SUFFIX = '.arrays'
+    # 小于该字节数的数组直接写在 pickle 中
+    MIN_MAPPED_BYTES = 64 * 1024
+
+    def __init__(self, cache_dir, max_size_mb=512):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_size_mb * 1024 * 1024
+
+    def _path(self, version, key):
+        digest = hashlib.sha1(repr((version, key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + self.SUFFIX)
+
+    def view(self, version):
+        """某个数据集版本的条目，用法与字典相同(get 和赋值)，可以传给 DataAnalyzer 和子进程"""
+        return ArrayCacheView(self, version)
+
+    def get(self, version, key):
+        """读取条目，大数组为只读的内存映射；不存在或文件损坏时返回 None"""
+        path = self._path(version, key)
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            header_size, = struct.unpack_from('<Q', buffer)
+            header = io.BytesIO(buffer[8:8 + header_size])
+            value = _MappedUnpickler(header, buffer, _align(8 + header_size)).load()
+        except Exception:
+            remove_file(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, version, key, value):
+        """写入条目，返回是否已缓存"""
+        header = io.BytesIO()
+        pickler = _ArrayPickler(header, self.MIN_MAPPED_BYTES)
+        pickler.dump(value)
+        header = header.getvalue()
+        start = _align(8 + len(header))
+        if start + pickler.size > self.max_bytes:
+            return False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(version, key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(struct.pack('<Q', len(header)))
+                f.write(header)
+                for offset, array in pickler.arrays:
+                    f.seek(start + offset)
+                    f.write(memoryview(array).cast('B'))
+            os.replace(tmp_path, path)
+        except OSError:
+            remove_file(tmp_path)
+            return False
+        _evict_lru(self.cache_dir, lambda name: name.endswith(self.SUFFIX), self.max_bytes,
+                   keep=os.path.basename(path))
+        return True
+
+    def stats(self):
+        """条目数和总大小"""
+        entries, size = 0, 0
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(self.SUFFIX):
+                    try:
+                        size += os.path.getsize(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        continue
+                    entries += 1
+        return {'entries': entries, 'size_mb': size / (1024 * 1024)}
+
+
+class ArrayCacheView:
+    """ArrayCache 中一个数据集版本的条目，实现 DataAnalyzer 用到的 get 和赋值"""
+
+    def __init__(self, cache, version):
+        self.cache = cache
+        self.version = version
+
+    def get(self, key, default=None):
+        value = self.cache.get(self.version, key)
+        return default if value is None else value
+
+    def __setitem__(self, key, value):
+        self.cache.put(self.version, key, value)
+
+
+class _ArrayPickler(pickle.Pickler):
+    """较大的数组不写入 pickle，只记录类型、形状和在数据区中的位置，数组本身收集到 arrays 中"""
+
+    def __init__(self, file, min_bytes):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.min_bytes = min_bytes
+        self.arrays = []  # [(在数据区中的位置, 数组)]
+        self.size = 0  # 数据区的字节数
+
+    def persistent_id(self, obj):
+        if type(obj) is not np.ndarray or obj.dtype.hasobject or obj.nbytes < self.min_bytes:
+            return None
+        offset = _align(self.size)
+        self.arrays.append((offset, np.ascontiguousarray(obj)))
+        self.size = offset + obj.nbytes
+        return obj.dtype.str, obj.shape, offset
+
+
+class _MappedUnpickler(pickle.Unpickler):
+    """把数据区中的原始字节映射为只读数组"""
+
+    def __init__(self, file, buffer, start):
+        super().__init__(file)
+        self.buffer = buffer
+        self.start = start
+
+    def persistent_load(self, pid):
+        dtype, shape, offset = pid
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=self.start + offset).reshape(shape)
+
+
+def _align(position, align=64):
+    return position + -position % align
+
+
+def _evict_lru(folder, matches, max_bytes, keep=None):
+    """folder 中 matches(文件名) 为真的文件总大小超过 max_bytes 时，按修改时间从旧到新删除"""
+    entries = []
+    for name in os.listdir(folder):
+        if not matches(name) or name == keep:
+            continue
+        path = os.path.join(folder, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    if keep is not None:
+        try:
+            total += os.path.getsize(os.path.join(folder, keep))
+        except OSError:
+            pass
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        remove_file(path)
+        total -= size
@@ -3,23 +3,36 @@ import pandas as pd
 import numpy as np
 from scipy.stats import zscore
 
+from modules.duplicates import duplicated_rows
+from modules.imputation import STRATEGY_NAMES, resolve_strategies, impute, describe_strategies
+from modules.outliers import outlier_mask, describe_outliers
+
 
 class DataCleaning:
     def __init__(self, data):
-        self.data = data
+        # 清洗过程会原地修改列，使用副本以免改动调用方保存的数据集；
+        # 开启写时复制时浅复制即可，被修改的列会在写入时自动复制
+        self.data = data.copy(deep=pd.get_option('mode.copy_on_write') is not True)
+        # 最近一次 apply_cleaning_rules 使用的执行计划
+        self.plan = None
 
-    def handle_missing_values(self, method='drop', fill_value=None):
+    def handle_missing_values(self, method='drop', fill_value=None, strategy='constant', group_by=None,
+                              columns=None):
         """
         处理数据中的缺失值
 
         参数:
-            method: 选择处理缺失值的方法（'drop' 或 'fill'）
-            fill_value: 如果选择 'fill' 方法，则需要提供填充值
+            method: 选择处理缺失值的方法（'drop'、'fill' 或 'none'）
+            fill_value: 'constant' 策略的填充值，会转换为各列的类型
+            strategy: 'fill' 方法的默认填充策略（见 modules.imputation.STRATEGY_NAMES）
+            group_by: 'group_median' 策略的分组列
+            columns: 覆盖个别列的填充策略，如 {"age": "median", "city": "mode"}
         """
         if method == 'drop':
-            self.data = self.data.dropna()
-        elif method == 'fill' and fill_value is not None:
-            self.data = self.data.fillna(fill_value)
+            self._keep_rows(self.data.notna().all(axis=1))
+        elif method == 'fill':
+            strategies = resolve_strategies(self.data, strategy, fill_value, group_by, columns)
+            self.data, _ = impute(self.data, strategies)
         elif method == 'none':
             pass
         else:
@@ -39,8 +52,9 @@ class DataCleaning:
             raise ValueError(f"列 '{column}' 不存在。")
 
         # 确保列中没有缺失值并且是数值类型
-        self.data.loc[:, column] = pd.to_numeric(self.data[column], errors='coerce')
-        self.data = self.data.dropna(subset=[column])
+        if not pd.api.types.is_numeric_dtype(self.data[column]):
+            self.data.loc[:, column] = pd.to_numeric(self.data[column], errors='coerce')
+        self._keep_rows(self.data[column].notna())
 
         self.data['z_score'] = zscore(self.data[column])
         if replacement is not None:
@@ -48,25 +62,58 @@ class DataCleaning:
             self.data.loc[np.abs(self.data['z_score']) > threshold, column] = replacement
         else:
             # 删除异常值
-            self.data = self.data[np.abs(self.data['z_score']) <= threshold]
+            self._keep_rows(np.abs(self.data['z_score']) <= threshold)
         self.data = self.data.drop(columns=['z_score'])
         return self.data
 
-    def handle_duplicates(self, method='drop'):
+    def handle_outliers(self, columns, method='zscore', threshold=None, combine='any', replacement=None):
+        """
+        同时检测多列的异常值(见 modules.outliers.outlier_mask)
+
+        Args:
+            columns: 要检测的数值列名列表。
+            method: 'zscore'、'iqr' 或 'mad'。
+            threshold: 阈值，为 None 时使用该方法的默认阈值。
+            combine: 'any' 任一列异常即删除该行，'all' 所有列都异常才删除。
+            replacement: 如果提供，则用该值替换异常单元格，否则删除异常行。
+        """
+        rows, cells, _ = outlier_mask(self.data, columns, method, threshold, combine)
+        if replacement is None:
+            self._keep_rows(~rows)
+            return self.data
+        replacement = _as_number(replacement)
+        for i, column in enumerate(columns):
+            hits = np.flatnonzero(cells[:, i] & rows)
+            if len(hits):
+                series = self.data[column].copy()
+                series.iloc[hits] = replacement
+                self.data[column] = series
+        return self.data
+
+    def handle_duplicates(self, method='drop', subset=None):
         """
-        处理重复值
+        处理重复值，按行指纹判断重复(见 modules.duplicates)
+
+        Args:
+            method: 'drop' 删除重复行(保留首次出现)，'mark' 新增 is_duplicate 列，'none' 不处理
+            subset: 判断重复时使用的列，为 None 时使用全部列
         """
         if method == 'drop':
-            self.data = self.data.drop_duplicates()
+            self._keep_rows(~duplicated_rows(self.data, subset))
         elif method == 'mark':
-            self.data['is_duplicate'] = self.data.duplicated()
+            self.data['is_duplicate'] = duplicated_rows(self.data, subset)
         elif method == 'none':
             pass
         else:
             raise ValueError("无效的重复值处理方法。")
         return self.data
 
-    def apply_cleaning_rules(self, rules):
+    def _keep_rows(self, mask):
+        """按布尔掩码保留行；没有行被删除时不做筛选，未修改的列继续与原数据共享内存"""
+        if not mask.all():
+            self.data = self.data[mask]
+
+    def apply_cleaning_rules(self, rules, fused=True):
         """
         应用自动化清洗规则
         Args:
@@ -75,18 +122,33 @@ class DataCleaning:
                 {
                     "missing_values": {"method": "fill", "fill_value": 0},
                     "outliers": {"column": "age", "threshold": 3}
+                    或多列: {"columns": ["age", "income"], "method": "iqr", "threshold": 1.5, "combine": "any"}
                     "duplicates": {"method": "drop"},
                 }
+            fused: 为 True 时编译为 CleaningPlan，合并各步骤的行筛选后只生成一次结果；
+                为 False 时按步骤依次执行
         Returns:
             清洗后的 DataFrame
         """
+        if fused:
+            self.plan = CleaningPlan(rules)
+            self.data = self.plan.execute(self.data)
+            return self.data
+
         if 'missing_values' in rules:
             mv_rules = rules['missing_values']
             self.handle_missing_values(method=mv_rules.get('method', 'drop'),
-                                       fill_value=mv_rules.get('fill_value'))
+                                       fill_value=mv_rules.get('fill_value'),
+                                       strategy=mv_rules.get('strategy', 'constant'),
+                                       group_by=mv_rules.get('group_by'),
+                                       columns=mv_rules.get('columns'))
         if 'outliers' in rules:
             outlier_rules = rules['outliers']
-            if outlier_rules is not None:
+            if outlier_rules is not None and 'columns' in outlier_rules:
+                self.handle_outliers(outlier_rules['columns'], outlier_rules.get('method', 'zscore'),
+                                     outlier_rules.get('threshold'), outlier_rules.get('combine', 'any'),
+                                     outlier_rules.get('replacement'))
+            elif outlier_rules is not None:
                 column = outlier_rules.get('column')
                 threshold = outlier_rules.get('threshold', 3)
                 replacement = outlier_rules.get('replacement')
@@ -94,6 +156,210 @@ class DataCleaning:
         #处理重复值
         if 'duplicates' in rules:
             dup_rules = rules['duplicates']
-            self.handle_duplicates(method=dup_rules.get('method', 'drop'))
+            self.handle_duplicates(method=dup_rules.get('method', 'drop'), subset=dup_rules.get('subset'))
         self.data.reset_index(drop=True, inplace=True)
         return self.data
+
+
+class CleaningPlan:
+    """
+    清洗执行计划：把清洗规则编译为按顺序执行的步骤
+
+    填充、替换等修改取值的步骤只复制被修改的列；删除缺失行、删除异常值和删除重复行
+    只更新同一个行掩码，最后按掩码一次性生成结果，中间不产生完整的数据副本。
+    结果与 DataCleaning 按步骤依次执行一致。
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.steps = self._compile(rules)
+        # 执行后记录每个筛选步骤删除的行数
+        self.removed = {}
+
+    @staticmethod
+    def _compile(rules):
+        steps = []
+        mv_rules = rules.get('missing_values')
+        if mv_rules is not None:
+            method = mv_rules.get('method', 'drop')
+            strategy = mv_rules.get('strategy', 'constant')
+            fill_value = mv_rules.get('fill_value')
+            if method == 'drop':
+                steps.append({'kind': 'mask', 'op': 'dropna', 'name': "删除缺失行"})
+            elif method == 'fill':
+                if strategy not in STRATEGY_NAMES:
+                    raise ValueError(f"不支持的填充策略: {strategy}")
+                if strategy == 'constant' and fill_value is None:
+                    raise ValueError("Invalid method or fill_value not provided for 'fill' method.")
+                name = f"缺失值填充为 {fill_value!r}" if strategy == 'constant' else f"缺失值填充{STRATEGY_NAMES[strategy]}"
+                steps.append({'kind': 'transform', 'op': 'impute', 'strategy': strategy, 'value': fill_value,
+                              'group_by': mv_rules.get('group_by'), 'columns': mv_rules.get('columns'),
+                              'name': name})
+            elif method != 'none':
+                raise ValueError("Invalid method or fill_value not provided for 'fill' method.")
+
+        outlier_rules = rules.get('outliers')
+        if outlier_rules is not None and 'columns' in outlier_rules:
+            # 多列异常值：一次计算所有列，缺失值不删除也不判定为异常
+            columns = list(outlier_rules['columns'])
+            method = outlier_rules.get('method', 'zscore')
+            threshold = outlier_rules.get('threshold')
+            combine = outlier_rules.get('combine', 'any')
+            replacement = outlier_rules.get('replacement')
+            step = {'columns': columns, 'method': method, 'threshold': threshold, 'combine': combine}
+            description = describe_outliers(columns, method, threshold, combine)
+            if replacement is None:
+                steps.append(dict(step, kind='mask', op='outliers', name=f"删除异常行: {description}"))
+            else:
+                replacement = _as_number(replacement)
+                steps.append(dict(step, kind='transform', op='outliers_replace', value=replacement,
+                                  name=f"异常值替换为 {replacement!r}: {description}"))
+        elif outlier_rules is not None:
+            column = outlier_rules.get('column')
+            threshold = outlier_rules.get('threshold', 3)
+            replacement = outlier_rules.get('replacement')
+            steps.append({'kind': 'mask', 'op': 'notna', 'column': column,
+                          'name': f"删除 {column} 为空或非数值的行"})
+            if replacement is None:
+                steps.append({'kind': 'mask', 'op': 'zscore', 'column': column, 'threshold': threshold,
+                              'name': f"删除 {column} 中 |Z| > {threshold} 的行"})
+            else:
+                steps.append({'kind': 'transform', 'op': 'zscore_replace', 'column': column,
+                              'threshold': threshold, 'value': replacement,
+                              'name': f"{column} 中 |Z| > {threshold} 的值替换为 {replacement!r}"})
+
+        dup_rules = rules.get('duplicates')
+        if dup_rules is not None:
+            method = dup_rules.get('method', 'drop')
+            subset = dup_rules.get('subset') or None
+            scope = "按全部列" if subset is None else f"按 [{', '.join(str(column) for column in subset)}]"
+            if method == 'drop':
+                steps.append({'kind': 'mask', 'op': 'duplicated', 'subset': subset,
+                              'name': f"删除重复行({scope}，保留首次出现)"})
+            elif method == 'mark':
+                steps.append({'kind': 'mark', 'op': 'duplicated', 'subset': subset,
+                              'name': f"新增 is_duplicate 列标记重复行({scope})"})
+            elif method != 'none':
+                raise ValueError("无效的重复值处理方法。")
+        return steps
+
+    def explain(self):
+        """返回执行计划的文字说明，执行后附带每个筛选步骤删除的行数"""
+        lines = []
+        for i, step in enumerate(self.steps, 1):
+            kind = {'mask': "行掩码", 'transform': "修改列", 'mark': "新增列"}[step['kind']]
+            line = f"{i}. [{kind}] {step['name']}"
+            if step['name'] in self.removed:
+                line += f"，删除 {self.removed[step['name']]} 行"
+            lines.append(line)
+        lines.append(f"{len(self.steps) + 1}. 按合并后的行掩码一次性生成结果")
+        return lines
+
+    def execute(self, data):
+        """按计划清洗 data(不会修改 data)，返回重置索引后的结果"""
+        self.removed = {}
+        data = data.copy(deep=False)
+        keep = np.ones(len(data), dtype=bool)
+        marks = None
+
+        for step in self.steps:
+            op = step['op']
+            before = int(keep.sum())
+            if op == 'impute':
+                strategies = resolve_strategies(data, step['strategy'], step['value'], step['group_by'],
+                                                step['columns'])
+                data, _ = impute(data, strategies)
+                if strategies:
+                    # 按实际数据确定了各列的策略后，更新说明
+                    step['name'] = f"缺失值填充: {describe_strategies(strategies)}"
+            elif op == 'dropna':
+                keep &= data.notna().all(axis=1).to_numpy()
+            elif op == 'notna':
+                column = step['column']
+                if column not in data.columns:
+                    raise ValueError(f"列 '{column}' 不存在。")
+                if not pd.api.types.is_numeric_dtype(data[column]):
+                    data[column] = pd.to_numeric(data[column], errors='coerce')
+                keep &= data[column].notna().to_numpy()
+            elif op in ('zscore', 'zscore_replace'):
+                column = step['column']
+                positions = np.flatnonzero(keep)
+                z = np.abs(zscore(data[column].to_numpy()[positions]))
+                if op == 'zscore':
+                    keep[positions[~(z <= step['threshold'])]] = False
+                else:
+                    outliers = positions[z > step['threshold']]
+                    if len(outliers):
+                        series = data[column].copy()
+                        series.iloc[outliers] = step['value']
+                        data[column] = series
+            elif op in ('outliers', 'outliers_replace'):
+                positions = np.flatnonzero(keep)
+                rows, cells, _ = outlier_mask(data, step['columns'], step['method'], step['threshold'],
+                                                       step['combine'], positions)
+                if op == 'outliers':
+                    keep[positions[rows]] = False
+                else:
+                    for i, column in enumerate(step['columns']):
+                        hits = positions[cells[:, i] & rows]
+                        if len(hits):
+                            series = data[column].copy()
+                            series.iloc[hits] = step['value']
+                            data[column] = series
+            elif op == 'duplicated':
+                positions = np.flatnonzero(keep)
+                duplicated = duplicated_rows(data, step['subset'], positions)
+                if step['kind'] == 'mask':
+                    keep[positions[duplicated]] = False
+                else:
+                    marks = duplicated
+            if step['kind'] == 'mask':
+                self.removed[step['name']] = before - int(keep.sum())
+
+        if not keep.all():
+            data = data[keep]
+        data = data.reset_index(drop=True)
+        if marks is not None:
+            # 标记重复行总是最后一步，标记结果与保留的行一一对应
+            data['is_duplicate'] = marks
+        return data
+
+    def preview(self, data, sample_size=10000, random_state=0):
+        """
+        在按位置分层的样本上执行计划，快速估计清洗结果
+
+        返回:
+            {
+                'data': 清洗后的样本,
+                'sample_rows': 样本行数,
+                'estimated_rows': 按样本保留比例估计的清洗后总行数,
+            }
+        数据不超过 sample_size 行时直接清洗全部数据，估计值即为准确值。
+        z 分数按样本的均值和标准差计算；样本中很少同时抽到一对重复行，
+        删除重复行时估计的行数会偏高。
+        """
+        if len(data) <= sample_size:
+            sample = data
+        else:
+            sample = data.take(stratified_positions(len(data), sample_size, random_state))
+        cleaned = self.execute(sample)
+        estimated = len(cleaned) * len(data) / len(sample) if len(sample) else 0
+        return {'data': cleaned, 'sample_rows': len(sample), 'estimated_rows': int(round(estimated))}
+
+
+def _as_number(value):
+    """表单中的替换值能解析为数值时转换为数值，避免数值列被替换为文本"""
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+        return int(number) if number.is_integer() else number
+    return value
+
+
+def stratified_positions(n_rows, sample_size, random_state=0):
+    """把 n_rows 行按位置等分为 sample_size 层，每层随机取一行，返回递增的行位置"""
+    rng = np.random.default_rng(random_state)
+    bounds = np.linspace(0, n_rows, sample_size + 1).astype(np.int64)
+    return rng.integers(bounds[:-1], bounds[1:])
@@ -0,0 +1,82 @@
+# 数据类型压缩
+# modules/compaction.py
+import numpy as np
+import pandas as pd
+
+
+def compact_dtypes(df, category_ratio=0.5, numeric_na_tolerance=0.0):
+    """
+    压缩 DataFrame 各列的数据类型以减少内存占用
+
+    参数:
+        df: 待压缩的 DataFrame
+        category_ratio: 唯一值占比低于该值的文本列转换为 category
+        numeric_na_tolerance: 文本列中允许无法解析为数值的非空值比例，默认为 0：
+            只有全部非空值都能解析时才转换，混合列保持文本，不丢失数据
+
+    处理规则:
+        - 看起来是数值的文本列转换为数值类型
+        - 整数列降为能容纳取值范围的最小整数类型
+        - 浮点列在不损失精度时降为 float32
+        - 低基数的文本列转换为 category
+
+    返回:
+        (压缩后的 DataFrame, 每列压缩前后的内存报告)
+    """
+    columns = {}
+    for column in df.columns:
+        columns[column] = _compact_series(df[column], category_ratio, numeric_na_tolerance)
+    compacted = pd.DataFrame(columns, index=df.index, copy=False)
+    return compacted, memory_report(compacted, before=df)
+
+
+def memory_report(df, before=None):
+    """
+    生成每列的内存报告(字节)，before 为压缩前的 DataFrame，未提供时只报告当前占用
+    """
+    after_usage = df.memory_usage(deep=True, index=False)
+    before_usage = before.memory_usage(deep=True, index=False) if before is not None else None
+    rows = []
+    for column in df.columns:
+        rows.append({
+            'column': column,
+            'dtype_before': str(before[column].dtype) if before is not None else None,
+            'dtype_after': str(df[column].dtype),
+            'bytes_before': int(before_usage[column]) if before is not None else None,
+            'bytes_after': int(after_usage[column]),
+        })
+    return {
+        'columns': rows,
+        'total_before': int(before_usage.sum()) if before is not None else None,
+        'total_after': int(after_usage.sum()),
+    }
+
+
+def _compact_series(series, category_ratio, numeric_na_tolerance):
+    if pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+        converted = pd.to_numeric(series, errors='coerce')
+        lost = int((converted.isna() & series.notna()).sum())
+        if converted.notna().any() and lost <= int(series.notna().sum() * numeric_na_tolerance):
+            series = converted
+
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series
+    if pd.api.types.is_integer_dtype(series.dtype):
+        downcast = pd.to_numeric(series, downcast='integer')
+        # 类型不变时返回原列，继续共享原有内存
+        return series if downcast.dtype == series.dtype else downcast
+    if series.dtype == np.float32:
+        return series
+    if pd.api.types.is_float_dtype(series.dtype):
+        downcast = series.astype('float32')
+        # 只有 float32 能精确表示所有取值时才降级
+        if np.array_equal(series.to_numpy(), downcast.to_numpy().astype('float64'), equal_nan=True):
+            return downcast
+        return series
+    if pd.api.types.is_object_dtype(series.dtype) and len(series) > 0:
+        n_unique = series.nunique(dropna=True)
+        if n_unique < len(series) * category_ratio:
+            category = series.astype('category')
+            if category.memory_usage(deep=True) < series.memory_usage(deep=True):
+                return category
+    return series
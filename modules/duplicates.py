@@ -0,0 +1,175 @@
+# 基于行指纹的重复行检测
+# modules/duplicates.py
+import numpy as np
+import pandas as pd
+
+# 计算指纹时每次处理的行数，限制宽表哈希时的临时内存
+HASH_CHUNK_ROWS = 500000
+
+
+def row_fingerprints(data, subset=None, positions=None, chunk_rows=HASH_CHUNK_ROWS):
+    """
+    计算每行(或 subset 列组合)的 64 位指纹
+
+    参数:
+        data: DataFrame
+        subset: 判断重复时使用的列，为 None 时使用全部列
+        positions: 只计算这些行位置的指纹，为 None 时计算全部行
+        chunk_rows: 每次哈希的行数
+
+    返回:
+        uint64 数组；取值相同的行指纹相同，缺失值之间视为相同
+    """
+    if subset is not None:
+        missing = [column for column in subset if column not in data.columns]
+        if missing:
+            raise ValueError(f"列 '{missing[0]}' 不存在。")
+        data = data[list(subset)]
+    n_rows = len(data) if positions is None else len(positions)
+    result = np.empty(n_rows, dtype=np.uint64)
+    for start in range(0, n_rows, chunk_rows):
+        stop = min(start + chunk_rows, n_rows)
+        if positions is None:
+            chunk = data.iloc[start:stop]
+        else:
+            chunk = data.take(positions[start:stop])
+        result[start:stop] = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    return result
+
+
+def duplicated_rows(data, subset=None, positions=None):
+    """
+    返回各行是否与前面的行重复(与 duplicated(keep='first') 一致)
+
+    先按 64 位指纹查找候选重复行，再逐列比较候选行与其首次出现的行，
+    排除哈希碰撞；不需要先按行位置复制整个数据表。
+    positions 为 None 时检测全部行，否则只在这些行之间判断重复。
+    """
+    hashes = row_fingerprints(data, subset, positions)
+    if positions is None:
+        positions = np.arange(len(data))
+    codes, _ = pd.factorize(hashes)
+    duplicated = pd.Series(codes).duplicated().to_numpy().copy()
+    candidates = np.flatnonzero(duplicated)
+    if len(candidates) == 0:
+        return duplicated
+
+    # 每个指纹首次出现的位置：factorize 的编码连续，np.unique 按编码顺序返回首次出现的下标
+    first = np.unique(codes, return_index=True)[1]
+    rows = positions[candidates]
+    first_rows = positions[first[codes[candidates]]]
+    same = np.ones(len(candidates), dtype=bool)
+    columns = data if subset is None else data[list(subset)]
+    for i in range(columns.shape[1]):
+        column = columns.iloc[:, i]
+        left = column.take(rows).reset_index(drop=True)
+        right = column.take(first_rows).reset_index(drop=True)
+        equal = left.eq(right) | (left.isna() & right.isna())
+        same &= equal.fillna(False).to_numpy(dtype=bool)
+    duplicated[candidates[~same]] = False
+    return duplicated
+
+
+def duplicate_report(data, subset=None):
+    """
+    统计重复行，不生成标记后的数据表
+
+    返回:
+        {
+            'rows': 总行数,
+            'unique_rows': 不重复的行数,
+            'duplicate_rows': 重复行数(删除重复行时会删除的行数),
+            'duplicate_groups': 出现不止一次的行(组)数,
+            'largest_group': 最大的一组重复行的行数,
+        }
+    """
+    fingerprints = FingerprintSet()
+    fingerprints.add(row_fingerprints(data, subset))
+    return fingerprints.report()
+
+
+class FingerprintSet:
+    """
+    行指纹集合：分块加入指纹，判断每行是否与之前任意分块中的行重复，
+    并累计每组重复行的行数；每个不同的行只占用 16 字节。
+
+    指纹保存为若干个已排序、互不相交的有序段，每个分块新出现的指纹成为一个新段；
+    新段不小于前一段的一半时两段排序合并，段的长度依次减半，段数只有对数级，
+    每个指纹只被合并对数次，不必每块都移动全部已有指纹。
+
+    只比较指纹，不比较原始取值；n 行中出现哈希碰撞的概率约为 n²/2⁶⁵。
+    """
+
+    def __init__(self):
+        self._runs = []  # [(已排序的指纹, 各指纹的行数), ...]，从旧到新，长度大致依次减半
+        self.rows = 0
+
+    def __len__(self):
+        return sum(len(fingerprints) for fingerprints, _ in self._runs)
+
+    def add(self, fingerprints):
+        """加入一个分块的指纹，返回该分块中各行是否与之前的行(包括之前的分块)重复"""
+        codes, uniques = pd.factorize(fingerprints)
+        uniques = np.asarray(uniques, dtype=np.uint64)
+        counts = np.bincount(codes, minlength=len(uniques))
+
+        found = np.zeros(len(uniques), dtype=bool)
+        for run, run_counts in self._runs:
+            index = np.searchsorted(run, uniques)
+            hit = index < len(run)
+            hit[hit] = run[index[hit]] == uniques[hit]
+            np.add.at(run_counts, index[hit], counts[hit])
+            found |= hit
+        duplicated = pd.Series(codes).duplicated().to_numpy() | found[codes]
+
+        new = ~found
+        if new.any():
+            order = np.argsort(uniques[new])
+            self._runs.append((uniques[new][order], counts[new][order]))
+            self._merge()
+        self.rows += len(fingerprints)
+        return duplicated
+
+    def _merge(self):
+        """最新的段不小于前一段的一半时，把两段排序合并为一段"""
+        while len(self._runs) > 1 and 2 * len(self._runs[-1][0]) >= len(self._runs[-2][0]):
+            (older, older_counts), (newer, newer_counts) = self._runs[-2:]
+            merged = np.concatenate([older, newer])
+            order = np.argsort(merged, kind='stable')
+            self._runs[-2:] = [(merged[order], np.concatenate([older_counts, newer_counts])[order])]
+
+    def report(self):
+        """返回重复行统计，字段同 duplicate_report"""
+        counts = np.concatenate([run_counts for _, run_counts in self._runs] or [np.empty(0, dtype=np.int64)])
+        groups = counts[counts > 1]
+        return {
+            'rows': self.rows,
+            'unique_rows': len(counts),
+            'duplicate_rows': self.rows - len(counts),
+            'duplicate_groups': int(len(groups)),
+            'largest_group': int(groups.max()) if len(groups) else 1 if self.rows else 0,
+        }
+
+
+def scan_csv_duplicates(filepath, subset=None, chunk_rows=HASH_CHUNK_ROWS, **read_csv_kwargs):
+    """
+    分块读取 CSV 文件查找重复行，内存占用只与不同行的个数有关，可处理大于内存的文件；
+    默认按单元格文本判断是否相同
+
+    返回:
+        (report, duplicate_rows)
+        report: 重复行统计，字段同 duplicate_report
+        duplicate_rows: 重复行的行号(从 0 开始，不含表头)
+    """
+    # 按文本读取：各分块推断的类型可能不同(如整数列在某个分块中含缺失值变为浮点)，
+    # 相同的值会得到不同的指纹
+    read_csv_kwargs.setdefault('dtype', str)
+    fingerprints = FingerprintSet()
+    duplicates = []
+    offset = 0
+    for chunk in pd.read_csv(filepath, chunksize=chunk_rows, usecols=subset, **read_csv_kwargs):
+        duplicated = fingerprints.add(row_fingerprints(chunk, subset))
+        duplicates.append(np.flatnonzero(duplicated) + offset)
+        offset += len(chunk)
+    duplicate_rows = np.concatenate(duplicates) if duplicates else np.empty(0, dtype=np.int64)
+    return fingerprints.report(), duplicate_rows
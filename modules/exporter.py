@@ -29,4 +29,13 @@ class DataExporter(DataManager):
         os.makedirs(folder, exist_ok=True)
         filepath = os.path.join(folder, filename)
         self.data.to_excel(filepath, index=False)
-        return filepath
\ No newline at end of file
+        return filepath
+
+    def export_to_parquet(self, filename, folder='exports'):
+        """
+        导出为 Parquet 文件(需要安装 pyarrow)
+        """
+        os.makedirs(folder, exist_ok=True)
+        filepath = os.path.join(folder, filename)
+        self.data.to_parquet(filepath, index=False)
+        return filepath
@@ -0,0 +1,185 @@
+# 缺失值填充
+# modules/imputation.py
+import numpy as np
+import pandas as pd
+
+STRATEGY_NAMES = {
+    'constant': "常数",
+    'mean': "均值",
+    'median': "中位数",
+    'mode': "众数",
+    'ffill': "前一个值",
+    'bfill': "后一个值",
+    'group_median': "分组中位数",
+}
+# 只适用于数值列的策略，非数值列改用众数
+NUMERIC_STRATEGIES = {'mean', 'median', 'group_median'}
+
+
+def resolve_strategies(data, strategy, fill_value=None, group_by=None, columns=None):
+    """
+    为各列确定填充策略
+
+    参数:
+        data: DataFrame
+        strategy: 默认策略，见 STRATEGY_NAMES
+        fill_value: 'constant' 策略的填充值
+        group_by: 'group_median' 策略的分组列
+        columns: {列名: 策略} 或 {列名: {'strategy': ..., 'fill_value': ..., 'group_by': ...}}，
+            覆盖个别列的默认策略
+
+    返回:
+        {列名: {'strategy': ..., 'fill_value': ..., 'group_by': ...}}，只包含含缺失值的列
+    """
+    overrides = columns or {}
+    unknown = [column for column in overrides if column not in data.columns]
+    if unknown:
+        raise ValueError(f"列 '{unknown[0]}' 不存在。")
+
+    default = {'strategy': strategy, 'fill_value': fill_value, 'group_by': group_by}
+    resolved = {}
+    for column in data.columns[data.isna().any()]:
+        spec = overrides.get(column, default)
+        if isinstance(spec, str):
+            spec = dict(default, strategy=spec)
+        spec = dict(default, **spec)
+        if spec['strategy'] not in STRATEGY_NAMES:
+            raise ValueError(f"不支持的填充策略: {spec['strategy']}")
+        if spec['strategy'] in NUMERIC_STRATEGIES and not _is_numeric(data[column]):
+            spec['strategy'] = 'mode'
+        if spec['strategy'] == 'group_median':
+            if spec['group_by'] not in data.columns:
+                raise ValueError("分组中位数需要选择有效的分组列")
+            if spec['group_by'] == column:
+                spec['strategy'] = 'median'
+        if spec['strategy'] == 'constant' and spec['fill_value'] is None:
+            raise ValueError("Invalid method or fill_value not provided for 'fill' method.")
+        resolved[column] = spec
+    return resolved
+
+
+def impute(data, strategies):
+    """
+    按 resolve_strategies 的结果填充缺失值，每列保持原有的数据类型；
+    均值、中位数、众数策略的 spec 中有 'value' 时直接使用该统计量(如分块累计的结果)
+
+    返回:
+        (填充后的 DataFrame, {列名: 填充的个数})，不会修改 data
+    """
+    data = data.copy(deep=False)
+    filled = {}
+    for column, spec in strategies.items():
+        series = data[column]
+        missing = int(series.isna().sum())
+        if missing == 0:
+            continue
+        result = _impute_series(data, series, spec)
+        data[column] = result
+        filled[column] = missing - int(result.isna().sum())
+    return data, filled
+
+
+def describe_strategies(strategies):
+    """填充策略的简短说明，相同策略的列合并在一起"""
+    groups = {}
+    for column, spec in strategies.items():
+        name = STRATEGY_NAMES[spec['strategy']]
+        if spec['strategy'] == 'constant':
+            name += f" {spec['fill_value']!r}"
+        elif spec['strategy'] == 'group_median':
+            name += f"(按 {spec['group_by']})"
+        groups.setdefault(name, []).append(str(column))
+    return "；".join(f"{', '.join(columns)} 填充{name}" for name, columns in groups.items())
+
+
+def _impute_series(data, series, spec):
+    strategy = spec['strategy']
+    if strategy == 'ffill':
+        return series.ffill()
+    if strategy == 'bfill':
+        return series.bfill()
+    if strategy == 'constant':
+        return _fill(series, _coerce_constant(spec['fill_value'], series))
+    if strategy == 'mode':
+        if 'value' in spec:
+            value = spec['value']
+        else:
+            mode = series.mode(dropna=True)
+            value = None if mode.empty else mode.iloc[0]
+        return series if value is None else _fill(series, value)
+    if strategy in ('mean', 'median'):
+        if 'value' in spec:
+            value = spec['value']
+        else:
+            value = series.mean() if strategy == 'mean' else series.median()
+        return series if pd.isna(value) else _fill(series, _cast_number(value, series.dtype))
+
+    # 分组中位数：缺失值所在分组没有中位数时使用整列的中位数
+    medians = series.groupby(data[spec['group_by']], observed=True, sort=False).transform('median')
+    overall = series.median()
+    if pd.isna(overall):
+        return series
+    medians = medians.fillna(overall)
+    if pd.api.types.is_integer_dtype(series.dtype):
+        medians = medians.round()
+    return series.where(series.notna(), medians.astype(series.dtype))
+
+
+def _fill(series, value):
+    """用标量填充缺失值；category 列先把填充值加入类别，避免转换为 object"""
+    if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    return _widen_integer(series, value).fillna(value)
+
+
+def _widen_integer(series, value):
+    """整数列(如压缩后的 Int8)容纳不了填充值时，升级为能同时容纳原有取值和填充值的最小整数类型"""
+    dtype = series.dtype
+    if not pd.api.types.is_integer_dtype(dtype) or not isinstance(value, (int, np.integer)):
+        return series
+    numpy_dtype = np.dtype(getattr(dtype, 'numpy_dtype', dtype))
+    info = np.iinfo(numpy_dtype)
+    if info.min <= value <= info.max:
+        return series
+    wider = np.promote_types(numpy_dtype, np.min_scalar_type(value))
+    if wider.kind not in 'iu':
+        raise ValueError(f"填充值 {value} 超出整数列 '{series.name}' 能表示的范围")
+    if hasattr(dtype, 'numpy_dtype'):
+        return series.astype(f"{'U' if wider.kind == 'u' else ''}Int{wider.itemsize * 8}")
+    return series.astype(wider)
+
+
+def _cast_number(value, dtype):
+    """把统计量转换为列的类型，整数列(可空整数)四舍五入；超出整数列范围时由 _fill 升级列的类型"""
+    if pd.api.types.is_integer_dtype(dtype):
+        return int(round(value))
+    return np.dtype(dtype.numpy_dtype if hasattr(dtype, 'numpy_dtype') else dtype).type(value)
+
+
+def _coerce_constant(value, series):
+    """把表单中的填充值转换为列的类型，无法转换时报错而不是把列变为 object"""
+    dtype = series.dtype
+    if not isinstance(value, str) or isinstance(dtype, pd.CategoricalDtype):
+        return value
+    try:
+        if pd.api.types.is_bool_dtype(dtype):
+            lowered = value.strip().lower()
+            if lowered not in ('true', 'false', '1', '0'):
+                raise ValueError(value)
+            return lowered in ('true', '1')
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return pd.Timestamp(value)
+        if not _is_numeric(series):
+            return value
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"填充值 '{value}' 不能用于 {dtype} 类型的列 '{series.name}'")
+    if pd.api.types.is_integer_dtype(dtype):
+        if not number.is_integer():
+            raise ValueError(f"填充值 '{value}' 不是整数，不能用于整数列 '{series.name}'")
+        return int(number)
+    return _cast_number(number, dtype)
+
+
+def _is_numeric(series):
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
@@ -0,0 +1,339 @@
+# 后台任务
+# modules/jobs.py
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows 下没有 resource 模块，不统计子进程资源
+    resource = None
+
+
+class Job:
+    """
+    后台任务：记录状态、进度和结果
+
+    status: 'pending' 排队中, 'running' 运行中, 'done' 完成, 'failed' 失败, 'cancelled' 已取消
+    """
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        # 提交任务的会话 id，用于限制其他会话查看或领取结果
+        self.owner = None
+        self.status = 'pending'
+        self.progress = {}
+        # 在子进程中执行的任务记录的资源占用(CPU 时间、内存峰值)
+        self.usage = {}
+        self.cancel_requested = False
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        # 任务结束(完成、失败或取消)后调用一次的回调 on_finish(job)，如释放任务使用的文件
+        self.on_finish = None
+
+    def update(self, **progress):
+        """由任务函数调用，更新进度信息"""
+        self.progress.update(progress)
+
+    def eta(self):
+        """按已处理字节数的速度估算剩余秒数，无法估算时返回 None"""
+        done = self.progress.get('bytes_parsed')
+        total = self.progress.get('bytes_total')
+        if self.status != 'running' or not done or not total or self.started is None:
+            return None
+        elapsed = time.time() - self.started
+        return max(0.0, elapsed * (total - done) / done)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'eta_seconds': self.eta(),
+            'usage': dict(self.usage),
+            'error': self.error,
+        }
+
+
+class JobManager:
+    """
+    后台任务管理器：在线程池中执行任务，按任务 id 查询状态
+
+    任务函数的第一个参数是 Job 对象，可以通过 job.update() 报告进度。
+    """
+
+    def __init__(self, max_workers=4, max_age=3600):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.max_age = max_age
+
+    def submit(self, kind, func, *args, on_finish=None, **kwargs):
+        """提交任务，立即返回 Job；on_finish(job) 在任务结束后调用"""
+        job = Job(kind)
+        job.on_finish = on_finish
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """取消排队中的任务；线程中运行的任务无法中断，返回 False"""
+        job = self.get(job_id)
+        if job is None or job.status != 'pending':
+            return False
+        job.cancel_requested = True
+        return True
+
+    @staticmethod
+    def _run(job, func, args, kwargs):
+        if job.cancel_requested:
+            job.status = 'cancelled'
+            _finish(job)
+            return
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            _finish(job)
+
+    def _prune(self):
+        """清理超过 max_age 的已结束任务"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and now - job.finished > self.max_age]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class ProcessJobManager(JobManager):
+    """
+    在子进程中执行任务的管理器：运行中的任务也可以取消(终止子进程)，并统计每个任务的 CPU 时间和内存
+
+    同时运行的子进程不超过 max_workers 个，其余任务排队。Web 进程是多线程的(请求线程、后台线程池)，
+    fork 时其他线程持有的锁(数据集存储、日志、BLAS/OpenMP)会原样复制到子进程中，可能死锁，
+    所以子进程由 forkserver(不支持时用 spawn)启动；任务函数、参数和返回值都需要能被 pickle，
+    大的数据应以文件路径(如 DatasetStore.snapshot 的磁盘副本)传给子进程。
+    preload 为 forkserver 预先导入的模块，任务启动时不必重新导入。
+    子进程不是守护进程，任务函数可以再创建进程池(如并行的参数搜索)；子进程是新进程组的组长，
+    取消时终止整个进程组，进程池的工作进程不会留下。
+    任务函数在子进程中调用 job.update() 报告的进度会传回父进程的 Job。
+    """
+
+    # 子进程报告资源占用的间隔(秒)
+    USAGE_INTERVAL = 0.5
+
+    def __init__(self, max_workers=2, max_age=3600, preload=()):
+        super().__init__(max_workers, max_age)
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context('forkserver')
+            self._context.set_forkserver_preload(list(preload))
+        else:
+            self._context = multiprocessing.get_context('spawn')
+        self._processes = {}
+
+    def cancel(self, job_id):
+        """取消排队中或运行中的任务，任务已结束时返回 False"""
+        job = self.get(job_id)
+        if job is None or job.status not in ('pending', 'running'):
+            return False
+        with self._lock:
+            job.cancel_requested = True
+            process = self._processes.get(job_id)
+        if process is not None:
+            _kill_group(process)
+        return True
+
+    def _run(self, job, func, args, kwargs):
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_run_in_child, args=(sender, func, args, kwargs))
+        # 先登记子进程再标记为运行中，cancel() 看到 'running' 时一定能找到子进程
+        with self._lock:
+            if job.cancel_requested:
+                job.status = 'cancelled'
+                receiver.close()
+                sender.close()
+                _finish(job)
+                return
+            self._processes[job.id] = process
+            job.status = 'running'
+            job.started = time.time()
+        try:
+            process.start()
+            sender.close()
+            # 启动前收到的取消请求找不到进程号，在这里补上
+            if job.cancel_requested:
+                _kill_group(process)
+            self._receive(job, process, receiver)
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            with self._lock:
+                self._processes.pop(job.id, None)
+            receiver.close()
+            process.join()
+            _finish(job)
+
+    @staticmethod
+    def _receive(job, process, receiver):
+        """接收子进程发回的进度、资源占用和结果，直到子进程结束"""
+        while True:
+            try:
+                kind, payload = receiver.recv()
+            except (EOFError, OSError):
+                # 子进程没有发回结果就退出了：被取消终止，或异常退出(如内存不足被系统终止)
+                process.join()
+                if job.cancel_requested:
+                    job.status = 'cancelled'
+                else:
+                    job.error = f"任务进程异常退出(退出码 {process.exitcode})"
+                    job.status = 'failed'
+                return
+            if kind == 'progress':
+                job.update(**payload)
+            elif kind == 'usage':
+                job.usage.update(payload)
+            elif kind == 'done':
+                job.result = payload
+                job.status = 'done'
+                return
+            else:
+                job.error = payload
+                job.status = 'failed'
+                return
+
+
+class _ChildJob:
+    """子进程中传给任务函数的 Job 替身，update() 把进度发回父进程"""
+
+    def __init__(self, send):
+        self._send = send
+        self.progress = {}
+
+    def update(self, **progress):
+        self.progress.update(progress)
+        self._send('progress', progress)
+
+
+# 子进程中的结果管道；任务函数创建的工作进程会继承它，需要调用 init_job_worker() 关闭
+_child_sender = None
+
+
+def init_job_worker():
+    """
+    在任务子进程创建的工作进程(如参数搜索的进程池)中调用
+
+    关闭继承的结果管道，否则工作进程存活时父进程收不到 EOF；
+    创建它的进程退出后本进程也立即退出，不会成为孤儿进程。
+    """
+    if _child_sender is not None:
+        _child_sender.close()
+    parent = os.getppid()
+
+    def watch_parent():
+        while os.getppid() == parent:
+            time.sleep(1)
+        os._exit(1)
+
+    threading.Thread(target=watch_parent, daemon=True).start()
+
+
+def _finish(job):
+    job.finished = time.time()
+    if job.on_finish is not None:
+        job.on_finish(job)
+
+
+def _kill_group(process):
+    """终止子进程及其创建的所有进程"""
+    if process.pid is None:
+        return  # 尚未启动，_run 在启动后会检查 cancel_requested
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (AttributeError, OSError):
+        # 没有进程组(Windows)，或子进程还没来得及调用 setsid
+        process.terminate()
+
+
+def _run_in_child(sender, func, args, kwargs):
+    global _child_sender
+    _child_sender = sender
+    if hasattr(os, 'setsid'):
+        os.setsid()
+    lock = threading.Lock()
+    start_rss = _peak_rss_mb()
+    finished = threading.Event()
+
+    def send(kind, payload):
+        with lock:
+            sender.send((kind, payload))
+
+    def usage():
+        peak = _peak_rss_mb()
+        return {
+            'cpu_seconds': _cpu_seconds(),
+            'peak_rss_mb': peak,
+            # 子进程启动时已导入的模块也占用内存，峰值减去启动时的值才是任务新增的内存
+            'rss_growth_mb': None if peak is None else peak - start_rss,
+            # 任务创建的工作进程(如参数搜索的进程池)中内存峰值最大的一个
+            'worker_peak_rss_mb': _peak_rss_mb(children=True),
+        }
+
+    def report_usage():
+        while not finished.wait(ProcessJobManager.USAGE_INTERVAL):
+            send('usage', usage())
+
+    threading.Thread(target=report_usage, daemon=True).start()
+    try:
+        result = func(_ChildJob(send), *args, **kwargs)
+        finished.set()
+        send('usage', usage())
+        send('done', result)
+    except BaseException as e:
+        finished.set()
+        send('usage', usage())
+        send('error', str(e) or traceback.format_exception_only(type(e), e)[-1].strip())
+    finally:
+        sender.close()
+
+
+def _cpu_seconds():
+    """本进程加上已结束的子进程(如进程池的工作进程)的 CPU 时间；运行中的子进程要等它结束后才计入"""
+    if resource is None:
+        return time.process_time()
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def _peak_rss_mb(children=False):
+    """本进程的内存峰值；children=True 时为已结束的子进程中最大的内存峰值"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
@@ -0,0 +1,196 @@
+# 数据集版本树
+# modules/lineage.py
+import itertools
+import threading
+import time
+
+
+class _Node:
+    """版本节点：只记录关系和说明，数据本身保存在 DatasetStore 中"""
+
+    def __init__(self, node_id, parent, dataset_id, label, rows, columns, meta):
+        self.id = node_id
+        self.parent = parent
+        self.dataset_id = dataset_id
+        self.label = label
+        self.rows = rows
+        self.columns = columns
+        self.meta = meta
+        self.children = []
+        # 撤销后重做时回到的子节点
+        self.redo_child = None
+        self.created = time.time()
+
+
+class DatasetLineage:
+    """
+    数据集版本树：每个会话以上传的原始数据为根，每次清洗在当前版本下生成一个子版本
+
+    各版本都是不可变的 DataFrame，保存在 DatasetStore 中，由其统一管理内存预算和磁盘溢出；
+    在写时复制模式下，清洗未改动的列与父版本共享内存，存储中只计一次、只写一次磁盘。
+    存储按会话整体过期，过期会话的版本树在下次上传或清洗时删除。
+    撤销、重做和切换分支只移动当前版本指针，不重新计算。
+    """
+
+    def __init__(self, store, max_versions=50):
+        self.store = store
+        self.max_versions = max_versions
+        self._sessions = {}  # 会话 id -> {'nodes': {节点 id: _Node}, 'head': 节点 id}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def reset(self, session_id, df, label, **meta):
+        """以新上传的数据作为根版本，丢弃该会话原有的全部版本"""
+        with self._lock:
+            self._prune_sessions()
+            self.store.drop(session_id)
+            self._sessions[session_id] = {'nodes': {}, 'head': None}
+            return self._add(session_id, None, df, label, meta)
+
+    def commit(self, session_id, df, label, parent=None, **meta):
+        """
+        在 parent 版本(默认为当前版本)下生成子版本，返回节点 id
+
+        只有 parent 仍是当前版本时才把新版本设为当前版本，
+        后台任务完成前用户切换了版本时不会被覆盖。
+        """
+        with self._lock:
+            self._prune_sessions()
+            state = self._sessions.get(session_id)
+            if state is None or state['head'] is None:
+                raise ValueError("请先上传数据文件")
+            if parent is None:
+                parent = state['head']
+            if parent not in state['nodes']:
+                raise ValueError("清洗所基于的版本已被删除")
+            head = state['head']
+            node_id = self._add(session_id, parent, df, label, meta)
+            if head != parent:
+                state['head'] = head
+            self._limit(session_id)
+            return node_id
+
+    def head(self, session_id):
+        """当前版本节点，不存在时返回 None"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or state['head'] is None:
+                return None
+            return state['nodes'][state['head']]
+
+    def root(self, session_id):
+        """根版本(上传的原始数据)节点，不存在时返回 None"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return None
+            return next((node for node in state['nodes'].values() if node.parent is None), None)
+
+    def path(self, session_id):
+        """从根版本到当前版本的节点列表，依次取各节点的 meta['rules'] 即可重放全部清洗"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or state['head'] is None:
+                return []
+            nodes = state['nodes']
+            result = [nodes[state['head']]]
+            while result[-1].parent is not None:
+                result.append(nodes[result[-1].parent])
+            return result[::-1]
+
+    def undo(self, session_id):
+        """回到父版本，已在根版本时返回 False"""
+        with self._lock:
+            head = self.head(session_id)
+            if head is None or head.parent is None:
+                return False
+            state = self._sessions[session_id]
+            state['nodes'][head.parent].redo_child = head.id
+            state['head'] = head.parent
+            return True
+
+    def redo(self, session_id):
+        """前进到最近撤销的子版本(没有时为最新的子版本)，没有子版本时返回 False"""
+        with self._lock:
+            head = self.head(session_id)
+            if head is None or not head.children:
+                return False
+            child = head.redo_child if head.redo_child in head.children else head.children[-1]
+            self._sessions[session_id]['head'] = child
+            return True
+
+    def checkout(self, session_id, node_id):
+        """切换到任意版本，之后的清洗会从该版本产生新的分支"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or node_id not in state['nodes']:
+                return False
+            state['head'] = node_id
+            return True
+
+    def nodes(self, session_id):
+        """按树的先序遍历返回版本列表，供页面展示"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return []
+            nodes = state['nodes']
+            result = []
+            stack = [(node.id, 0) for node in nodes.values() if node.parent is None]
+            while stack:
+                node_id, depth = stack.pop()
+                node = nodes[node_id]
+                result.append({
+                    'id': node.id,
+                    'parent': node.parent,
+                    'label': node.label,
+                    'rows': node.rows,
+                    'columns': node.columns,
+                    'created': node.created,
+                    'depth': depth,
+                    'is_head': node.id == state['head'],
+                })
+                stack.extend((child, depth + 1) for child in reversed(node.children))
+            return result
+
+    def _add(self, session_id, parent, df, label, meta):
+        state = self._sessions[session_id]
+        node_id = next(self._ids)
+        # 根版本沿用 'raw' 数据集 id，其余版本按节点 id 命名
+        dataset_id = 'raw' if parent is None else f'v{node_id}'
+        self.store.put(session_id, dataset_id, df, **meta)
+        node = _Node(node_id, parent, dataset_id, label, len(df), len(df.columns), meta)
+        state['nodes'][node_id] = node
+        if parent is not None:
+            state['nodes'][parent].children.append(node_id)
+            state['nodes'][parent].redo_child = node_id
+        state['head'] = node_id
+        return node_id
+
+    def _limit(self, session_id):
+        """版本数超过上限时，删除最早创建的、不在当前版本路径上的叶子版本"""
+        state = self._sessions[session_id]
+        nodes = state['nodes']
+        while len(nodes) > self.max_versions:
+            path = set()
+            node_id = state['head']
+            while node_id is not None:
+                path.add(node_id)
+                node_id = nodes[node_id].parent
+            leaves = [node for node in nodes.values() if not node.children and node.id not in path]
+            if not leaves:
+                break
+            victim = min(leaves, key=lambda node: node.created)
+            parent = nodes[victim.parent]
+            parent.children.remove(victim.id)
+            if parent.redo_child == victim.id:
+                parent.redo_child = None
+            del nodes[victim.id]
+            self.store.drop(session_id, victim.dataset_id)
+
+    def _prune_sessions(self):
+        """删除数据已被存储过期清理的会话"""
+        live = self.store.sessions()
+        expired = [session_id for session_id in self._sessions if session_id not in live]
+        for session_id in expired:
+            del self._sessions[session_id]
@@ -0,0 +1,69 @@
+# 近邻索引：DBSCAN 复用的半径近邻图和 eps 建议
+# modules/neighbors.py
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+# 近邻图估计超过该大小(MB)时不建图，DBSCAN 直接在特征矩阵上搜索近邻
+GRAPH_MAX_MB = 256
+# 估计近邻图大小时抽取的查询点数
+GRAPH_ESTIMATE_SAMPLE_SIZE = 1000
+# 计算 k 距离曲线时抽取的查询点数
+K_DISTANCE_SAMPLE_SIZE = 5000
+# 返回给页面的 k 距离曲线的点数
+CURVE_POINTS = 200
+
+
+def radius_graph(X, radius):
+    """
+    X 中每个点到半径 radius 内所有点(包括自身)的距离，稀疏矩阵(CSR)
+
+    DBSCAN(eps, metric='precomputed') 对任何 eps <= radius 都可以直接使用这个图，
+    距离超过 eps 的项被忽略，结果与在 X 上直接运行 DBSCAN 相同。
+    """
+    return NearestNeighbors(radius=radius).fit(X).radius_neighbors_graph(X, mode='distance', sort_results=True)
+
+
+def estimate_graph_mb(X, radius, sample_size=GRAPH_ESTIMATE_SAMPLE_SIZE, random_state=42):
+    """按抽样点的平均近邻数估计 radius_graph 的大小：每个非零项 8 字节距离 + 8 字节列号"""
+    rng = np.random.default_rng(random_state)
+    queries = X if len(X) <= sample_size else X[rng.choice(len(X), size=sample_size, replace=False)]
+    counts = NearestNeighbors(radius=radius).fit(X).radius_neighbors(queries, return_distance=False)
+    mean_neighbors = np.mean([len(neighbors) for neighbors in counts])
+    return mean_neighbors * len(X) * 16 / (1024 * 1024)
+
+
+def k_distances(X, k, sample_size=K_DISTANCE_SAMPLE_SIZE, random_state=42):
+    """
+    抽样点到第 k 个近邻(包括自身)的距离，从小到大排序
+
+    min_samples=k 时，eps 不小于某点的 k 距离，该点才是核心点，
+    所以这条曲线的拐点是区分簇内点和噪声点的 eps。
+    """
+    k = min(k, len(X))
+    rng = np.random.default_rng(random_state)
+    queries = X if len(X) <= sample_size else X[rng.choice(len(X), size=sample_size, replace=False)]
+    distances, _ = NearestNeighbors(n_neighbors=k).fit(X).kneighbors(queries)
+    return np.sort(distances[:, -1])
+
+
+def suggest_eps(distances):
+    """
+    k 距离曲线的拐点：归一化后离首尾连线最远的点(下凸曲线在连线下方)
+
+    返回:
+        (建议的 eps, 拐点在曲线中的位置)，曲线平直时返回中位数
+    """
+    n = len(distances)
+    span = distances[-1] - distances[0]
+    if n < 3 or span <= 0:
+        return float(np.median(distances)), n // 2
+    x = np.linspace(0, 1, n)
+    y = (distances - distances[0]) / span
+    knee = int(np.argmax(x - y))
+    return float(distances[knee]), knee
+
+
+def downsample_curve(distances, points=CURVE_POINTS):
+    """等间隔取 points 个点用于绘图，返回 (位置比例列表, 距离列表)"""
+    index = np.unique(np.linspace(0, len(distances) - 1, min(points, len(distances))).round().astype(int))
+    return (index / max(len(distances) - 1, 1)).tolist(), distances[index].tolist()
@@ -0,0 +1,114 @@
+# 多列异常值检测
+# modules/outliers.py
+import numpy as np
+import pandas as pd
+
+# 各方法的默认阈值
+DEFAULT_THRESHOLDS = {
+    'zscore': 3.0,  # |x - 均值| / 标准差
+    'iqr': 1.5,  # 超出 [Q1 - k·IQR, Q3 + k·IQR]
+    'mad': 3.5,  # 0.6745·|x - 中位数| / MAD (修正 Z 分数)
+}
+METHOD_NAMES = {'zscore': "Z 分数", 'iqr': "IQR", 'mad': "MAD"}
+COMBINE_NAMES = {'any': "任一列", 'all': "全部列"}
+
+# 每次转换为浮点矩阵的内存上限，列较多时按列分块计算
+BLOCK_BYTES = 256 * 1024 * 1024
+
+
+def outlier_mask(data, columns, method='zscore', threshold=None, combine='any', positions=None):
+    """
+    对多个数值列一次性检测异常值
+
+    参数:
+        data: DataFrame(不会被修改)
+        columns: 要检测的列名列表
+        method: 'zscore'、'iqr' 或 'mad'
+        threshold: 阈值，为 None 时使用该方法的默认阈值
+        combine: 'any' 任一列异常即为异常行，'all' 所有列都异常才是异常行
+        positions: 只检测这些行位置(统计量也只按这些行计算)，为 None 时检测全部行
+
+    返回:
+        (rows, cells, counts)
+        rows: 长度为检测行数的布尔数组，表示异常行
+        cells: 形状为 (检测行数, 列数) 的布尔矩阵，表示异常单元格
+        counts: {列名: 该列异常值个数}
+
+    缺失值和无法转换为数值的值不视为异常值，也不会删除所在的行。
+    """
+    if method not in DEFAULT_THRESHOLDS:
+        raise ValueError(f"不支持的异常值检测方法: {method}")
+    if combine not in COMBINE_NAMES:
+        raise ValueError(f"不支持的异常值组合方式: {combine}")
+    if not columns:
+        raise ValueError("请至少选择一个检测异常值的列")
+    missing = [column for column in columns if column not in data.columns]
+    if missing:
+        raise ValueError(f"列 '{missing[0]}' 不存在。")
+    if threshold is None:
+        threshold = DEFAULT_THRESHOLDS[method]
+
+    n_rows = len(data) if positions is None else len(positions)
+    cells = np.zeros((n_rows, len(columns)), dtype=bool)
+    block = max(1, BLOCK_BYTES // max(1, n_rows * 8))
+    for start in range(0, len(columns), block):
+        names = columns[start:start + block]
+        matrix = float_matrix(data, names, positions)
+        cells[:, start:start + len(names)] = _score(matrix, method, threshold)
+
+    rows = cells.any(axis=1) if combine == 'any' else cells.all(axis=1)
+    counts = dict(zip(columns, (int(count) for count in cells.sum(axis=0))))
+    return rows, cells, counts
+
+
+def float_matrix(data, columns, positions=None):
+    """把若干列转换为按列连续存储的 float64 矩阵，非数值转换为 NaN"""
+    n_rows = len(data) if positions is None else len(positions)
+    matrix = np.empty((n_rows, len(columns)), dtype=np.float64, order='F')
+    for i, column in enumerate(columns):
+        series = data[column]
+        if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            series = pd.to_numeric(series, errors='coerce')
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        matrix[:, i] = values if positions is None else values[positions]
+    return matrix
+
+
+def _score(matrix, method, threshold):
+    """按列计算统计量并返回异常单元格；离散程度为 0 的列不判定异常值"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if method == 'zscore':
+            return zscore_cells(matrix, np.nanmean(matrix, axis=0), np.nanstd(matrix, axis=0), threshold)
+        if method == 'iqr':
+            q1, q3 = np.nanpercentile(matrix, [25, 75], axis=0)
+            scale = q3 - q1
+            outside = (matrix < q1 - threshold * scale) | (matrix > q3 + threshold * scale)
+            outside[:, ~(scale > 0)] = False
+            return outside
+        center = np.nanmedian(matrix, axis=0)
+        scale = np.nanmedian(np.abs(matrix - center), axis=0)
+        score = 0.6745 * np.abs(matrix - center) / scale
+    return _exceeds(score, scale, threshold)
+
+
+def zscore_cells(matrix, center, scale, threshold):
+    """按给定的各列均值和标准差(如分块累计的统计量)计算 Z 分数异常单元格"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        score = np.abs(matrix - center) / scale
+    return _exceeds(score, scale, threshold)
+
+
+def _exceeds(score, scale, threshold):
+    score[:, ~(scale > 0)] = 0
+    # NaN 与阈值比较结果为 False，缺失值不会被判定为异常值
+    return score > threshold
+
+
+def describe_outliers(columns, method, threshold=None, combine='any'):
+    """异常值规则的简短说明"""
+    if threshold is None:
+        threshold = DEFAULT_THRESHOLDS[method]
+    names = ", ".join(str(column) for column in columns)
+    if len(columns) > 1:
+        return f"[{names}] {METHOD_NAMES[method]}>{threshold} ({COMBINE_NAMES[combine]})"
+    return f"{names} {METHOD_NAMES[method]}>{threshold}"
@@ -0,0 +1,44 @@
+# 数据集结构概况
+# modules/profile.py
+import pandas as pd
+
+
+def profile_schema(df, numeric_na_tolerance=0.1):
+    """
+    计算数据集的列类型概况，供各页面复用
+
+    参数:
+        df: 数据集
+        numeric_na_tolerance: 文本列转换为数值后允许的缺失值比例
+
+    返回:
+        {
+            'rows': 行数,
+            'columns': 全部列名,
+            'dtypes': {列名: 类型名},
+            'numeric_columns': 数值列,
+            'non_numeric_columns': 非数值列,
+            'categorical_columns': 文本和 category 列,
+            'numeric_convertible': 可以转换为数值的文本列,
+            'cardinality': {列名: 唯一值个数},
+        }
+    """
+    numeric_columns = list(df.select_dtypes(include=['number']).columns)
+    categorical_columns = list(df.select_dtypes(include=['object', 'category']).columns)
+
+    numeric_convertible = []
+    for column in df.select_dtypes(include=['object']).columns:
+        converted = pd.to_numeric(df[column], errors='coerce')
+        if converted.notna().any() and converted.isna().sum() <= len(df) * numeric_na_tolerance:
+            numeric_convertible.append(column)
+
+    return {
+        'rows': len(df),
+        'columns': list(df.columns),
+        'dtypes': {column: str(dtype) for column, dtype in df.dtypes.items()},
+        'numeric_columns': numeric_columns,
+        'non_numeric_columns': [column for column in df.columns if column not in numeric_columns],
+        'categorical_columns': categorical_columns,
+        'numeric_convertible': numeric_convertible,
+        'cardinality': {column: int(df[column].nunique(dropna=True)) for column in df.columns},
+    }
@@ -0,0 +1,134 @@
+# 模型注册表：保存训练好的模型，打分时按需加载
+# modules/registry.py
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import joblib
+
+from modules.cache import remove_file
+
+
+class ModelRegistry:
+    """
+    磁盘上的模型注册表：每个模型保存为 <id>.joblib(模型、标准化器、特征列表)和 <id>.json(名称、算法、指标等说明)
+
+    说明中记录保存模型的会话 owner；读取、加载和删除时传入 owner 只允许该会话访问，
+    owner 为 None 时不检查(命令行工具)。
+
+    列出模型只读取 JSON 文件；模型在第一次打分时才加载，最近使用的 max_loaded 个保留在内存中，
+    分块打分和重复打分不会重新读取模型文件。
+    """
+    SUFFIX = '.joblib'
+
+    def __init__(self, root, max_loaded=8):
+        self.root = root
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()  # 模型 id -> 加载后的条目
+        self._lock = threading.Lock()
+
+    def _path(self, model_id, suffix):
+        # 模型 id 来自请求参数，只接受 save 生成的格式，避免路径穿越
+        if not re.fullmatch(r'[0-9a-f]{32}', model_id or ''):
+            raise KeyError(model_id)
+        return os.path.join(self.root, model_id + suffix)
+
+    def save(self, model, scaler, features, algorithm, target=None, metrics=None, name=None, owner=None):
+        """
+        保存模型，返回说明信息 {'id', 'name', 'algorithm', 'features', 'target', 'metrics', 'created', 'owner'}
+
+        scaler 为训练时使用的标准化器，打分时先用它转换 features 列，与训练时的输入一致
+        """
+        os.makedirs(self.root, exist_ok=True)
+        model_id = uuid.uuid4().hex
+        info = {
+            'id': model_id,
+            'name': name or f"{algorithm} {time.strftime('%Y-%m-%d %H:%M:%S')}",
+            'algorithm': algorithm,
+            'features': list(features),
+            'target': target,
+            'metrics': {key: float(value) for key, value in (metrics or {}).items()},
+            'created': time.time(),
+            'owner': owner,
+        }
+        # 先写模型文件，说明文件写入后模型才出现在列表中；都先写临时文件再替换
+        _write_atomic(self._path(model_id, self.SUFFIX),
+                      lambda path: joblib.dump({'model': model, 'scaler': scaler, 'features': info['features']}, path))
+        _write_atomic(self._path(model_id, '.json'), lambda path: _dump_json(info, path))
+        return info
+
+    def list(self, owner=None):
+        """owner 可以访问的模型的说明信息，最新的在前"""
+        if not os.path.isdir(self.root):
+            return []
+        models = []
+        for filename in os.listdir(self.root):
+            if filename.endswith('.json'):
+                info = self.info(filename[:-len('.json')], owner)
+                if info is not None:
+                    models.append(info)
+        return sorted(models, key=lambda info: info['created'], reverse=True)
+
+    def info(self, model_id, owner=None):
+        """模型的说明信息，不存在或 owner 无权访问时返回 None"""
+        try:
+            with open(self._path(model_id, '.json'), encoding='utf-8') as f:
+                info = json.load(f)
+        except (KeyError, OSError, ValueError):
+            return None
+        return info if _allowed(info, owner) else None
+
+    def load(self, model_id, owner=None):
+        """
+        加载模型，返回 {'model', 'scaler', 'features', 'info'}；已加载的模型直接返回，
+        不存在或 owner 无权访问时抛出 KeyError
+        """
+        with self._lock:
+            entry = self._loaded.get(model_id)
+            if entry is not None:
+                if not _allowed(entry['info'], owner):
+                    raise KeyError(model_id)
+                self._loaded.move_to_end(model_id)
+                return entry
+        info = self.info(model_id, owner)
+        if info is None:
+            raise KeyError(model_id)
+        entry = dict(joblib.load(self._path(model_id, self.SUFFIX)), info=info)
+        with self._lock:
+            self._loaded[model_id] = entry
+            self._loaded.move_to_end(model_id)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return entry
+
+    def delete(self, model_id, owner=None):
+        """删除模型文件并从内存中移除，不存在或 owner 无权访问时抛出 KeyError"""
+        if self.info(model_id, owner) is None:
+            raise KeyError(model_id)
+        with self._lock:
+            self._loaded.pop(model_id, None)
+        remove_file(self._path(model_id, '.json'))
+        remove_file(self._path(model_id, self.SUFFIX))
+
+
+def _allowed(info, owner):
+    return owner is None or info.get('owner') == owner
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_file(tmp_path)
+        raise
+
+
+def _dump_json(info, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
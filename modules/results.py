@@ -0,0 +1,96 @@
+# 分析结果缓存
+# modules/results.py
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class ResultCache:
+    """
+    分析结果的内存缓存：键为 (数据集版本, 算法, 特征, 目标列, 超参数)，值为训练好的模型、指标和图表
+
+    按最近使用顺序淘汰，条目数超过 max_entries 或估算的总大小超过 max_bytes 时淘汰最久未用的条目；
+    单个结果超过 max_bytes 时不缓存。数据集版本使用版本树的节点 id，清洗产生新版本后自然失效。
+    """
+
+    def __init__(self, max_entries=64, max_mb=512):
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self._entries = OrderedDict()  # 键 -> (值, 字节数)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(version, algorithm, features, target, params):
+        return version, algorithm, tuple(features), target, tuple(sorted(params.items()))
+
+    def get(self, key):
+        """返回缓存的结果并记录命中，不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """缓存结果，返回估算的字节数"""
+        size = estimate_size(value)
+        with self._lock:
+            if size > self.max_bytes:
+                return size
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+            return size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size_mb': self._bytes / (1024 * 1024),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def estimate_size(obj, _seen=None):
+    """
+    估算对象占用的内存字节数：累计 numpy 数组、DataFrame 和字符串的大小，
+    递归进入容器和对象属性(包括 sklearn 决策树等只能通过 __getstate__ 取得数组的对象)
+    """
+    if _seen is None:
+        _seen = {}
+    if id(obj) in _seen:
+        return 0
+    # 同时保存对象本身，避免 __getstate__ 返回的临时对象被释放后 id 被复用
+    _seen[id(obj)] = obj
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(index=True, deep=False)))
+    if isinstance(obj, (str, bytes)):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sum(estimate_size(key, _seen) + estimate_size(value, _seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(estimate_size(item, _seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        return estimate_size(vars(obj), _seen)
+    if hasattr(obj, '__getstate__') and type(obj).__module__.startswith('sklearn'):
+        return estimate_size(obj.__getstate__(), _seen)
+    return sys.getsizeof(obj)
@@ -0,0 +1,68 @@
+# 大数据集的聚类与降维
+# modules/scalable.py
+import numpy as np
+import sklearn
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA, IncrementalPCA
+
+# 'auto' 模式下超过该行数时 K 均值改用 MiniBatchKMeans
+MINIBATCH_KMEANS_MIN_ROWS = 100000
+# 'auto' 模式下超过该行数时 PCA 改用 IncrementalPCA
+INCREMENTAL_PCA_MIN_ROWS = 200000
+# scikit-learn 1.5 起 PCA 在行数远大于列数时通过协方差矩阵求解，不复制数据矩阵，
+# 比 IncrementalPCA 更快也更省内存；更早的版本会复制并中心化整个矩阵，'auto' 只在这些版本上改用 IncrementalPCA
+PCA_COPIES_DATA = tuple(int(part) for part in sklearn.__version__.split('.')[:2]) < (1, 5)
+# 小批量的行数
+BATCH_ROWS = 8192
+METHODS = ('auto', 'full', 'minibatch')
+
+
+def resolve_method(method, n_rows, min_rows):
+    """把 'auto' 按行数解析为 'full' 或 'minibatch'"""
+    if method not in METHODS:
+        raise ValueError(f"不支持的训练方式: {method}，请使用 {', '.join(METHODS)}")
+    if method == 'auto':
+        return 'minibatch' if n_rows > min_rows else 'full'
+    return method
+
+
+def fit_kmeans(X, n_clusters, method='auto', random_state=42, batch_rows=BATCH_ROWS):
+    """
+    训练 K 均值模型，返回 (模型, 聚类标签, 实际使用的方式)
+
+    'minibatch' 使用 MiniBatchKMeans：每步只用 batch_rows 行更新聚类中心，
+    时间和临时内存与小批量大小成正比，而不是与整个数据集成正比。
+    """
+    method = resolve_method(method, len(X), MINIBATCH_KMEANS_MIN_ROWS)
+    if method == 'full':
+        model = KMeans(n_clusters=n_clusters, random_state=random_state)
+    else:
+        model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_rows, n_init=3, random_state=random_state)
+    labels = model.fit_predict(X)
+    return model, labels, method
+
+
+def fit_pca(X, n_components, method='auto', batch_rows=BATCH_ROWS):
+    """
+    训练 PCA 模型，返回 (模型, 降维后的矩阵, 实际使用的方式)
+
+    'minibatch' 使用 IncrementalPCA：按 batch_rows 行的小批量依次 partial_fit 和 transform，
+    只复制当前批次；scikit-learn 1.5 之前的 PCA 会复制并中心化整个矩阵。
+    """
+    method = resolve_method(method, len(X), INCREMENTAL_PCA_MIN_ROWS if PCA_COPIES_DATA else np.inf)
+    if method == 'full':
+        model = PCA(n_components=n_components)
+        return model, model.fit_transform(X), method
+
+    model = IncrementalPCA(n_components=n_components)
+    batch_rows = max(batch_rows, n_components)
+    starts = range(0, len(X), batch_rows)
+    for start in starts:
+        batch = X[start:start + batch_rows]
+        # 最后一批不足 n_components 行时无法单独拟合，已拟合的批次足以估计主成分
+        if len(batch) >= n_components or start == 0:
+            model.partial_fit(batch)
+    reduced = np.empty((len(X), n_components))
+    for start in starts:
+        reduced[start:start + batch_rows] = model.transform(X[start:start + batch_rows])
+    return model, reduced, method
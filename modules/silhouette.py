@@ -0,0 +1,98 @@
+# 轮廓系数
+# modules/silhouette.py
+import numpy as np
+from scipy.stats import norm
+from sklearn.metrics import pairwise_distances_chunked
+
+# 超过该行数时 'auto' 模式改用分层抽样估计
+EXACT_MAX_ROWS = 20000
+# 抽样估计使用的样本数
+SAMPLE_SIZE = 2000
+# 分块计算距离时每块距离矩阵占用的内存上限(MB)
+WORKING_MEMORY_MB = 64
+MODES = ('auto', 'exact', 'sampled')
+
+
+def silhouette(X, labels, mode='auto', sample_size=SAMPLE_SIZE, exact_max_rows=EXACT_MAX_ROWS,
+               confidence=0.95, random_state=42, working_memory=WORKING_MEMORY_MB):
+    """
+    计算平均轮廓系数，距离矩阵分块计算，任何时候只保留 working_memory MB 的距离块
+
+    参数:
+        X: 特征矩阵
+        labels: 聚类标签，至少两个簇
+        mode: 'exact' 对所有点精确计算(O(n²) 时间)；'sampled' 按簇分层抽取 sample_size 个点，
+            计算这些点相对全部数据的精确轮廓值(O(sample_size·n) 时间)，给出总体均值的估计和置信区间；
+            'auto' 行数超过 exact_max_rows 时抽样，否则精确计算
+        confidence: 置信区间的置信水平
+        random_state: 抽样的随机种子，相同的数据和种子得到相同的样本
+
+    返回:
+        {'score': 轮廓系数, 'mode': 'exact'/'sampled', 'sample_size': 参与计算的点数,
+         'ci_low', 'ci_high': 置信区间(精确计算时等于 score), 'confidence'}
+    """
+    if mode not in MODES:
+        raise ValueError(f"不支持的轮廓系数计算方式: {mode}")
+    X = np.asarray(X)
+    labels = np.asarray(labels)
+    n = len(labels)
+    if mode == 'auto':
+        mode = 'sampled' if n > exact_max_rows and sample_size < n else 'exact'
+
+    codes = np.unique(labels, return_inverse=True)[1].reshape(-1)
+    counts = np.bincount(codes)
+    if len(counts) < 2 or len(counts) >= n:
+        raise ValueError("轮廓系数需要 2 到 样本数-1 个簇")
+
+    if mode == 'exact':
+        values = _point_silhouettes(X, codes, counts, np.arange(n), working_memory)
+        score = float(values.mean())
+        return {'score': score, 'mode': 'exact', 'sample_size': n, 'ci_low': score, 'ci_high': score,
+                'confidence': confidence}
+
+    # 分层抽样：各簇按大小比例分配样本(每簇至少 2 个点)，按簇加权估计总体均值和方差
+    rng = np.random.default_rng(random_state)
+    allocation = np.minimum(counts, np.maximum(2, np.round(sample_size * counts / n).astype(int)))
+    strata = [rng.choice(np.flatnonzero(codes == code), size=size, replace=False)
+              for code, size in enumerate(allocation)]
+    sample = np.concatenate(strata)
+    values = _point_silhouettes(X, codes, counts, sample, working_memory)
+
+    weights = counts / n
+    score = 0.0
+    variance = 0.0
+    start = 0
+    for code, size in enumerate(allocation):
+        stratum = values[start:start + size]
+        start += size
+        score += weights[code] * stratum.mean()
+        if size > 1:
+            # 有限总体校正：整簇都被抽到时该簇没有抽样误差
+            variance += weights[code] ** 2 * (1 - size / counts[code]) * stratum.var(ddof=1) / size
+    margin = norm.ppf(0.5 + confidence / 2) * np.sqrt(variance)
+    return {'score': float(score), 'mode': 'sampled', 'sample_size': int(len(sample)),
+            'ci_low': float(score - margin), 'ci_high': float(score + margin), 'confidence': confidence}
+
+
+def _point_silhouettes(X, codes, counts, points, working_memory):
+    """points 中各点相对全部数据的轮廓值；按簇排序后用 reduceat 求各簇的距离和，不保留完整的距离矩阵"""
+    order = np.argsort(codes, kind='stable')
+    X_sorted = X[order]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    sums = np.concatenate([
+        np.add.reduceat(chunk, starts, axis=1)
+        for chunk in pairwise_distances_chunked(X[points], X_sorted, working_memory=working_memory)
+    ])
+
+    own = codes[points]
+    rows = np.arange(len(points))
+    own_count = counts[own]
+    # 自身到自身的距离为 0，簇内平均距离除以 簇大小-1
+    a = sums[rows, own] / np.maximum(own_count - 1, 1)
+    means = sums / counts
+    means[rows, own] = np.inf
+    b = means.min(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = (b - a) / np.maximum(a, b)
+    # 与 sklearn 一致：单点簇的轮廓值为 0
+    return np.nan_to_num(np.where(own_count > 1, values, 0.0))
@@ -0,0 +1,415 @@
+# 多会话数据集存储
+# modules/store.py
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from modules.cache import write_frame, read_frame, remove_file
+from modules.profile import profile_schema
+
+
+def column_blocks(df):
+    """
+    各列数据块的键和字节数 [(键, 字节数), ...]，最后一项为索引
+
+    numpy 类型的列以底层数组的地址、步长、长度和类型为键：写时复制模式下清洗未改动的列
+    与父版本共享同一数组，键相同；其他类型(如 category)无法判断是否共享，各自单独计算
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    blocks = []
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        if isinstance(series.dtype, np.dtype):
+            values = series.to_numpy(copy=False)
+            key = (values.__array_interface__['data'][0], values.strides, len(values), values.dtype.str)
+        else:
+            key = object()
+        blocks.append((key, int(usage.iloc[position])))
+    blocks.append((object(), int(df.index.memory_usage(deep=True))))
+    return blocks
+
+
+class _Entry:
+    """存储条目：内存中的 DataFrame 或其在磁盘上的列式副本"""
+
+    def __init__(self, df, meta, version):
+        self.df = df
+        self.version = version
+        self.profile = None
+        self.blocks = column_blocks(df)
+        self.nbytes = sum(nbytes for _, nbytes in self.blocks)
+        self.rows = len(df)
+        self.columns = df.columns
+        self.meta = meta
+        # 磁盘副本：spill_path 保存索引和与其他版本不共享的列，
+        # spill_columns 为各列所在的 (文件, 文件中的列名)，spill_files 为引用的全部文件
+        self.spill_path = None
+        self.spill_columns = None
+        self.spill_files = []
+        # 正在锁外写入磁盘副本
+        self.spilling = False
+        self.last_access = time.time()
+
+
+class DatasetStore:
+    """
+    数据集存储：按 (会话 id, 数据集 id) 保存 DataFrame
+
+    所有会话共享一个进程级内存预算，超出时把最近最少使用的数据集
+    写入磁盘(Arrow IPC 列式文件)并释放内存，再次访问时透明地重新加载。
+    同一数组被多个数据集共享时(如清洗版本中未改动的列)内存只计一次，写入磁盘也只写一次，
+    之后的版本引用已写出的文件。
+    所有方法都是线程安全的，可以在多线程的 Flask 服务中使用；
+    磁盘读写在锁外进行，完成后确认条目未被覆盖或删除，不会阻塞其他会话。
+    """
+    SUFFIX = '.feather'
+
+    def __init__(self, spill_dir, memory_budget_mb=2048, idle_timeout=24 * 3600):
+        self.spill_dir = spill_dir
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.idle_timeout = idle_timeout
+        self._entries = OrderedDict()  # 按访问顺序排列，最早访问的在前
+        self._memory = 0
+        # 正在写入磁盘、即将释放的内存
+        self._spilling = 0
+        # 内存中的数据块 -> [字节数, 引用它的条目数]
+        self._blocks = {}
+        # 已写入磁盘的数据块 -> (文件, 文件中的列名)，只记录仍在内存中的块
+        self._block_files = {}
+        # 磁盘文件 -> 引用它的条目数
+        self._file_refs = {}
+        self._versions = itertools.count(1)
+        self._lock = threading.RLock()
+        self._clean_spill_dir()
+
+    def put(self, session_id, dataset_id, df, **meta):
+        """保存数据集，覆盖同名数据集，返回新的版本号"""
+        key = (session_id, dataset_id)
+        entry = _Entry(df, meta, None)
+        with self._lock:
+            entry.version = next(self._versions)
+            self._discard(key)
+            self._entries[key] = entry
+            self._hold(entry)
+            self._expire()
+        self._evict(keep=key)
+        return entry.version
+
+    def get(self, session_id, dataset_id):
+        """读取数据集，不存在时返回 None；已写入磁盘的数据集会重新加载到内存"""
+        key = (session_id, dataset_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._touch(key, entry)
+            if entry.df is not None:
+                return entry.df
+            path, locations = entry.spill_path, entry.spill_columns
+        df = _read_spill(path, locations, entry.columns)
+        blocks = None if df is None else column_blocks(df)
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                # 读取期间数据集被覆盖或删除，按最新状态重新读取
+                return self.get(session_id, dataset_id)
+            if entry.df is not None:
+                # 其他线程已经加载
+                return entry.df
+            if df is None:
+                # 磁盘副本丢失，数据集不再可用
+                self._discard(key)
+                return None
+            entry.df = df
+            entry.blocks = blocks
+            self._hold(entry)
+            # 由此版本派生的新版本共享这些数组，再写入磁盘时直接引用已有的文件
+            for (block, _), location in zip(blocks, locations):
+                self._block_files.setdefault(block, location)
+        self._evict(keep=key)
+        return df
+
+    def meta(self, session_id, dataset_id):
+        """读取数据集的附加信息(不会加载数据)，不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get((session_id, dataset_id))
+            return None if entry is None else entry.meta
+
+    def version(self, session_id, dataset_id):
+        """数据集的版本号，每次 put 都会产生新版本，不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get((session_id, dataset_id))
+            return None if entry is None else entry.version
+
+    def profile(self, session_id, dataset_id):
+        """
+        数据集的列类型概况(见 profile_schema)，每个版本只计算一次，
+        不存在时返回 None
+        """
+        key = (session_id, dataset_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.profile is not None:
+                return None if entry is None else entry.profile
+        df = self.get(session_id, dataset_id)
+        if df is None:
+            return None
+        # 在锁外计算，避免阻塞其他会话
+        profile = profile_schema(df)
+        with self._lock:
+            if self._entries.get(key) is entry:
+                entry.profile = profile
+        return profile
+
+    def drop(self, session_id, dataset_id=None):
+        """删除数据集，dataset_id 为 None 时删除该会话的全部数据集"""
+        with self._lock:
+            keys = [key for key in self._entries
+                    if key[0] == session_id and (dataset_id is None or key[1] == dataset_id)]
+            for key in keys:
+                self._discard(key)
+
+    def sessions(self):
+        """有数据集的会话 id"""
+        with self._lock:
+            return {session_id for session_id, _ in self._entries}
+
+    def stats(self):
+        """返回存储的使用情况；memory_bytes 中共享的数组只计一次"""
+        with self._lock:
+            in_memory = sum(1 for entry in self._entries.values() if entry.df is not None)
+            return {
+                'datasets': len(self._entries),
+                'in_memory': in_memory,
+                'spilled': len(self._entries) - in_memory,
+                'memory_bytes': self._memory,
+                'memory_budget': self.memory_budget,
+                'spill_files': len(self._file_refs),
+            }
+
+    def _touch(self, key, entry):
+        entry.last_access = time.time()
+        self._entries.move_to_end(key)
+
+    def _hold(self, entry):
+        """登记条目在内存中引用的数据块，新出现的块计入内存"""
+        for block, nbytes in entry.blocks:
+            held = self._blocks.get(block)
+            if held is None:
+                self._blocks[block] = [nbytes, 1]
+                self._memory += nbytes
+            else:
+                held[1] += 1
+
+    def _release(self, entry):
+        """释放条目的内存，不再被任何条目引用的数据块从内存中扣除"""
+        entry.df = None
+        for block, _ in entry.blocks:
+            held = self._blocks[block]
+            held[1] -= 1
+            if held[1] == 0:
+                del self._blocks[block]
+                self._block_files.pop(block, None)
+                self._memory -= held[0]
+
+    def _exclusive_bytes(self, entry):
+        """释放条目后可以腾出的内存：只被它引用的数据块"""
+        return sum(self._blocks[block][0] for block, _ in entry.blocks if self._blocks[block][1] == 1)
+
+    def snapshot(self, session_id, dataset_id):
+        """
+        数据集的磁盘副本，供其他进程(如训练子进程)用 read_snapshot 读取，不存在时返回 None
+
+        还没有磁盘副本时先写入磁盘(不释放内存，之后被淘汰时直接释放)；
+        返回的副本引用的文件在调用 release_snapshot 之前不会被删除。
+        无法写成列式文件的数据集返回 None
+        """
+        key = (session_id, dataset_id)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    return None
+                if entry.spill_path is not None:
+                    for path in entry.spill_files:
+                        self._file_refs[path] += 1
+                    return {'path': entry.spill_path, 'locations': list(entry.spill_columns),
+                            'columns': list(entry.columns), 'files': list(entry.spill_files)}
+                spill = self._begin_spill(entry)
+            path = self._write_spill(spill)
+            with self._lock:
+                if not self._finish_spill(key, entry, spill, path) and path is None:
+                    return None
+
+    def release_snapshot(self, snapshot):
+        """释放 snapshot 返回的磁盘副本，不再被引用的文件被删除"""
+        with self._lock:
+            for path in snapshot['files']:
+                self._unref_file(path)
+
+    def _evict(self, keep=None):
+        """
+        内存超过预算时，把最久未使用的数据集写入磁盘；调用时不持有锁
+
+        在锁内选出要释放的数据集，在锁外写文件，写完后确认条目没有被覆盖或删除再释放内存。
+        已经写入磁盘的数据块不再重复写，改为引用已有的文件。
+        """
+        unspillable = set()
+        while True:
+            with self._lock:
+                victim = self._pick_victim(keep, unspillable)
+                if victim is None:
+                    return
+                key, entry = victim
+                if entry.spill_path is not None:
+                    # 数据集不可变，已有磁盘副本时直接释放内存
+                    self._release(entry)
+                    continue
+                pending = self._exclusive_bytes(entry)
+                entry.spilling = True
+                self._spilling += pending
+                spill = self._begin_spill(entry)
+            path = self._write_spill(spill)
+            with self._lock:
+                entry.spilling = False
+                self._spilling -= pending
+                if self._finish_spill(key, entry, spill, path):
+                    if entry.df is not None:
+                        self._release(entry)
+                elif path is None:
+                    unspillable.add(entry)
+
+    def _begin_spill(self, entry):
+        """在锁内确定各列的位置：已写入磁盘的数据块引用已有文件(增加引用计数)，其余列需要写入"""
+        locations = [self._block_files.get(block) for block, _ in entry.blocks[:-1]]
+        shared = sorted({location[0] for location in locations if location is not None})
+        for path in shared:
+            self._file_refs[path] += 1
+        return entry.df, locations, shared
+
+    def _write_spill(self, spill):
+        """在锁外写入尚未在磁盘上的列和索引，返回文件路径，无法写成列式文件时返回 None"""
+        df, locations, _ = spill
+        own = [position for position, location in enumerate(locations) if location is None]
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, uuid.uuid4().hex + self.SUFFIX)
+        # 文件中按位置命名列，列名不必是字符串，也不怕重名
+        if write_frame(path, df.iloc[:, own].set_axis([f'c{position}' for position in own], axis=1)):
+            return path
+        return None
+
+    def _finish_spill(self, key, entry, spill, path):
+        """
+        在锁内登记写好的磁盘副本，返回条目是否已有磁盘副本；
+        写入失败、写入期间条目被覆盖或删除、或其他线程已经写好副本时撤销本次写入
+        """
+        _, locations, shared = spill
+        if path is None or self._entries.get(key) is not entry or entry.spill_path is not None:
+            if path is not None:
+                remove_file(path)
+            for shared_path in shared:
+                self._unref_file(shared_path)
+            return entry.spill_path is not None and self._entries.get(key) is entry
+        self._file_refs[path] = 1
+        locations = list(locations)
+        for position, location in enumerate(locations):
+            if location is None:
+                locations[position] = (path, f'c{position}')
+                block = entry.blocks[position][0]
+                if block in self._blocks:
+                    self._block_files.setdefault(block, locations[position])
+        entry.spill_path = path
+        entry.spill_columns = locations
+        entry.spill_files = [path] + shared
+        return True
+
+    def _pick_victim(self, keep, skip):
+        """最久未使用的、可以释放内存的条目，内存(扣除正在写入的部分)未超预算时返回 None"""
+        if self._memory - self._spilling <= self.memory_budget:
+            return None
+        for key, entry in self._entries.items():
+            if key != keep and entry.df is not None and not entry.spilling and entry not in skip:
+                return key, entry
+        return None
+
+    def _expire(self):
+        """
+        删除长时间未访问的会话的全部数据集
+
+        同一会话的各版本互相关联(版本树、共享的列和磁盘文件)，只按会话整体过期，
+        不会删掉仍被当前会话引用的旧版本
+        """
+        deadline = time.time() - self.idle_timeout
+        last_access = {}
+        for (session_id, _), entry in self._entries.items():
+            last_access[session_id] = max(last_access.get(session_id, 0), entry.last_access)
+        for key in [key for key in self._entries if last_access[key[0]] < deadline]:
+            self._discard(key)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry.df is not None:
+            self._release(entry)
+        for path in entry.spill_files:
+            self._unref_file(path)
+        entry.spill_files = []
+
+    def _unref_file(self, path):
+        self._file_refs[path] -= 1
+        if self._file_refs[path] == 0:
+            del self._file_refs[path]
+            remove_file(path)
+            for block in [block for block, location in self._block_files.items() if location[0] == path]:
+                del self._block_files[block]
+
+    def _clean_spill_dir(self):
+        """启动时删除上次运行遗留的、超过空闲时间的磁盘副本"""
+        if not os.path.isdir(self.spill_dir):
+            return
+        deadline = time.time() - self.idle_timeout
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    remove_file(path)
+            except OSError:
+                continue
+
+
+def read_snapshot(snapshot, columns=None):
+    """读取 DatasetStore.snapshot 返回的磁盘副本，columns 为要读取的列(默认全部)，文件丢失时返回 None"""
+    names = snapshot['columns']
+    positions = range(len(names)) if columns is None else [names.index(column) for column in columns]
+    return _read_spill(snapshot['path'], snapshot['locations'], names, positions)
+
+
+def _read_spill(path, locations, columns, positions=None):
+    """
+    按 spill_columns 从各文件读取列，拼成原来的 DataFrame；任一文件丢失时返回 None
+
+    positions 为只读取的列的位置，默认为全部列
+    """
+    positions = range(len(locations)) if positions is None else list(positions)
+    names = {path: []}
+    for position in positions:
+        file, name = locations[position]
+        names.setdefault(file, []).append(name)
+    frames = {}
+    for file, file_columns in names.items():
+        frames[file] = read_frame(file, columns=file_columns)
+        if frames[file] is None:
+            return None
+    # 引用的列来自其他版本的文件，行顺序相同，索引以本版本为准
+    index = frames[path].index
+    data = {i: frames[locations[position][0]][locations[position][1]].set_axis(index)
+            for i, position in enumerate(positions)}
+    df = pd.DataFrame(data, index=index, copy=False)
+    df.columns = [columns[position] for position in positions]
+    return df
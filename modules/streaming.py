@@ -0,0 +1,502 @@
+# 大文件的分块清洗、导出和模型打分
+# modules/streaming.py
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from modules.cleaner import CleaningPlan
+from modules.duplicates import FingerprintSet, row_fingerprints
+from modules.imputation import STRATEGY_NAMES, resolve_strategies, impute, describe_strategies
+from modules.outliers import DEFAULT_THRESHOLDS, float_matrix, zscore_cells
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时不能导出 Parquet
+    pa = None
+
+# 每块读取的行数
+STREAM_CHUNK_ROWS = 200000
+# 需要先扫描一遍文件累计统计量的填充策略
+STAT_STRATEGIES = {'mean', 'mode'}
+# 需要全部数据才能计算、无法分块执行的填充策略
+UNSUPPORTED_STRATEGIES = {'median', 'bfill', 'group_median'}
+EXPORT_FORMATS = {'.csv': 'csv', '.parquet': 'parquet'}
+
+
+class RunningMoments:
+    """按列累计计数、均值和离差平方和(并行 Welford 合并)，忽略缺失值"""
+
+    def __init__(self, n_columns):
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+
+    def update(self, matrix):
+        count = np.sum(~np.isnan(matrix), axis=0).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(matrix, axis=0) / count
+            m2 = np.nansum((matrix - mean) ** 2, axis=0)
+            total = self.count + count
+            delta = mean - self.mean
+            merged_mean = self.mean + delta * count / total
+            merged_m2 = self.m2 + m2 + delta ** 2 * self.count * count / total
+        seen = count > 0
+        self.mean[seen] = merged_mean[seen]
+        self.m2[seen] = merged_m2[seen]
+        self.count = total
+
+    @property
+    def std(self):
+        """总体标准差(ddof=0)，与 np.nanstd、scipy.stats.zscore 一致"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.m2 / self.count)
+
+    @property
+    def means(self):
+        return np.where(self.count > 0, self.mean, np.nan)
+
+
+class StreamingCleaner:
+    """
+    分块清洗大于内存的 CSV 文件，直接写出 CSV 或 Parquet 文件，不把整个数据集读入内存
+
+    rules 与 DataCleaning.apply_cleaning_rules 的规则相同，也可以是依次执行的多组规则
+    (如版本树上从原始数据到当前版本的各次清洗)。文件会被扫描若干遍：
+      1. 推断各列在整个文件中一致的类型(各分块单独推断的类型可能不同)
+      2. 每个需要全表统计量的步骤扫描一遍：Z 分数和均值填充累计均值与方差，众数填充累计取值计数
+      3. 逐块执行全部步骤并写出结果；删除重复行使用跨分块的行指纹集合(见 FingerprintSet)
+    内存占用只与块大小、不重复的行数和众数列的不同取值个数有关。
+    中位数、IQR、MAD 等需要全部数据排序的统计量不支持分块计算。
+
+    column_dtypes 为上传时 compact_dtypes 压缩后的各列类型(见 memory_report 的 dtype_after)，
+    每块清洗前按同样的类型转换(数值文本转为数值、整数和浮点降级)，结果与内存中的清洗一致；
+    category 只影响内存占用，分块中仍按文本处理。
+    """
+
+    def __init__(self, rules, chunk_rows=STREAM_CHUNK_ROWS, column_dtypes=None):
+        if isinstance(rules, dict):
+            rules = [rules]
+        self.plans = [CleaningPlan(plan_rules) for plan_rules in rules]
+        self.chunk_rows = chunk_rows
+        self.column_dtypes = {column: dtype for column, dtype in (column_dtypes or {}).items()
+                              if dtype not in ('category', 'object')}
+        # 进度回调 progress(scan=..., scans=..., bytes_parsed=..., bytes_total=..., rows=...)
+        self.progress = None
+        self._steps = {(p, i): step for p, plan in enumerate(self.plans) for i, step in enumerate(plan.steps)}
+        for step in self._steps.values():
+            _check_streamable(step)
+        self._stat_keys = [key for key, step in self._steps.items() if _needs_stats(step)]
+        self._specs = {}
+
+    @property
+    def scans(self):
+        """读取文件的遍数：推断类型、各统计量步骤、写出结果"""
+        return len(self._stat_keys) + 2
+
+    def run(self, source, target, fmt=None, **read_csv_kwargs):
+        """
+        清洗 CSV 文件 source 并写入 target，fmt 为 'csv' 或 'parquet'，为 None 时按扩展名确定
+
+        返回:
+            {'rows': 读取的行数, 'rows_out': 写出的行数, 'scans': 扫描遍数, 'seconds': 耗时,
+             'plan': 各步骤说明及删除的行数}
+        """
+        if fmt is None:
+            fmt = EXPORT_FORMATS.get(os.path.splitext(target)[1].lower())
+        if fmt not in ('csv', 'parquet'):
+            raise ValueError("流式导出只支持 CSV 和 Parquet 格式")
+        if fmt == 'parquet' and pa is None:
+            raise ValueError("导出 Parquet 文件需要安装 pyarrow")
+
+        start = time.perf_counter()
+        self._specs = {}
+        stats = {}
+        dtypes = read_csv_kwargs.pop('dtype', None)
+        if dtypes is None:
+            dtypes = self.infer_dtypes(source, **read_csv_kwargs)
+        scan = 1
+        for key in self._stat_keys:
+            scan += 1
+            stats[key] = self._collect(key, source, dtypes, stats, scan, read_csv_kwargs)
+
+        removed = {key: 0 for key in self._steps}
+        filled = {}
+        rows = rows_out = 0
+        tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+        writer = _ParquetWriter(tmp_path) if fmt == 'parquet' else _CsvWriter(tmp_path)
+        try:
+            state = {}
+            for chunk in self._chunks(source, dtypes, self.scans, read_csv_kwargs):
+                rows += len(chunk)
+                chunk, _ = self._apply(chunk, stats, state, removed=removed, filled=filled)
+                writer.write(chunk)
+                rows_out += len(chunk)
+            writer.close()
+            os.replace(tmp_path, target)
+        except BaseException:
+            writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        plan_lines = []
+        for key, step in self._steps.items():
+            if step['kind'] == 'mask':
+                self.plans[key[0]].removed[step['name']] = removed[key]
+            if step['op'] == 'impute' and filled.get(key):
+                specs = self._specs[key]
+                step['name'] = f"缺失值填充: {describe_strategies({c: specs[c] for c in filled[key]})}"
+        for plan in self.plans:
+            plan_lines.extend(plan.explain()[:-1])
+        return {'rows': rows, 'rows_out': rows_out, 'scans': self.scans,
+                'seconds': time.perf_counter() - start, 'plan': plan_lines}
+
+    def infer_dtypes(self, source, **read_csv_kwargs):
+        """
+        扫描整个文件，返回各列一致的类型：整数和浮点混合时为浮点，含文本时为 object，
+        某块中全为空的列不参与推断。浮点列和不含缺失值的整数、布尔列使用 numpy 类型
+        (可空类型的解析和写出慢数倍)，含缺失值的整数、布尔列使用可空的 Int64、boolean
+        """
+        seen = {}
+        has_na = set()
+        for chunk in self._chunks(source, None, 1, read_csv_kwargs, dtype_backend='numpy_nullable'):
+            for column in chunk.columns:
+                kinds = seen.setdefault(column, set())
+                missing = chunk[column].isna()
+                if missing.any():
+                    has_na.add(column)
+                if not missing.all():
+                    kinds.add(str(chunk[column].dtype))
+        dtypes = {}
+        for column, kinds in seen.items():
+            if kinds == {'Int64'} or kinds == {'boolean'}:
+                kind = kinds.pop()
+                dtypes[column] = kind if column in has_na else {'Int64': 'int64', 'boolean': 'bool'}[kind]
+            elif kinds and kinds <= {'Int64', 'Float64'}:
+                dtypes[column] = 'float64'
+            else:
+                dtypes[column] = object
+        return dtypes
+
+    def _chunks(self, source, dtypes, scan, read_csv_kwargs, **extra):
+        """逐块读取 source，并按文件位置报告进度"""
+        total = os.path.getsize(source)
+        rows = 0
+        with open(source, 'rb') as f:
+            for chunk in pd.read_csv(f, dtype=dtypes, chunksize=self.chunk_rows, **extra, **read_csv_kwargs):
+                rows += len(chunk)
+                if self.progress is not None:
+                    # 文件位置包含解析器的预读缓冲，只作为进度的近似值
+                    self.progress(scan=scan, scans=self.scans, bytes_parsed=min(f.tell(), total),
+                                  bytes_total=total, rows=rows)
+                yield chunk
+
+    def _collect(self, key, source, dtypes, stats, scan, read_csv_kwargs):
+        """扫描一遍文件，执行 key 之前的步骤，累计 key 步骤需要的统计量"""
+        step = self._steps[key]
+        state = {}
+        moments = counts = None
+        for chunk in self._chunks(source, dtypes, scan, read_csv_kwargs):
+            chunk, keep = self._apply(chunk, stats, state, stop=key)
+            positions = np.flatnonzero(keep)
+            if step['op'] == 'impute':
+                specs = self._resolve(key, chunk)
+                if moments is None:
+                    means = [column for column, spec in specs.items() if spec['strategy'] == 'mean']
+                    moments = RunningMoments(len(means))
+                    counts = {column: None for column, spec in specs.items() if spec['strategy'] == 'mode'}
+                moments.update(float_matrix(chunk, means))
+                for column in counts:
+                    values = chunk[column].value_counts(dropna=True)
+                    values = values[values > 0]
+                    counts[column] = values if counts[column] is None else counts[column].add(values, fill_value=0)
+            else:
+                columns = step.get('columns') or [step['column']]
+                if moments is None:
+                    moments = RunningMoments(len(columns))
+                moments.update(float_matrix(chunk, columns, positions))
+
+        if moments is None:
+            return {}
+        if step['op'] != 'impute':
+            return {'center': moments.means, 'scale': moments.std}
+        values = dict(zip(means, moments.means))
+        for column, column_counts in counts.items():
+            if column_counts is None or column_counts.empty:
+                values[column] = None
+            else:
+                # 与 Series.mode 一致：出现次数相同时取最小的值
+                top = column_counts[column_counts == column_counts.max()].index
+                values[column] = sorted(top)[0]
+        return values
+
+    def _resolve(self, key, chunk):
+        """按列类型确定填充步骤中各列的策略；各块类型一致，只需确定一次"""
+        if key not in self._specs:
+            step = self._steps[key]
+            # 构造各列都缺失的一行，使 resolve_strategies 为每一列都给出策略
+            probe = chunk.iloc[:0].reindex([0])
+            self._specs[key] = resolve_strategies(probe, step['strategy'], step['value'], step['group_by'],
+                                                  step['columns'])
+        return self._specs[key]
+
+    def _apply(self, chunk, stats, state, stop=None, removed=None, filled=None):
+        """
+        对一个分块依次执行各计划的步骤；stop 为 (计划序号, 步骤序号) 时在该步骤之前停止，
+        返回 (分块, 该计划当前的行掩码)，否则返回 (清洗后的分块, None)
+        """
+        chunk = self._compact(chunk.reset_index(drop=True))
+        for p, plan in enumerate(self.plans):
+            keep = np.ones(len(chunk), dtype=bool)
+            marks = None
+            for i, step in enumerate(plan.steps):
+                key = (p, i)
+                if key == stop:
+                    return chunk, keep
+                before = int(keep.sum())
+                chunk, marks = self._step(key, step, chunk, keep, marks, stats, state, filled)
+                if removed is not None and step['kind'] == 'mask':
+                    removed[key] += before - int(keep.sum())
+            if not keep.all():
+                chunk = chunk[keep].reset_index(drop=True)
+            if marks is not None:
+                chunk['is_duplicate'] = marks
+        return chunk, None
+
+    def _compact(self, chunk):
+        """按上传时压缩后的类型转换分块的各列"""
+        for column, dtype in self.column_dtypes.items():
+            if column not in chunk.columns or str(chunk[column].dtype) == dtype:
+                continue
+            series = chunk[column]
+            if pd.api.types.is_object_dtype(series.dtype):
+                # 上传时整列的非空值都能解析为数值，compact_dtypes 才会转换
+                series = pd.to_numeric(series, errors='coerce')
+            chunk[column] = series.astype(dtype)
+        return chunk
+
+    def _step(self, key, step, chunk, keep, marks, stats, state, filled):
+        """执行单个步骤，原地更新 keep，返回 (分块, 重复行标记)"""
+        op = step['op']
+        if op == 'impute':
+            specs = self._resolve(key, chunk)
+            strategies = {}
+            for column, spec in specs.items():
+                if spec['strategy'] in STAT_STRATEGIES:
+                    spec = dict(spec, value=stats[key].get(column))
+                strategies[column] = spec
+            chunk, counts = impute(chunk, strategies)
+            # 前一个值填充：分块开头的缺失值用上一块最后一个非空值填充
+            carry = state.setdefault(key, {})
+            leading = {column: {'strategy': 'constant', 'fill_value': carry[column], 'group_by': None}
+                       for column, spec in specs.items() if spec['strategy'] == 'ffill' and column in carry}
+            chunk, leading_counts = impute(chunk, leading)
+            for column, spec in specs.items():
+                if spec['strategy'] == 'ffill' and len(chunk) and pd.notna(chunk[column].iloc[-1]):
+                    carry[column] = chunk[column].iloc[-1]
+            if filled is not None:
+                filled.setdefault(key, set()).update(
+                    column for column, count in {**counts, **leading_counts}.items() if count)
+        elif op == 'dropna':
+            keep &= chunk.notna().all(axis=1).to_numpy()
+        elif op == 'notna':
+            column = step['column']
+            if column not in chunk.columns:
+                raise ValueError(f"列 '{column}' 不存在。")
+            if not pd.api.types.is_numeric_dtype(chunk[column]):
+                # 各块转换后的类型保持一致
+                chunk[column] = pd.to_numeric(chunk[column], errors='coerce').astype('float64')
+            keep &= chunk[column].notna().to_numpy()
+        elif op in ('zscore', 'zscore_replace'):
+            column = step['column']
+            positions = np.flatnonzero(keep)
+            values = float_matrix(chunk, [column], positions)[:, 0]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                z = np.abs(values - stats[key]['center'][0]) / stats[key]['scale'][0]
+            if op == 'zscore':
+                # 与 scipy.stats.zscore 一致：标准差为 0 时 Z 分数为 NaN，这些行也被删除
+                keep[positions[~(z <= step['threshold'])]] = False
+            else:
+                outliers = positions[z > step['threshold']]
+                if len(outliers):
+                    series = chunk[column].copy()
+                    series.iloc[outliers] = step['value']
+                    chunk[column] = series
+        elif op in ('outliers', 'outliers_replace'):
+            positions = np.flatnonzero(keep)
+            matrix = float_matrix(chunk, step['columns'], positions)
+            threshold = step['threshold'] if step['threshold'] is not None else DEFAULT_THRESHOLDS['zscore']
+            cells = zscore_cells(matrix, stats[key]['center'], stats[key]['scale'], threshold)
+            rows = cells.any(axis=1) if step['combine'] == 'any' else cells.all(axis=1)
+            if op == 'outliers':
+                keep[positions[rows]] = False
+            else:
+                for i, column in enumerate(step['columns']):
+                    hits = positions[cells[:, i] & rows]
+                    if len(hits):
+                        series = chunk[column].copy()
+                        series.iloc[hits] = step['value']
+                        chunk[column] = series
+        elif op == 'duplicated':
+            fingerprints = state.setdefault(key, FingerprintSet())
+            positions = np.flatnonzero(keep)
+            duplicated = fingerprints.add(row_fingerprints(chunk, step['subset'], positions))
+            if step['kind'] == 'mask':
+                keep[positions[duplicated]] = False
+            else:
+                marks = duplicated
+        return chunk, marks
+
+
+def score_file(entry, source, target, chunk_rows=STREAM_CHUNK_ROWS, column='prediction', progress=None):
+    """
+    用 ModelRegistry.load 返回的模型分块为 source 打分，把原有的列和预测值列 column 写入 target；
+    source 和 target 都可以是 CSV 或 Parquet 文件，按扩展名区分，内存占用只与块大小有关
+
+    参数:
+        progress: 可选的回调，每块之后调用 progress(rows=已处理行数, fraction=已读取的比例)
+
+    返回:
+        {'rows': 行数, 'scored': 有预测值的行数, 'seconds': 耗时}
+    """
+    source_format = EXPORT_FORMATS.get(os.path.splitext(source)[1].lower())
+    target_format = EXPORT_FORMATS.get(os.path.splitext(target)[1].lower())
+    if source_format is None or target_format is None:
+        raise ValueError("打分只支持 CSV 和 Parquet 文件")
+    if 'parquet' in (source_format, target_format) and pa is None:
+        raise ValueError("读写 Parquet 文件需要安装 pyarrow")
+
+    start = time.perf_counter()
+    dtype = _prediction_dtype(entry['model'])
+    dtypes = None
+    if source_format == 'csv' and target_format == 'parquet':
+        # Parquet 文件的列类型以第一块为准，先扫描一遍 CSV 得到各块一致的类型
+        dtypes = StreamingCleaner([], chunk_rows).infer_dtypes(source)
+    rows = scored = 0
+    tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+    writer = _ParquetWriter(tmp_path) if target_format == 'parquet' else _CsvWriter(tmp_path)
+    try:
+        for chunk, fraction in _read_chunks(source, source_format, chunk_rows, dtypes):
+            predictions = predict_chunk(entry, chunk, dtype)
+            chunk[column] = predictions
+            writer.write(chunk)
+            rows += len(chunk)
+            scored += int(predictions.notna().sum())
+            if progress is not None:
+                progress(rows=rows, fraction=fraction)
+        writer.close()
+        os.replace(tmp_path, target)
+    except BaseException:
+        writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {'rows': rows, 'scored': scored, 'seconds': time.perf_counter() - start}
+
+
+def predict_chunk(entry, chunk, dtype=None):
+    """
+    一个分块的预测值，索引与 chunk 相同；特征列按训练时的方式转换为数值后标准化，
+    含缺失值或无法转换为数值的行预测值为空
+    """
+    features = entry['features']
+    missing = [feature for feature in features if feature not in chunk.columns]
+    if missing:
+        raise ValueError(f"文件缺少模型的特征列: {', '.join(missing)}")
+    X = chunk[features].apply(pd.to_numeric, errors='coerce')
+    valid = X.notna().all(axis=1).to_numpy()
+    predictions = pd.Series(dtype=object)
+    if valid.any():
+        values = entry['model'].predict(entry['scaler'].transform(X[valid]))
+        predictions = pd.Series(values, index=chunk.index[valid])
+    predictions = predictions.reindex(chunk.index)
+    return predictions.astype(dtype or _prediction_dtype(entry['model']))
+
+
+def _prediction_dtype(model):
+    """预测值列的类型，各块保持一致：分类为类别标签的可空类型，聚类为可空整数，回归为浮点"""
+    classes = getattr(model, 'classes_', None)
+    if classes is not None:
+        return pd.Series(classes).convert_dtypes().dtype
+    if hasattr(model, 'cluster_centers_'):
+        return 'Int64'
+    return 'float64'
+
+
+def _read_chunks(source, source_format, chunk_rows, dtypes=None):
+    """逐块读取 CSV 或 Parquet 文件，返回 (分块, 已读取的比例)"""
+    if source_format == 'parquet':
+        parquet = pq.ParquetFile(source)
+        total = parquet.metadata.num_rows
+        rows = 0
+        for batch in parquet.iter_batches(batch_size=chunk_rows):
+            rows += batch.num_rows
+            yield batch.to_pandas(), rows / total if total else 1.0
+        return
+    total = os.path.getsize(source)
+    with open(source, 'rb') as f:
+        for chunk in pd.read_csv(f, dtype=dtypes, chunksize=chunk_rows):
+            # 文件位置包含解析器的预读缓冲，只作为进度的近似值
+            yield chunk, min(f.tell(), total) / total if total else 1.0
+
+
+def _check_streamable(step):
+    if step['op'] == 'impute':
+        unsupported = sorted(_fill_strategies(step) & UNSUPPORTED_STRATEGIES)
+        if unsupported:
+            raise ValueError(f"流式清洗不支持{STRATEGY_NAMES[unsupported[0]]}填充")
+    elif step['op'] in ('outliers', 'outliers_replace') and step['method'] != 'zscore':
+        raise ValueError("流式清洗的异常值检测只支持 Z 分数方法")
+
+
+def _needs_stats(step):
+    if step['op'] == 'impute':
+        return bool(_fill_strategies(step) & STAT_STRATEGIES)
+    return step['op'] in ('zscore', 'zscore_replace', 'outliers', 'outliers_replace')
+
+
+def _fill_strategies(step):
+    """填充步骤用到的全部策略(默认策略和各列覆盖的策略)"""
+    overrides = step['columns'] or {}
+    return {step['strategy']} | {spec if isinstance(spec, str) else spec.get('strategy', step['strategy'])
+                                 for spec in overrides.values()}
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._header = True
+
+    def write(self, chunk):
+        chunk.to_csv(self._file, header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    """逐块写入同一个 Parquet 文件，列类型以第一块为准"""
+
+    def __init__(self, path):
+        self._path = path
+        self._writer = None
+
+    def write(self, chunk):
+        if self._writer is None:
+            schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+            # 第一块中全为空的文本列推断为 null 类型，改为字符串
+            for i, field in enumerate(schema):
+                if pa.types.is_null(field.type):
+                    schema = schema.set(i, field.with_type(pa.string()))
+            self._writer = pq.ParquetWriter(self._path, schema)
+        self._writer.write_table(pa.Table.from_pandas(chunk, schema=self._writer.schema, preserve_index=False))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
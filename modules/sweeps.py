@@ -0,0 +1,141 @@
+# 超参数搜索与交叉验证
+# modules/sweeps.py
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, StratifiedKFold, cross_val_score
+from threadpoolctl import threadpool_limits
+
+from modules.jobs import init_job_worker
+from modules.scalable import fit_kmeans
+from modules.silhouette import silhouette
+
+# 交叉验证支持的监督学习模型
+CV_METHODS = ('linear_regression', 'random_forest_regression', 'random_forest_classification')
+# 工作进程共享的特征矩阵和目标列，由进程池的 initializer 在每个工作进程中设置一次
+_shared = {}
+
+
+def run_sweep(task, grid, X, y=None, workers=None):
+    """
+    对 grid 中的每组参数执行 task(X, y, **params)，返回与 grid 顺序一致的结果列表；
+    y 为目标列，或任务需要共享的其他数据(如 DBSCAN 的近邻图)
+
+    多个工作进程并行执行：X、y 通过进程池的 initializer 传给每个工作进程一次
+    (支持 fork 的平台上直接继承，不需要序列化)，各组参数只传参数本身。
+    每个工作进程内 BLAS/OpenMP 限制为单线程，避免多个进程争抢 CPU。
+    只有一个工作进程或当前进程是守护进程(不能创建子进程)时在当前进程中依次执行。
+
+    每个结果为 dict(params, **task 返回的指标, seconds=耗时)
+    """
+    workers = min(workers or os.cpu_count() or 1, len(grid))
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        return [_timed(task, X, y, params) for params in grid]
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(X, y)) as pool:
+        return list(pool.map(_run_shared, [task] * len(grid), grid))
+
+
+def _init_worker(X, y):
+    init_job_worker()
+    _shared['X'] = X
+    _shared['y'] = y
+    threadpool_limits(limits=1)
+
+
+def _run_shared(task, params):
+    return _timed(task, _shared['X'], _shared['y'], params)
+
+
+def _timed(task, X, y, params):
+    start = time.perf_counter()
+    metrics = task(X, y, **params)
+    return dict(params, **metrics, seconds=time.perf_counter() - start)
+
+
+def kmeans_task(X, y, n_clusters, random_state=42, method='auto'):
+    """K 均值聚类的惯性(簇内平方和，用于肘部法)和轮廓系数(大数据集上为抽样估计，silhouette_margin 为置信区间半宽)"""
+    model, labels, _ = fit_kmeans(X, n_clusters, method, random_state)
+    return dict({'inertia': float(model.inertia_)}, **_silhouette_metrics(X, labels))
+
+
+def dbscan_task(X, graph, eps, min_samples=5):
+    """
+    DBSCAN 的簇数、噪声点比例，以及去掉噪声点后的轮廓系数(不足两个簇时为 None)；
+    graph 为半径不小于 eps 的近邻图(modules.neighbors.radius_graph)，为 None 时直接在 X 上搜索近邻
+    """
+    if graph is None:
+        labels = DBSCAN(eps=eps, min_samples=min_samples).fit_predict(X)
+    else:
+        labels = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit_predict(graph)
+    clustered = labels != -1
+    n_clusters = len(set(labels[clustered]))
+    scores = {'silhouette_score': None, 'silhouette_margin': None}
+    if 1 < n_clusters < clustered.sum():
+        scores = _silhouette_metrics(X[clustered], labels[clustered])
+    return dict({'n_clusters': n_clusters, 'noise_ratio': float(1 - clustered.mean())}, **scores)
+
+
+def _silhouette_metrics(X, labels):
+    info = silhouette(X, labels)
+    return {'silhouette_score': info['score'], 'silhouette_margin': (info['ci_high'] - info['ci_low']) / 2}
+
+
+def forest_task(X, y, task, max_depth=None, n_estimators=100, cv=3, random_state=42):
+    """随机森林的 k 折交叉验证得分：分类为准确率，回归为 R2"""
+    if task == 'classification':
+        model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=random_state)
+    else:
+        model = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=random_state)
+    scores = cross_val_score(model, X, y, cv=cv)
+    return {'score_mean': float(np.mean(scores)), 'score_std': float(np.std(scores))}
+
+
+def supervised_model(method, random_state=42):
+    """CV_METHODS 中的模型，参数与 DataAnalyzer.predict / classify 一致"""
+    if method == 'linear_regression':
+        return LinearRegression()
+    if method == 'random_forest_regression':
+        return RandomForestRegressor(random_state=random_state)
+    if method == 'random_forest_classification':
+        return RandomForestClassifier(random_state=random_state)
+    raise ValueError(f"不支持交叉验证的模型: {method}")
+
+
+def fold_task(X, y, method, fold, n_splits=5, random_state=42):
+    """
+    k 折交叉验证的第 fold 折：用其余各折训练 method 模型，在该折上评估，分类为准确率，回归为 MSE 和 R2；
+    划分只由 n_splits 和 random_state 确定，每个工作进程各自计算出相同的划分，不需要传递行号。
+    分类按类别分层划分，各折的类别比例与整体一致
+    """
+    if method == 'random_forest_classification':
+        splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    else:
+        splitter = KFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    train, test = next(itertools.islice(splitter.split(X, y), fold, None))
+    model = supervised_model(method, random_state)
+    start = time.perf_counter()
+    model.fit(X[train], y[train])
+    fit_seconds = time.perf_counter() - start
+    y_pred = model.predict(X[test])
+    if method == 'random_forest_classification':
+        metrics = {'accuracy': float(accuracy_score(y[test], y_pred))}
+    else:
+        metrics = {'mse': float(mean_squared_error(y[test], y_pred)), 'r2': float(r2_score(y[test], y_pred))}
+    return dict(metrics, train_rows=len(train), test_rows=len(test), fit_seconds=fit_seconds)
+
+
+def best_result(results, metric):
+    """选出 metric 最大的一组参数，忽略指标为 None 的结果；都为 None 时返回 None"""
+    scored = [result for result in results if result.get(metric) is not None]
+    return max(scored, key=lambda result: result[metric]) if scored else None
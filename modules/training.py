@@ -0,0 +1,355 @@
+# 模型训练与结果图表
+# modules/training.py
+import base64
+import io
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from modules.analyzer import DataAnalyzer
+from modules.store import read_snapshot
+
+# 各算法使用的超参数及默认值
+ALGORITHM_PARAMS = {
+    # cv_folds: 不小于 2 时另外做 k 折交叉验证，报告各折指标的均值和标准差；0 表示只用一次训练/测试划分
+    'linear_regression': {'test_size': 0.2, 'cv_folds': 0},
+    'random_forest_regression': {'test_size': 0.2, 'cv_folds': 0},
+    'random_forest_classification': {'test_size': 0.2, 'cv_folds': 0},
+    # *_method: 'auto' 按行数选择全量或小批量训练，'full' 全量，'minibatch' 小批量
+    'kmeans': {'n_clusters': 3, 'kmeans_method': 'auto'},
+    'dbscan': {'eps': 0.5, 'min_samples': 5},
+    'pca': {'n_components': 2, 'pca_method': 'auto'},
+    # 参数搜索：在多个进程中并行尝试一组参数，返回得分曲线
+    'kmeans_sweep': {'k_min': 2, 'k_max': 10, 'kmeans_method': 'auto'},
+    'dbscan_sweep': {'eps_min': 0.1, 'eps_max': 1.0, 'eps_steps': 10, 'min_samples': 5},
+    'random_forest_regression_sweep': {'max_depths': '4,8,16', 'n_estimators_grid': '50,100,200', 'cv': 3},
+    'random_forest_classification_sweep': {'max_depths': '4,8,16', 'n_estimators_grid': '50,100,200', 'cv': 3},
+}
+SUPERVISED = {'linear_regression', 'random_forest_regression', 'random_forest_classification',
+              'random_forest_regression_sweep', 'random_forest_classification_sweep'}
+# 可以保存到模型注册表、对新数据打分的算法(模型有 predict 方法)
+SCORABLE = {'linear_regression', 'random_forest_regression', 'random_forest_classification', 'kmeans'}
+# 图表标题中训练方式的名称
+METHOD_NAMES = {'full': "全量训练", 'minibatch': "小批量训练"}
+# 交叉验证指标的显示名称
+CV_METRIC_NAMES = {'accuracy': '准确率', 'mse': 'MSE', 'r2': 'R2'}
+# 一次参数搜索最多尝试的参数组数
+MAX_SWEEP_SIZE = 50
+
+
+def algorithm_params(algorithm, values):
+    """从表单等来源取出 algorithm 用到的超参数，缺少时使用默认值；不支持的算法或无效的交叉验证折数抛出 ValueError"""
+    if algorithm not in ALGORITHM_PARAMS:
+        raise ValueError("请选择有效的算法")
+    params = {}
+    for name, default in ALGORITHM_PARAMS[algorithm].items():
+        value = values.get(name)
+        params[name] = type(default)(value) if value not in (None, '') else default
+    if params.get('cv_folds', 0) != 0 and params['cv_folds'] < 2:
+        raise ValueError("交叉验证折数应为 0(不做交叉验证)或不小于 2")
+    return params
+
+
+def to_numeric_filled(series):
+    """把列转换为数值，无法转换的值和缺失值用均值填充(分析页面选中的非数值特征和目标列)"""
+    series = pd.to_numeric(series, errors='coerce')
+    return series.fillna(series.mean())
+
+
+def train_and_render(data, algorithm, features, target=None, params=None, progress=None, workers=None,
+                     neighbor_graphs=None, preprocessed=None):
+    """
+    训练模型并生成评估指标和结果图表
+
+    参数:
+        data: 特征已转换为数值的 DataFrame
+        algorithm: ALGORITHM_PARAMS 中的算法名
+        features: 特征列名列表
+        target: 目标列名(监督学习算法需要)
+        params: algorithm_params 返回的超参数
+        progress: 可选的回调，以关键字参数报告当前阶段，如 progress(stage='训练模型')
+        workers: 参数搜索的并行进程数，默认为 CPU 核数
+        neighbor_graphs: DBSCAN 复用的近邻图字典，见 DataAnalyzer
+        preprocessed: 复用的标准化特征矩阵和训练集/测试集划分字典，见 DataAnalyzer
+
+    返回:
+        {
+            'model': 训练好的模型,
+            'scaler': 训练时对特征使用的标准化器,
+            'metrics': {指标名: 数值},
+            'charts': {'feature_importance_chart': ..., 'predictions_chart': ..., 'cluster_chart': ...,
+                       'sweep_chart': ...} 图表为 PNG 的 data URI，没有的图表为 None,
+            'sweep': 参数搜索时各组参数的结果列表，交叉验证时各折的结果列表，否则为 None,
+        }
+    """
+    params = params or algorithm_params(algorithm, {})
+    progress = progress or (lambda **kwargs: None)
+    progress(stage="训练模型")
+    analyzer = DataAnalyzer(data, neighbor_graphs, preprocessed)
+    charts = {'feature_importance_chart': None, 'predictions_chart': None, 'cluster_chart': None, 'sweep_chart': None}
+    sweep = None
+
+    if algorithm == 'linear_regression':
+        result = analyzer.predict(features, target, test_size=params['test_size'], method='linear')
+        progress(stage="生成图表")
+        metrics = {'MSE': result['mse'], 'R2': result['r2']}
+        charts['predictions_chart'] = _predictions_chart(result, '线性回归: 预测值 vs 实际值')
+
+    elif algorithm == 'random_forest_regression':
+        result = analyzer.predict(features, target, test_size=params['test_size'], method='random_forest')
+        progress(stage="生成图表")
+        metrics = {'MSE': result['mse'], 'R2': result['r2']}
+        if result['feature_importance']:
+            charts['feature_importance_chart'] = _importance_chart(result, '随机森林回归: 特征重要性')
+        charts['predictions_chart'] = _predictions_chart(result, '随机森林回归: 预测值 vs 实际值')
+
+    elif algorithm == 'random_forest_classification':
+        result = analyzer.classify(features, target, test_size=params['test_size'])
+        progress(stage="生成图表")
+        metrics = {'准确率': result['accuracy']}
+        if result['feature_importance']:
+            charts['feature_importance_chart'] = _importance_chart(result, '随机森林分类: 特征重要性')
+
+    elif algorithm == 'kmeans':
+        n_clusters = params['n_clusters']
+        result = analyzer.cluster_kmeans(features, n_clusters=n_clusters, method=params['kmeans_method'])
+        progress(stage="生成图表")
+        metrics = _silhouette_metrics(result['silhouette'])
+
+        # 若特征数大于2，则使用前两个特征进行可视化
+        if len(features) >= 2:
+            plt.figure(figsize=(10, 6))
+            scatter = plt.scatter(data[features[0]], data[features[1]], c=result['data']['cluster'],
+                                  cmap='viridis', alpha=0.6)
+            plt.scatter(result['cluster_centers'][:, 0], result['cluster_centers'][:, 1],
+                        c='red', marker='x', s=100)
+            plt.xlabel(features[0])
+            plt.ylabel(features[1])
+            plt.title(f"K均值聚类结果 (k={n_clusters}, {METHOD_NAMES[result['method']]})")
+            plt.colorbar(scatter, label='聚类')
+            charts['cluster_chart'] = _figure_uri()
+
+    elif algorithm == 'dbscan':
+        eps, min_samples = params['eps'], params['min_samples']
+        result = analyzer.cluster_dbscan(features, eps=eps, min_samples=min_samples)
+        progress(stage="生成图表")
+        metrics = _silhouette_metrics(result['silhouette'])
+
+        if len(features) >= 2:
+            plt.figure(figsize=(10, 6))
+            scatter = plt.scatter(data[features[0]], data[features[1]], c=result['data']['cluster'],
+                                  cmap='viridis', alpha=0.6)
+            plt.xlabel(features[0])
+            plt.ylabel(features[1])
+            plt.title(f'DBSCAN聚类结果 (eps={eps}, min_samples={min_samples})')
+            plt.colorbar(scatter, label='聚类 (-1表示噪声点)')
+            charts['cluster_chart'] = _figure_uri()
+
+    elif algorithm == 'pca':
+        n_components = params['n_components']
+        result = analyzer.dimensionality_reduction(features, n_components=n_components, method=params['pca_method'])
+        progress(stage="生成图表")
+        variance = result['explained_variance']
+        metrics = {'累计方差解释率': variance['cumulative_variance_ratio'][-1]}
+
+        if n_components >= 2:
+            # PCA结果散点图
+            plt.figure(figsize=(12, 10))
+            plt.subplot(2, 1, 1)
+            plt.scatter(result['reduced_data']['PC1'], result['reduced_data']['PC2'], alpha=0.7)
+            plt.xlabel('主成分1')
+            plt.ylabel('主成分2')
+            plt.title(f"PCA降维结果散点图 ({METHOD_NAMES[result['method']]})")
+
+            # 解释方差比例条形图
+            plt.subplot(2, 1, 2)
+            plt.bar(range(len(variance['explained_variance_ratio'])), variance['explained_variance_ratio'])
+            plt.plot(range(len(variance['cumulative_variance_ratio'])), variance['cumulative_variance_ratio'],
+                     'r-o')
+            plt.xlabel('主成分')
+            plt.ylabel('解释方差比例')
+            plt.title('PCA解释方差比例')
+            plt.xticks(range(len(variance['components'])), variance['components'])
+            plt.tight_layout()
+            charts['cluster_chart'] = _figure_uri()
+
+    elif algorithm == 'kmeans_sweep':
+        k_values = range(params['k_min'], params['k_max'] + 1)
+        if params['k_min'] < 2 or not 0 < len(k_values) <= MAX_SWEEP_SIZE:
+            raise ValueError(f"聚类数量范围无效：需要 2 <= 最小值 <= 最大值，且最多 {MAX_SWEEP_SIZE} 个")
+        result = analyzer.sweep_kmeans(features, k_values, workers=workers, method=params['kmeans_method'])
+        progress(stage="生成图表")
+        sweep = result['results']
+        metrics = {'最佳聚类数': result['best']['n_clusters'], '最佳轮廓系数': result['best']['silhouette_score']}
+        charts['sweep_chart'] = _sweep_chart(sweep, 'n_clusters', '聚类数量 k', [('inertia', '惯性(簇内平方和)'),
+                                                                             ('silhouette_score', '轮廓系数')],
+                                             'K均值聚类: 肘部法与轮廓系数')
+        result['model'] = None
+
+    elif algorithm == 'dbscan_sweep':
+        steps = params['eps_steps']
+        if not 0 < params['eps_min'] <= params['eps_max'] or not 0 < steps <= MAX_SWEEP_SIZE:
+            raise ValueError(f"eps 范围无效：需要 0 < 最小值 <= 最大值，且步数在 1 到 {MAX_SWEEP_SIZE} 之间")
+        eps_values = np.unique(np.round(np.linspace(params['eps_min'], params['eps_max'], steps), 6))
+        result = analyzer.sweep_dbscan(features, eps_values, min_samples=params['min_samples'], workers=workers)
+        progress(stage="生成图表")
+        sweep = result['results']
+        best = result['best']
+        metrics = {'最佳 eps': best['eps'] if best else 0, '最佳轮廓系数': best['silhouette_score'] if best else 0}
+        charts['sweep_chart'] = _sweep_chart(sweep, 'eps', 'eps', [('n_clusters', '聚类数量'),
+                                                                   ('silhouette_score', '轮廓系数(不含噪声点)')],
+                                             f"DBSCAN: eps 搜索 (min_samples={params['min_samples']})")
+        result['model'] = None
+
+    elif algorithm in ('random_forest_regression_sweep', 'random_forest_classification_sweep'):
+        task = 'regression' if algorithm == 'random_forest_regression_sweep' else 'classification'
+        max_depths = _parse_grid(params['max_depths'], '最大深度', allow_none=True)
+        n_estimators = _parse_grid(params['n_estimators_grid'], '树的数量')
+        if len(max_depths) * len(n_estimators) > MAX_SWEEP_SIZE:
+            raise ValueError(f"参数组合过多，最多 {MAX_SWEEP_SIZE} 组")
+        if params['cv'] < 2:
+            raise ValueError("交叉验证折数至少为 2")
+        result = analyzer.sweep_forest(features, target, max_depths, n_estimators, task=task, cv=params['cv'],
+                                       workers=workers)
+        progress(stage="生成图表")
+        sweep = result['results']
+        best = result['best']
+        score = 'R2' if task == 'regression' else '准确率'
+        metrics = {'最大深度': best['max_depth'] or 0, '树的数量': best['n_estimators'],
+                   f'交叉验证{score}': best['score_mean'], f'{score}标准差': best['score_std']}
+        charts['sweep_chart'] = _forest_sweep_chart(sweep, f"随机森林参数搜索: {params['cv']} 折交叉验证{score}")
+        result['model'] = None
+
+    else:
+        raise ValueError("请选择有效的算法")
+
+    if params.get('cv_folds'):
+        progress(stage="交叉验证")
+        cv = analyzer.cross_validate(features, target, algorithm, params['cv_folds'], workers=workers)
+        sweep = cv['folds']
+        for name, summary in cv['metrics'].items():
+            metrics[f'交叉验证{CV_METRIC_NAMES[name]}'] = summary['mean']
+            metrics[f'{CV_METRIC_NAMES[name]}标准差'] = summary['std']
+
+    progress(stage="完成")
+    return {'model': result['model'], 'scaler': analyzer.scaler, 'metrics': metrics, 'charts': charts,
+            'sweep': sweep}
+
+
+def train_job(job, data, algorithm, features, target=None, params=None, workers=None, neighbor_graphs=None,
+              preprocessed=None, convert=()):
+    """
+    作为后台任务执行 train_and_render，通过 job.update() 报告阶段
+
+    任务在子进程中执行：data 为 DatasetStore.snapshot 返回的磁盘副本，子进程只读取用到的列；
+    无法写入磁盘的数据集直接传 DataFrame。convert 中的列先用 to_numeric_filled 转换为数值。
+    neighbor_graphs 和 preprocessed 为 ArrayCache.view 返回的磁盘缓存，子进程直接读写，
+    结果只包含模型、指标和图表，近邻图和特征矩阵不经过结果管道传回
+    """
+    columns = list(dict.fromkeys(list(features) + ([target] if target else [])))
+    if isinstance(data, dict):
+        data = read_snapshot(data, columns)
+        if data is None:
+            raise ValueError("数据集的磁盘副本已被删除，请重新提交分析")
+    else:
+        data = data[columns]
+    for column in convert:
+        data[column] = to_numeric_filled(data[column])
+    return train_and_render(data, algorithm, features, target, params, progress=job.update, workers=workers,
+                            neighbor_graphs=neighbor_graphs, preprocessed=preprocessed)
+
+
+def _silhouette_metrics(info):
+    """轮廓系数指标；抽样估计时附带置信区间和样本数，无法计算(如 DBSCAN 有噪声点)时为 0"""
+    if info is None:
+        return {'轮廓系数': 0}
+    metrics = {'轮廓系数': info['score']}
+    if info['mode'] == 'sampled':
+        level = f"{info['confidence']:.0%}"
+        metrics[f'{level} 置信下限'] = info['ci_low']
+        metrics[f'{level} 置信上限'] = info['ci_high']
+        metrics['抽样点数'] = info['sample_size']
+    return metrics
+
+
+def _parse_grid(text, label, allow_none=False):
+    """解析逗号分隔的正整数列表，allow_none 时 'none' 表示不限制"""
+    values = []
+    for item in str(text).split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if allow_none and item == 'none':
+            values.append(None)
+            continue
+        if not item.isdigit() or int(item) < 1:
+            raise ValueError(f"{label}应为逗号分隔的正整数: {text}")
+        values.append(int(item))
+    if not values:
+        raise ValueError(f"请填写{label}")
+    return list(dict.fromkeys(values))
+
+
+def _sweep_chart(results, param, xlabel, series, title):
+    """参数搜索曲线：两个指标分别画在左右两个纵轴上，指标为 None 的点不画"""
+    x = [result[param] for result in results]
+    fig, left = plt.subplots(figsize=(10, 6))
+    axes = [left, left.twinx()]
+    for ax, color, (metric, label) in zip(axes, ['tab:blue', 'tab:orange'], series):
+        y = [np.nan if result[metric] is None else result[metric] for result in results]
+        ax.plot(x, y, '-o', color=color)
+        ax.set_ylabel(label, color=color)
+    left.set_xlabel(xlabel)
+    plt.title(title)
+    fig.tight_layout()
+    return _figure_uri()
+
+
+def _forest_sweep_chart(results, title):
+    """随机森林网格搜索：每个最大深度一条 得分-树的数量 曲线，阴影为一个标准差"""
+    plt.figure(figsize=(10, 6))
+    for depth in dict.fromkeys(result['max_depth'] for result in results):
+        rows = [result for result in results if result['max_depth'] == depth]
+        x = [result['n_estimators'] for result in rows]
+        mean = np.array([result['score_mean'] for result in rows])
+        std = np.array([result['score_std'] for result in rows])
+        plt.plot(x, mean, '-o', label=f"最大深度 {depth if depth is not None else '不限'}")
+        plt.fill_between(x, mean - std, mean + std, alpha=0.2)
+    plt.xlabel('树的数量')
+    plt.ylabel('平均得分')
+    plt.title(title)
+    plt.legend()
+    return _figure_uri()
+
+
+def _predictions_chart(result, title):
+    plt.figure(figsize=(10, 6))
+    plt.scatter(result['y_test'], result['y_pred'], alpha=0.5)
+    plt.plot([min(result['y_test']), max(result['y_test'])],
+             [min(result['y_test']), max(result['y_test'])], 'r--')
+    plt.xlabel('实际值')
+    plt.ylabel('预测值')
+    plt.title(title)
+    return _figure_uri()
+
+
+def _importance_chart(result, title):
+    importance_df = pd.DataFrame({
+        '特征': list(result['feature_importance'].keys()),
+        '重要性': list(result['feature_importance'].values())
+    }).sort_values('重要性', ascending=False)
+    plt.figure(figsize=(10, 6))
+    sns.barplot(x='重要性', y='特征', data=importance_df)
+    plt.title(title)
+    plt.tight_layout()
+    return _figure_uri()
+
+
+def _figure_uri():
+    """把当前图表保存为 PNG 的 data URI 并关闭图表"""
+    img_buf = io.BytesIO()
+    plt.savefig(img_buf, format='png')
+    plt.close()
+    return "data:image/png;base64," + base64.b64encode(img_buf.getvalue()).decode('utf-8')
@@ -1,44 +1,485 @@
 # 上传 & 格式检查
 # modules/uploader.py
 import os
+import sys
+import threading
+import time
+import hashlib
+import uuid
+import numpy as np
+import openpyxl
 import pandas as pd
 from werkzeug.utils import secure_filename
+from modules.cache import remove_file
 from modules.data_management import DataManagement
+from modules.compaction import compact_dtypes, memory_report
+
+try:
+    import resource
+except ImportError:  # Windows 下没有 resource 模块
+    resource = None
+
+try:
+    import python_calamine
+except ImportError:  # 可选的 Excel 快速解析引擎
+    python_calamine = None
+
+# float64 能精确表示的整数的最大绝对值
+FLOAT_EXACT_INT = 2 ** 53
+
+
+def peak_rss_mb():
+    """返回当前进程启动以来的峰值常驻内存(MB)，平台不支持时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def current_rss_mb():
+    """返回当前进程此刻的常驻内存(MB)，没有 /proc/self/statm 的平台返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class RssSampler:
+    """
+    在后台线程中定时采样当前进程的常驻内存，记录 with 代码块执行期间的峰值
+
+    ru_maxrss 是进程整个生命周期的峰值，之前的大文件会掩盖本次加载的内存占用；
+    平台不支持采样时 start 和 peak 为 None
+    """
+    # 采样间隔(秒)
+    INTERVAL = 0.05
+
+    def __init__(self):
+        self.start = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start = self.peak = current_rss_mb()
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._update()
+        return False
+
+    @property
+    def growth(self):
+        """峰值相对开始时增加的内存(MB)"""
+        return None if self.start is None else self.peak - self.start
+
+    def _sample(self):
+        while not self._stop.wait(self.INTERVAL):
+            self._update()
+
+    def _update(self):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak = max(self.peak, rss)
+
 
 class DataUploader(DataManagement):
     """
     数据上传类,DataManagement的子类
     """
-    def __init__(self, data_path=None):
+    # 推断列类型时读取的样本行数
+    SAMPLE_ROWS = 10000
+    # 分块读取时每块的最大行数
+    CHUNK_ROWS = 100000
+    # 保存上传文件时每次读取的字节数
+    BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, data_path=None, memory_limit_mb=2048, chunked_threshold_mb=50, compact=True):
         super().__init__(data_path)
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.chunked_threshold = chunked_threshold_mb * 1024 * 1024
+        # 加载后是否压缩列类型
+        self.compact = compact
+        self.load_stats = None
+        self.memory_report = None
+        self.content_hash = None
+        # 进度回调 progress(bytes_parsed=..., bytes_total=..., rows=...)
+        self.progress = None
+        self._chunk_count = 0
 
     def allowed_file(self, filename):
         """判断文件扩展名是否在允许列表中."""
         return '.' in filename and \
                filename.rsplit('.', 1)[1].lower() in self.ALLOWED_EXTENSIONS
 
-    def save_and_load(self, file_storage, upload_folder):
+    def save_and_load(self, file_storage, upload_folder, chunked=None, cache=None, sheet_name=None):
         """
         保存上传文件并返回 DataFrame。
         file_storage: Flask 中 request.files['datafile']
         upload_folder: app.config['UPLOAD_FOLDER']
+        chunked: 是否分块读取 CSV，None 表示按文件大小自动选择
+        cache: DatasetCache 实例，命中时直接读取列式缓存
+        sheet_name: Excel 工作表名，None 表示第一个工作表
+        """
+        filepath = self.save(file_storage, upload_folder)
+        return self.load(filepath, chunked=chunked, cache=cache, sheet_name=sheet_name)
+
+    def save(self, file_storage, upload_folder):
+        """
+        保存上传文件并计算内容哈希，返回保存路径
+
+        文件以内容哈希命名：不同会话上传的同名文件不会互相覆盖，相同内容只保存一份；
+        原始文件名由调用方作为显示名称保存
         """
         filename = secure_filename(file_storage.filename)
         if not self.allowed_file(filename):
             raise ValueError("支持 CSV、XLS、XLSX 文件")
 
         os.makedirs(upload_folder, exist_ok=True)
-        filepath = os.path.join(upload_folder, filename)
-        file_storage.save(filepath)
+        # 先写入临时文件，算出哈希后再改名
+        tmp_path = os.path.join(upload_folder, f"{uuid.uuid4().hex}.tmp")
+        try:
+            self.content_hash = self._save_with_hash(file_storage, tmp_path)
+        except BaseException:
+            remove_file(tmp_path)
+            raise
+        ext = filename.rsplit('.', 1)[1].lower()
+        filepath = os.path.join(upload_folder, f"{self.content_hash}.{ext}")
+        os.replace(tmp_path, filepath)
 
         # 更新当前实例的数据路径
         self.data_path = filepath
+        return filepath
+
+    def load(self, filepath, chunked=None, cache=None, sheet_name=None):
+        """
+        加载已保存的文件到 DataFrame。
+        Excel 文件只解析 sheet_name 指定的工作表。
+        """
+        with RssSampler() as rss:
+            self._load(filepath, chunked, cache, sheet_name)
+        # 加载期间采样到的内存峰值；不支持采样的平台只能报告进程启动以来的峰值
+        self.load_stats.update(peak_rss_mb=rss.peak, rss_growth_mb=rss.growth,
+                               process_peak_rss_mb=peak_rss_mb())
+        return self.data
+
+    def _load(self, filepath, chunked, cache, sheet_name):
+        if self.content_hash is None or self.data_path != filepath:
+            self.content_hash = self.hash_file(filepath)
+        self.data_path = filepath
+
+        ext = filepath.rsplit('.', 1)[1].lower()
+        if ext != 'csv' and sheet_name is None:
+            sheet_name = self.list_sheets(filepath)[0]
+
+        start = time.perf_counter()
+        cache_key = self.cache_key(sheet_name)
+        if cache is not None:
+            self.data = cache.get(cache_key)
+            if self.data is not None:
+                # 缓存中保存的已是压缩后的类型
+                self.memory_report = memory_report(self.data)
+                self._record_stats(start, 'cache')
+                self._report_progress(os.path.getsize(filepath), len(self.data))
+                return self.data
 
         # 加载数据到DataFrame
-        ext = filename.rsplit('.', 1)[1].lower()
         if ext == 'csv':
-            self.data = pd.read_csv(filepath)
+            if chunked is None:
+                chunked = os.path.getsize(filepath) >= self.chunked_threshold
+            if chunked:
+                self.data = self.read_csv_chunked(filepath)
+            else:
+                self.data = pd.read_csv(filepath)
         else:
-            self.data = pd.read_excel(filepath)
+            chunked = False
+            self.data = self.read_excel(filepath, sheet_name)
+
+        self._record_stats(start, 'chunked' if chunked else 'full')
+        if self.compact:
+            self.data, self.memory_report = compact_dtypes(self.data)
+        else:
+            self.memory_report = memory_report(self.data)
+        self._report_progress(os.path.getsize(filepath), len(self.data))
+        if cache is not None:
+            cache.put(cache_key, self.data)
+        return self.data
+
+    def cache_key(self, sheet_name=None):
+        """缓存键：文件内容哈希，Excel 再附加工作表名的摘要，未压缩类型时附加 raw"""
+        key = self.content_hash
+        if sheet_name is not None:
+            key += '-' + hashlib.sha1(str(sheet_name).encode('utf-8')).hexdigest()[:12]
+        if not self.compact:
+            key += '-raw'
+        return key
+
+    def hash_file(self, filepath):
+        """计算已保存文件内容的 SHA-256"""
+        hasher = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(self.BLOCK_SIZE), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def _save_with_hash(self, file_storage, filepath):
+        """边写入磁盘边计算文件内容的 SHA-256，返回十六进制摘要"""
+        hasher = hashlib.sha256()
+        with open(filepath, 'wb') as out:
+            while True:
+                block = file_storage.stream.read(self.BLOCK_SIZE)
+                if not block:
+                    break
+                hasher.update(block)
+                out.write(block)
+        return hasher.hexdigest()
+
+    def read_csv_chunked(self, filepath):
+        """
+        分块读取 CSV 文件，避免一次性解析整个文件造成的内存峰值。
+
+        先读取前 SAMPLE_ROWS 行推断各列类型，再按内存上限确定每块行数，
+        逐块解析并转换为推断出的类型，最后逐列拼接成完整的 DataFrame。
+        样本之后出现与推断类型不符的值时只放宽该列，文件只读取一遍。
+        """
+        sample = pd.read_csv(filepath, nrows=self.SAMPLE_ROWS)
+        dtypes, int_columns = self._infer_dtypes(sample)
+
+        # 每块占用不超过内存上限的 1/16，且不超过 CHUNK_ROWS 行以便报告进度
+        row_bytes = max(1, sample.memory_usage(deep=True).sum() / max(len(sample), 1))
+        chunk_rows = max(1000, min(self.CHUNK_ROWS, int(self.memory_limit / 16 / row_bytes)))
+        del sample
+
+        parts = self._read_chunks(filepath, dtypes, chunk_rows)
+
+        columns = list(parts)
+        result = {}
+        for column in columns:
+            pieces = parts.pop(column)
+            series = pd.concat(pieces, ignore_index=True)
+            del pieces
+            if column in int_columns and isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+                series = self._unmask_integers(series)
+            result[column] = series
+        return pd.DataFrame(result, columns=columns, copy=False)
+
+    def _read_chunks(self, filepath, dtypes, chunk_rows):
+        """
+        逐块解析 CSV，按列保存每块数据，返回 {列名: [Series, ...]}
+
+        各块按可空类型解析，不会因为类型不符而失败；再逐列转换为 dtypes 中的类型。
+        某块的值无法转换时只放宽这一列：整数列遇到小数且取值都能用 float64 精确表示时
+        改为 float64，其余情况改为 object。已解析的块随之转换，之后的块按新类型继续
+        """
+        dtypes = dict(dtypes)
+        # 可空解析会把 2**64-1 当作缺失值，UInt64 列按文本读取后再转换
+        raw = {column: str for column, dtype in dtypes.items() if dtype == 'UInt64'}
+        parts = {}
+        total_bytes = 0
+        rows = 0
+        file_size = os.path.getsize(filepath)
+        self._chunk_count = 0
+        with open(filepath, 'rb') as f:
+            reader = pd.read_csv(f, dtype=raw or None, chunksize=chunk_rows, dtype_backend='numpy_nullable')
+            for chunk in reader:
+                total_bytes += chunk.memory_usage(deep=True).sum()
+                if total_bytes > self.memory_limit:
+                    raise MemoryError(
+                        f"文件解析后超过内存上限 {self.memory_limit // (1024 * 1024)} MB"
+                    )
+                # 按列转换，使整块数据在本轮循环结束后即可释放
+                for column in chunk.columns:
+                    pieces = parts.setdefault(column, [])
+                    piece = chunk[column]
+                    dtype = dtypes.get(column)
+                    try:
+                        piece = self._cast_piece(piece, dtype)
+                    except (TypeError, ValueError, OverflowError):
+                        dtype = dtypes[column] = self._widen(dtype, pieces, piece)
+                        pieces[:] = [self._cast_piece(p, dtype) for p in pieces]
+                        piece = self._cast_piece(piece, dtype)
+                    pieces.append(piece)
+                self._chunk_count += 1
+                rows += len(chunk)
+                # 文件位置包含解析器的预读缓冲，只作为进度的近似值
+                self._report_progress(min(f.tell(), file_size), rows, file_size)
+        return parts
+
+    @classmethod
+    def _cast_piece(cls, piece, dtype):
+        """
+        把一块中的一列转换为 dtype；None 表示按 pd.read_csv 的默认规则转换为 numpy 类型。
+        取值超出 dtype 的范围时抛出 ValueError
+        """
+        kind = piece.dtype.kind
+        if dtype is None:
+            if kind in 'iub' and not piece.hasnans:
+                return piece.astype(piece.dtype.numpy_dtype)
+            if kind in 'iuf':
+                return piece.astype('float64')
+            return cls._as_object(piece)
+        if dtype == object:
+            return cls._as_object(piece, numbers=True)
+        if dtype == 'float64':
+            if kind not in 'iuf':
+                raise ValueError(f"列 {piece.name} 含有非数值")
+            return piece.astype('float64')
+        if dtype == 'UInt64' and kind in 'OT':
+            # 按文本读取的 UInt64 列：负数、小数和文本在转换时报错
+            return piece.astype('UInt64')
+        if dtype == 'Int64' and kind in 'iu':
+            values = piece.dropna()
+            if not values.empty and values.max() > np.iinfo('int64').max:
+                raise ValueError(f"列 {piece.name} 的取值超出 Int64 的范围")
+            return piece.astype('Int64')
+        raise ValueError(f"列 {piece.name} 的取值不是 {dtype}")
+
+    @classmethod
+    def _widen(cls, dtype, pieces, piece):
+        """选择能同时容纳已解析各块和当前块的类型"""
+        if dtype == 'Int64' and piece.dtype.kind in 'iuf':
+            integers = [p for p in pieces + [piece] if p.dtype.kind in 'iu']
+            if all(cls._exact_in_float(p) for p in integers):
+                return 'float64'
+        return object
+
+    @staticmethod
+    def _as_object(piece, numbers=False):
+        """
+        转换为 object 列，缺失值记为 NaN。
+        numbers 为真时把文本块中的数字转换为数值，与放宽前已解析的块一致
+        """
+        values = piece.to_numpy(dtype=object, na_value=np.nan)
+        if numbers and piece.dtype.kind in 'OT':
+            numbers = pd.to_numeric(piece, errors='coerce')
+            if numbers.dtype.kind in 'iuf':
+                found = numbers.notna().to_numpy()
+                values[found] = numbers[found].to_numpy(dtype=object)
+        return pd.Series(values, index=piece.index, name=piece.name)
+
+    @staticmethod
+    def _exact_in_float(series):
+        """整数列的取值能否用 float64 精确表示"""
+        values = series.dropna()
+        return values.empty or (values.abs() <= FLOAT_EXACT_INT).all()
+
+    @staticmethod
+    def list_sheets(filepath):
+        """列出 Excel 文件中的工作表名，不解析单元格内容"""
+        if filepath.lower().endswith('.xlsx') and python_calamine is None:
+            workbook = openpyxl.load_workbook(filepath, read_only=True)
+            try:
+                return list(workbook.sheetnames)
+            finally:
+                workbook.close()
+        engine = 'calamine' if python_calamine is not None else None
+        with pd.ExcelFile(filepath, engine=engine) as excel:
+            return list(excel.sheet_names)
+
+    def read_excel(self, filepath, sheet_name=0):
+        """
+        读取 Excel 中的单个工作表。
+
+        安装了 python-calamine 时使用 calamine 引擎；
+        否则 xlsx 文件用 openpyxl 只读模式逐行读取单元格值，
+        跳过完整对象模型的构建。xls 文件仍交给 pd.read_excel。
+        """
+        if python_calamine is not None:
+            return pd.read_excel(filepath, sheet_name=sheet_name, engine='calamine')
+        if not filepath.lower().endswith('.xlsx'):
+            return pd.read_excel(filepath, sheet_name=sheet_name)
+
+        workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            if isinstance(sheet_name, int):
+                sheet = workbook.worksheets[sheet_name]
+            else:
+                sheet = workbook[sheet_name]
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return pd.DataFrame()
+            records = [row for row in rows if any(value is not None for value in row)]
+        finally:
+            workbook.close()
+
+        columns = self._excel_columns(header)
+        width = len(columns)
+        # 只读模式下各行长度可能不一致，补齐或截断到表头宽度
+        records = [row[:width] + (None,) * (width - len(row)) for row in records]
+        return pd.DataFrame.from_records(records, columns=columns)
+
+    @staticmethod
+    def _excel_columns(header):
+        """按 pd.read_excel 的规则处理表头：空列名记为 Unnamed，重名追加序号"""
+        columns = []
+        seen = {}
+        for i, name in enumerate(header):
+            if name is None:
+                name = f"Unnamed: {i}"
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            columns.append(name)
+        return columns
+
+    def _report_progress(self, bytes_parsed, rows, bytes_total=None):
+        if self.progress is not None:
+            if bytes_total is None:
+                bytes_total = bytes_parsed
+            self.progress(bytes_parsed=bytes_parsed, bytes_total=bytes_total, rows=rows)
+
+    @staticmethod
+    def _infer_dtypes(sample):
+        """
+        根据样本推断数值列的类型
+
+        整数列按可空整数 Int64/UInt64 读取以容纳样本之后出现的缺失值；
+        按 float64 读取会使绝对值超过 2**53 的整数失真
+        """
+        dtypes = {}
+        int_columns = set()
+        for column, dtype in sample.dtypes.items():
+            if pd.api.types.is_integer_dtype(dtype):
+                dtypes[column] = 'UInt64' if pd.api.types.is_unsigned_integer_dtype(dtype) else 'Int64'
+                int_columns.add(column)
+            elif pd.api.types.is_float_dtype(dtype) and sample[column].notna().any():
+                dtypes[column] = 'float64'
+        return dtypes, int_columns
+
+    @classmethod
+    def _unmask_integers(cls, series):
+        """
+        可空整数列转换为普通类型：没有缺失值时转为 int64/uint64；
+        有缺失值且 float64 能精确表示所有取值时转为 float64(与 pd.read_csv 一致)，否则保留可空整数
+        """
+        if not series.hasnans:
+            return series.astype(series.dtype.numpy_dtype)
+        if cls._exact_in_float(series):
+            return series.astype('float64')
+        return series
 
-        return self.data
\ No newline at end of file
+    def _record_stats(self, start, mode):
+        """记录本次加载的行数、速度和内存峰值"""
+        seconds = time.perf_counter() - start
+        rows = len(self.data)
+        self.load_stats = {
+            'mode': mode,
+            'rows': rows,
+            'chunks': self._chunk_count if mode == 'chunked' else 1,
+            'seconds': seconds,
+            'rows_per_sec': rows / seconds if seconds > 0 else float(rows),
+        }
@@ -5,20 +5,33 @@ import plotly.express as px
 class DataVisualizer:
     """数据可视化类，用于生成各种图表"""
 
-    def __init__(self, df):
-        """初始化数据可视化器"""
+    def __init__(self, df, profile=None):
+        """
+        初始化数据可视化器，只读取 df，不会修改它
+
+        参数:
+            df: 数据集
+            profile: profile_schema 计算的列类型概况，提供时直接使用其中的列分类
+        """
         self.df = df
+        self.profile = profile
 
     def get_available_columns(self):
         """获取所有可用列名"""
+        if self.profile is not None:
+            return list(self.profile['columns'])
         return list(self.df.columns)
 
     def get_numeric_columns(self):
         """获取所有数值类型列"""
+        if self.profile is not None:
+            return list(self.profile['numeric_columns'])
         return list(self.df.select_dtypes(include=['number']).columns)
 
     def get_categorical_columns(self):
         """获取所有分类类型列"""
+        if self.profile is not None:
+            return list(self.profile['categorical_columns'])
         return list(self.df.select_dtypes(include=['object', 'category']).columns)
 
     def plot_histogram(self, column, nbins=None, color_column=None, title=None):
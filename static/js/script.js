@@ -64,11 +64,18 @@ document.addEventListener('DOMContentLoaded', function() {
     const algorithmSelect = document.getElementById('ml_algorithm');
     const paramDivs = document.querySelectorAll('.algorithm-params');
     function updateParams() {
-        paramDivs.forEach(div => { div.style.display = 'none'; });
+        // 隐藏的参数输入框同时禁用，避免同名参数(如 min_samples)被其他算法的输入覆盖
+        paramDivs.forEach(div => {
+            div.style.display = 'none';
+            div.querySelectorAll('input, select').forEach(input => { input.disabled = true; });
+        });
         const selectedAlgorithm = algorithmSelect.value;
         if (selectedAlgorithm) {
             const selectedParamDiv = document.getElementById(selectedAlgorithm + '_params');
-            if (selectedParamDiv) selectedParamDiv.style.display = 'block';
+            if (selectedParamDiv) {
+                selectedParamDiv.style.display = 'block';
+                selectedParamDiv.querySelectorAll('input, select').forEach(input => { input.disabled = false; });
+            }
         }
     }
     updateParams();
@@ -83,7 +90,7 @@ document.addEventListener('DOMContentLoaded', function() {
     function toggleTargetColumn() {
         const selectedAlgorithm = algorithmSelect.value;
         // 无监督学习算法列表
-        const unsupervisedAlgorithms = ['kmeans', 'dbscan', 'pca'];
+        const unsupervisedAlgorithms = ['kmeans', 'dbscan', 'pca', 'kmeans_sweep', 'dbscan_sweep'];
 
         if (targetColumnSelect && targetColumnFormGroup) {
             if (unsupervisedAlgorithms.includes(selectedAlgorithm)) {
@@ -152,11 +159,11 @@ document.addEventListener('DOMContentLoaded', function() {
     function toggleTargetColumn() {
         const selectedAlgorithm = algorithmSelect.value;
         // 无监督学习算法列表
-        const unsupervisedAlgorithms = ['kmeans', 'dbscan', 'pca'];
+        const unsupervisedAlgorithms = ['kmeans', 'dbscan', 'pca', 'kmeans_sweep', 'dbscan_sweep'];
         // 回归算法列表 (只需要数值型目标)
-        const regressionAlgorithms = ['linear_regression', 'random_forest_regression'];
+        const regressionAlgorithms = ['linear_regression', 'random_forest_regression', 'random_forest_regression_sweep'];
         // 分类算法列表 (只接受分类型目标)
-        const classificationAlgorithms = ['random_forest_classification'];
+        const classificationAlgorithms = ['random_forest_classification', 'random_forest_classification_sweep'];
 
         if (targetColumnSelect && targetColumnFormGroup) {
             if (unsupervisedAlgorithms.includes(selectedAlgorithm)) {
@@ -0,0 +1,15 @@
+# 测试的公共设置
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def copy_on_write():
+    """与 app.py 一致，在写时复制模式下运行"""
+    with pd.option_context('mode.copy_on_write', True):
+        yield
@@ -0,0 +1,64 @@
+# 清洗执行计划(合并行掩码)与按步骤依次执行的结果一致
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.cleaner import CleaningPlan, DataCleaning
+
+MISSING = [
+    None,
+    {'method': 'drop'},
+    {'method': 'fill', 'fill_value': 0},
+    {'method': 'fill', 'strategy': 'median'},
+    {'method': 'fill', 'strategy': 'group_median', 'group_by': 'category'},
+]
+OUTLIERS = [
+    None,
+    {'column': 'x1', 'threshold': 2, 'replacement': None},
+    {'column': 'x1', 'threshold': 2, 'replacement': 0},
+    {'columns': ['x1', 'x2'], 'method': 'iqr', 'threshold': 1.5, 'combine': 'any'},
+    {'columns': ['x1', 'count'], 'method': 'mad', 'threshold': 3, 'combine': 'all', 'replacement': 'median'},
+]
+DUPLICATES = [
+    None,
+    {'method': 'drop'},
+    {'method': 'mark'},
+    {'method': 'drop', 'subset': ['count', 'category']},
+]
+GRID = [{key: value for key, value in zip(('missing_values', 'outliers', 'duplicates'), rules) if value is not None}
+        for rules in itertools.product(MISSING, OUTLIERS, DUPLICATES)]
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(0)
+    rows = 3000
+    df = pd.DataFrame({
+        'x1': rng.standard_t(3, rows),
+        'x2': rng.normal(size=rows),
+        'count': rng.integers(0, 50, size=rows),
+        'category': pd.Categorical(rng.choice(['A', 'B', 'C'], size=rows)),
+    })
+    df.loc[rng.choice(rows, rows // 20, replace=False), 'x2'] = np.nan
+    df.loc[rng.choice(rows, rows // 50, replace=False), 'x1'] = np.nan
+    return pd.concat([df, df.sample(frac=0.05, random_state=0)], ignore_index=True)
+
+
+@pytest.mark.parametrize('rules', GRID, ids=lambda rules: str(GRID.index(rules)))
+def test_fused_matches_sequential(frame, rules):
+    sequential = DataCleaning(frame).apply_cleaning_rules(rules, fused=False)
+    fused = DataCleaning(frame).apply_cleaning_rules(rules, fused=True)
+    pd.testing.assert_frame_equal(fused, sequential)
+
+
+def test_execute_does_not_modify_input(frame):
+    before = frame.copy()
+    plan = CleaningPlan({'missing_values': {'method': 'fill', 'fill_value': 0},
+                         'outliers': {'column': 'x1', 'threshold': 2, 'replacement': 0},
+                         'duplicates': {'method': 'drop'}})
+    result = plan.execute(frame)
+    pd.testing.assert_frame_equal(frame, before)
+    assert len(result) < len(frame)
+    assert sum(plan.removed.values()) == len(frame) - len(result)
@@ -0,0 +1,62 @@
+# 行指纹查找重复行：与 pandas 的 duplicated 一致
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.duplicates import FingerprintSet, duplicate_report, duplicated_rows, row_fingerprints
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    rows = 20000
+    df = pd.DataFrame({
+        'a': rng.integers(0, 30, rows),
+        'b': rng.choice(['x', 'y', None], rows),
+        'c': rng.integers(0, 3, rows).astype(float),
+        'd': pd.Categorical(rng.choice(['p', 'q'], rows)),
+    })
+    df.loc[rng.random(rows) < .1, 'c'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('subset', [None, ['a', 'b'], ['c']])
+def test_duplicated_rows(frame, subset):
+    expected = frame.duplicated(subset).to_numpy()
+    np.testing.assert_array_equal(duplicated_rows(frame, subset), expected)
+
+
+def test_duplicated_rows_positions(frame):
+    positions = np.arange(0, len(frame), 3)
+    expected = frame.iloc[positions].duplicated().to_numpy()
+    np.testing.assert_array_equal(duplicated_rows(frame, positions=positions), expected)
+
+
+@pytest.mark.parametrize('chunk_rows', [13, 1000, 50000])
+def test_fingerprint_set_chunks(frame, chunk_rows):
+    """分块加入的结果与整表一次判断相同，与分块大小无关"""
+    fingerprints = row_fingerprints(frame)
+    chunked = FingerprintSet()
+    flags = np.concatenate([chunked.add(fingerprints[start:start + chunk_rows])
+                            for start in range(0, len(fingerprints), chunk_rows)])
+    np.testing.assert_array_equal(flags, frame.duplicated().to_numpy())
+    assert chunked.report() == duplicate_report(frame)
+    assert len(chunked) == chunked.report()['unique_rows']
+
+
+def test_duplicate_report(frame):
+    report = duplicate_report(frame)
+    sizes = frame.groupby(list(frame.columns), dropna=False, observed=True).size()
+    assert report == {
+        'rows': len(frame),
+        'unique_rows': len(sizes),
+        'duplicate_rows': int(frame.duplicated().sum()),
+        'duplicate_groups': int((sizes > 1).sum()),
+        'largest_group': int(sizes.max()),
+    }
+
+
+def test_empty():
+    fingerprints = FingerprintSet()
+    assert fingerprints.report()['rows'] == 0
+    assert fingerprints.report()['largest_group'] == 0
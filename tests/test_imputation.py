@@ -0,0 +1,71 @@
+# 缺失值填充：各策略保持列的数据类型
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.imputation import impute, resolve_strategies
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'int8': pd.array([1, None, 3, 3], dtype='Int8'),
+        'uint8': pd.array([1, None, 3, 3], dtype='UInt8'),
+        'float32': np.array([1.5, np.nan, 2.5, 2.5], dtype='float32'),
+        'category': pd.Categorical(['a', None, 'b', 'b']),
+        'text': ['a', None, 'b', 'b'],
+        'group': ['g', 'g', 'h', 'h'],
+    })
+
+
+def _fill(frame, strategy, **spec):
+    strategies = resolve_strategies(frame, strategy, **spec)
+    return impute(frame, strategies)
+
+
+@pytest.mark.parametrize('strategy', ['mean', 'median', 'mode', 'ffill', 'bfill'])
+def test_strategies_keep_dtypes(frame, strategy):
+    filled, counts = _fill(frame, strategy)
+    assert filled.dtypes.equals(frame.dtypes)
+    assert not filled.isna().any().any()
+    assert counts == {column: 1 for column in ['int8', 'uint8', 'float32', 'category', 'text']}
+    # 不修改输入
+    assert frame.isna().sum().sum() == 5
+
+
+def test_group_median_keeps_dtype(frame):
+    filled, _ = _fill(frame, 'group_median', group_by='group')
+    assert filled['int8'].dtype == frame['int8'].dtype
+    assert filled['float32'].dtype == np.float32
+    assert filled['int8'].iloc[1] == 1
+
+
+def test_constant_keeps_dtype(frame):
+    filled, _ = _fill(frame, 'constant', fill_value='7', columns={'category': 'mode', 'text': 'mode'})
+    assert filled.dtypes.equals(frame.dtypes)
+    assert filled['int8'].iloc[1] == 7
+    assert filled['float32'].iloc[1] == np.float32(7)
+
+
+@pytest.mark.parametrize('column, value, dtype', [
+    ('int8', '999999', 'Int64'),
+    ('uint8', '-1', 'Int16'),
+    ('uint8', '300', 'UInt16'),
+])
+def test_constant_out_of_range_widens(frame, column, value, dtype):
+    filled, _ = impute(frame, {column: {'strategy': 'constant', 'fill_value': value, 'group_by': None}})
+    assert filled[column].dtype == dtype
+    assert filled[column].iloc[1] == int(value)
+    assert filled[column].iloc[0] == 1
+
+
+def test_statistic_out_of_range_widens(frame):
+    filled, _ = impute(frame, {'int8': {'strategy': 'mean', 'value': 1e6, 'group_by': None}})
+    assert filled['int8'].dtype == 'Int64'
+    assert filled['int8'].iloc[1] == 1000000
+
+
+@pytest.mark.parametrize('column, value', [('int8', 'abc'), ('int8', '1.5'), ('int8', '1e30')])
+def test_invalid_constant(frame, column, value):
+    with pytest.raises(ValueError):
+        impute(frame, {column: {'strategy': 'constant', 'fill_value': value, 'group_by': None}})
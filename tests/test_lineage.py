@@ -0,0 +1,100 @@
+# 数据集版本树：撤销、重做、分支和版本数上限
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.lineage import DatasetLineage
+from modules.store import DatasetStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DatasetStore(str(tmp_path / 'spill'))
+
+
+@pytest.fixture
+def lineage(store):
+    return DatasetLineage(store, max_versions=5)
+
+
+def _frame(value):
+    return pd.DataFrame({'a': np.full(10, value), 'b': np.arange(10)})
+
+
+def _head_value(lineage, store):
+    head = lineage.head('s')
+    return store.get('s', head.dataset_id)['a'].iloc[0]
+
+
+def test_undo_redo(lineage, store):
+    root = lineage.reset('s', _frame(0), "上传")
+    first = lineage.commit('s', _frame(1), "清洗 1")
+    second = lineage.commit('s', _frame(2), "清洗 2")
+    assert [node.id for node in lineage.path('s')] == [root, first, second]
+
+    assert lineage.undo('s') and lineage.undo('s')
+    assert lineage.head('s').id == root
+    assert not lineage.undo('s')
+    assert lineage.redo('s') and lineage.redo('s')
+    assert lineage.head('s').id == second
+    assert not lineage.redo('s')
+    assert _head_value(lineage, store) == 2
+
+
+def test_branch_after_undo(lineage, store):
+    root = lineage.reset('s', _frame(0), "上传")
+    first = lineage.commit('s', _frame(1), "清洗 1")
+    lineage.undo('s')
+    branch = lineage.commit('s', _frame(3), "分支")
+    assert lineage.head('s').id == branch
+    assert lineage.head('s').parent == root
+    # 重做回到最近的子版本；切换到旧分支后仍可读取其数据
+    lineage.undo('s')
+    lineage.redo('s')
+    assert lineage.head('s').id == branch
+    assert lineage.checkout('s', first)
+    assert _head_value(lineage, store) == 1
+    assert [node['depth'] for node in lineage.nodes('s')] == [0, 1, 1]
+
+
+def test_commit_keeps_newer_head(lineage):
+    """后台清洗完成前用户切换了版本时，新版本不会覆盖当前版本"""
+    root = lineage.reset('s', _frame(0), "上传")
+    first = lineage.commit('s', _frame(1), "清洗 1")
+    lineage.undo('s')
+    lineage.commit('s', _frame(2), "后台清洗", parent=first)
+    assert lineage.head('s').id == root
+
+
+def test_limit_keeps_head_path(lineage, store):
+    lineage.reset('s', _frame(0), "上传")
+    for value in range(1, 4):
+        lineage.commit('s', _frame(value), f"清洗 {value}")
+    lineage.undo('s')
+    lineage.undo('s')
+    for value in range(10, 13):
+        lineage.commit('s', _frame(value), f"分支 {value}")
+    # 先删除旧分支上最早的叶子版本，当前版本路径上的版本不删除
+    nodes = lineage.nodes('s')
+    assert [node['label'] for node in nodes] == ["上传", "清洗 1", "分支 10", "分支 11", "分支 12"]
+    # 被删除的版本的数据也从存储中删除
+    assert store.stats()['datasets'] == 5
+    assert _head_value(lineage, store) == 12
+
+    # 当前版本路径本身超过上限时全部保留
+    lineage.commit('s', _frame(13), "分支 13")
+    assert len(lineage.nodes('s')) == len(lineage.path('s')) == 6
+
+
+def test_reset_drops_session(lineage, store):
+    lineage.reset('s', _frame(0), "上传")
+    lineage.commit('s', _frame(1), "清洗 1")
+    lineage.reset('s', _frame(5), "重新上传")
+    assert len(lineage.nodes('s')) == 1
+    assert store.stats()['datasets'] == 1
+    assert _head_value(lineage, store) == 5
+
+
+def test_commit_without_upload(lineage):
+    with pytest.raises(ValueError):
+        lineage.commit('s', _frame(1), "清洗")
@@ -0,0 +1,94 @@
+# 分块清洗(StreamingCleaner)与上传后在内存中清洗(先 compact_dtypes 再清洗)的结果逐格比较
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.cleaner import DataCleaning
+from modules.compaction import compact_dtypes
+from modules.streaming import StreamingCleaner
+
+ROWS = 2000
+CHUNK_ROWS = 700
+
+MISSING = [
+    {'method': 'drop'},
+    {'method': 'fill', 'strategy': 'mean'},
+    {'method': 'fill', 'strategy': 'mode'},
+    {'method': 'fill', 'strategy': 'ffill'},
+    {'method': 'fill', 'strategy': 'constant', 'fill_value': '0'},
+    {'method': 'none'},
+]
+OUTLIERS = [
+    None,
+    {'columns': ['f', 'i'], 'method': 'zscore', 'threshold': 2, 'combine': 'any', 'replacement': None},
+    {'columns': ['f'], 'method': 'zscore', 'threshold': 2, 'replacement': '99'},
+    {'column': 'f', 'threshold': 2},
+]
+DUPLICATES = [
+    {'method': 'drop'},
+    {'method': 'mark'},
+    {'method': 'drop', 'subset': ['s', 'k']},
+    {'method': 'none'},
+]
+GRID = [{'missing_values': missing, 'outliers': outliers, 'duplicates': duplicates}
+        for missing, outliers, duplicates in itertools.product(MISSING, OUTLIERS, DUPLICATES)]
+
+
+@pytest.fixture(scope='module')
+def source(tmp_path_factory):
+    """浮点、整数、低基数文本、整数文本和混合文本列，约 5% 缺失、8% 重复行"""
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        'i': rng.integers(0, 20, ROWS).astype(float),
+        'f': np.round(rng.standard_t(3, ROWS), 3),
+        's': rng.choice(['a', 'b', 'c'], ROWS),
+        'k': rng.integers(0, 5, ROWS),
+        'n': rng.integers(0, 1000, ROWS).astype(str),
+        # 少量无法解析为数值的值：整列保持文本
+        'm': np.where(rng.random(ROWS) < 0.02, 'x', rng.integers(0, 1000, ROWS).astype(str)),
+    })
+    df.loc[rng.random(ROWS) < .05, 'i'] = np.nan
+    df.loc[rng.random(ROWS) < .05, 'f'] = np.nan
+    df.loc[rng.random(ROWS) < .05, 's'] = None
+    df = pd.concat([df, df.sample(frac=0.08, random_state=0)], ignore_index=True)
+    path = tmp_path_factory.mktemp('streaming') / 'data.csv'
+    df.to_csv(path, index=False)
+    raw, report = compact_dtypes(pd.read_csv(path))
+    column_dtypes = {row['column']: row['dtype_after'] for row in report['columns']}
+    return path, raw, column_dtypes
+
+
+def test_compacted_dtypes(source):
+    _, raw, column_dtypes = source
+    assert column_dtypes['k'] == 'int8'
+    assert column_dtypes['m'] in ('object', 'category')
+    assert raw['m'].astype(str).eq('x').any()
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+@pytest.mark.parametrize('rules', GRID, ids=lambda rules: str(GRID.index(rules)))
+def test_streaming_matches_in_memory(source, tmp_path, rules, fmt):
+    path, raw, column_dtypes = source
+    expected = DataCleaning(raw).apply_cleaning_rules(rules)
+    target = tmp_path / f'out.{fmt}'
+    StreamingCleaner(rules, CHUNK_ROWS, column_dtypes).run(str(path), str(target))
+    got = pd.read_csv(target) if fmt == 'csv' else pd.read_parquet(target)
+    _assert_same(got, expected, check_dtypes=fmt == 'parquet')
+
+
+def _assert_same(got, expected, check_dtypes):
+    assert list(got.columns) == list(expected.columns)
+    assert len(got) == len(expected)
+    for column in expected.columns:
+        a, b = got[column], expected[column]
+        if check_dtypes and not isinstance(b.dtype, pd.CategoricalDtype):
+            assert a.dtype == b.dtype, column
+        if pd.api.types.is_numeric_dtype(b) and not pd.api.types.is_bool_dtype(b):
+            # float32 列的均值在两边的累加顺序不同，允许相对误差
+            np.testing.assert_allclose(a.astype(float), b.astype(float), rtol=1e-6, atol=1e-6, err_msg=column)
+        else:
+            left = a.astype(object).where(a.notna(), None).astype(str).to_numpy()
+            right = b.astype(object).where(b.notna(), None).astype(str).to_numpy()
+            np.testing.assert_array_equal(left, right, err_msg=column)
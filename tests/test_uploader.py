@@ -0,0 +1,102 @@
+# 分块读取 CSV：样本之后出现与推断类型不符的值时只放宽该列，文件只读取一遍
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.uploader import DataUploader
+
+ROWS = 5000
+BIG = 2 ** 60 + 1
+
+
+@pytest.fixture
+def uploader(monkeypatch):
+    uploader = DataUploader()
+    monkeypatch.setattr(uploader, 'SAMPLE_ROWS', 100)
+    monkeypatch.setattr(uploader, 'CHUNK_ROWS', 1000)
+    return uploader
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """统计 pd.read_csv 的调用次数(样本一次，分块解析一次)"""
+    calls = []
+    read_csv = pd.read_csv
+
+    def counted(*args, **kwargs):
+        calls.append(kwargs)
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(pd, 'read_csv', counted)
+    return calls
+
+
+def _write(tmp_path, frame):
+    path = tmp_path / 'data.csv'
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def _frame():
+    return pd.DataFrame({
+        'id': np.arange(ROWS, dtype='int64'),
+        'big': np.full(ROWS, BIG, dtype='int64'),
+        'value': np.arange(ROWS) / 4,
+        'label': ['a', 'b'] * (ROWS // 2),
+    }).astype({'id': object, 'value': object})
+
+
+def test_consistent_file_keeps_types(tmp_path, uploader, reads):
+    frame = _frame().astype({'id': 'int64', 'value': 'float64'})
+    result = uploader.read_csv_chunked(_write(tmp_path, frame))
+    assert len(reads) == 2
+    assert result.dtypes.to_dict() == frame.dtypes.to_dict()
+    pd.testing.assert_frame_equal(result, frame)
+
+
+def test_text_widens_only_that_column(tmp_path, uploader, reads):
+    frame = _frame()
+    frame.loc[3500, 'id'] = 'n/a-x'
+    frame.loc[4200, 'value'] = 'bad'
+    result = uploader.read_csv_chunked(_write(tmp_path, frame))
+    assert len(reads) == 2
+    assert result['id'].dtype == object and result['value'].dtype == object
+    # 其余列保持推断出的类型，大整数不失真
+    assert result['big'].dtype == np.int64 and (result['big'] == BIG).all()
+    assert result['id'].iloc[3500] == 'n/a-x'
+    assert result['id'].iloc[3499] == 3499 and result['id'].iloc[4999] == 4999
+    assert result['value'].iloc[4200] == 'bad' and result['value'].iloc[4201] == 4201 / 4
+
+
+def test_decimal_widens_integer_column_to_float(tmp_path, uploader):
+    frame = _frame().astype({'value': 'float64', 'big': object})
+    frame.loc[2500, 'id'] = 0.5
+    frame.loc[4000, 'big'] = np.nan
+    result = uploader.read_csv_chunked(_write(tmp_path, frame))
+    assert result['id'].dtype == np.float64
+    assert result['id'].iloc[2500] == 0.5 and result['id'].iloc[4999] == 4999
+    # 超过 2**53 的整数列出现缺失值时保留可空整数
+    assert result['big'].dtype == 'Int64'
+    assert result['big'].isna().sum() == 1 and (result['big'].dropna() == BIG).all()
+
+
+def test_decimal_in_large_integer_column_widens_to_object(tmp_path, uploader):
+    frame = _frame().astype({'id': 'int64', 'value': 'float64', 'big': object})
+    frame.loc[3000, 'big'] = 1.5
+    result = uploader.read_csv_chunked(_write(tmp_path, frame))
+    assert result['big'].dtype == object
+    assert result['big'].iloc[0] == BIG and result['big'].iloc[3000] == 1.5
+
+
+def test_unsigned_column(tmp_path, uploader):
+    top = 2 ** 64 - 1
+    frame = pd.DataFrame({'u': np.full(ROWS, top, dtype='uint64')}).astype(object)
+    frame.loc[4500, 'u'] = np.nan
+    result = uploader.read_csv_chunked(_write(tmp_path, frame))
+    assert result['u'].dtype == 'UInt64'
+    assert result['u'].isna().sum() == 1 and (result['u'].dropna() == top).all()
+
+    frame.loc[4500, 'u'] = -1
+    result = uploader.read_csv_chunked(_write(tmp_path, frame))
+    assert result['u'].dtype == object
+    assert result['u'].iloc[0] == top and result['u'].iloc[4500] == -1